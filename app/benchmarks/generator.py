@@ -0,0 +1,107 @@
+import random
+from decimal import Decimal
+from itertools import islice
+from datetime import date, timedelta
+from django.contrib.auth import get_user_model
+from core import rollups
+from core.models import AnnualBudget, ExpensesTag, Expense, Income, \
+                        MonthBudget
+
+
+def bulk_insert(model, objs, chunk_size=5000):
+    """Inserts a lazy iterable of rows without materializing it at once"""
+    objs = iter(objs)
+    while True:
+        chunk = list(islice(objs, chunk_size))
+        if not chunk:
+            return
+        model.objects.bulk_create(chunk)
+
+
+def generate(users=1, expenses=1000, incomes=None, tags=8, years=3,
+             seed=0, email='bench{}@example.com', budget_share=0.5):
+    """Seeds synthetic users with expenses and incomes using bulk_create.
+
+    Every user gets ``tags`` expenses tags, an annual budget for each of
+    the last ``years`` years (and the current one) with a month budget
+    per tag, and ``expenses`` expenses spread over those years. About
+    ``budget_share`` of the expenses are charged to the month budget of
+    their tag and year, the rest to the tag directly. Returns the
+    queryset of the generated users. Rollups are rebuilt for them at the
+    end because bulk inserts don't fire model signals.
+    """
+    rnd = random.Random(seed)
+    if incomes is None:
+        incomes = max(1, expenses // 20)
+    User = get_user_model()
+    emails = [email.format(index) for index in range(users)]
+    User.objects.bulk_create([
+        User(email=address, name=f'Benchmark {index}', password='!')
+        for index, address in enumerate(emails)
+    ])
+    created = User.objects.filter(email__in=emails)
+
+    ExpensesTag.objects.bulk_create([
+        ExpensesTag(user=user, name=f'tag {index}')
+        for user in created for index in range(tags)
+    ])
+    tag_ids = {}
+    for user_id, tag_id in ExpensesTag.objects.filter(
+            user__in=created).values_list('user', 'id'):
+        tag_ids.setdefault(user_id, []).append(tag_id)
+
+    last_day = date.today()
+    span = 365 * years
+    budget_years = range(last_day.year - years, last_day.year + 1)
+    AnnualBudget.objects.bulk_create([
+        AnnualBudget(user=user, year=year, amount=Decimal(120000),
+                     description='generated budget')
+        for user in created for year in budget_years
+    ])
+    MonthBudget.objects.bulk_create([
+        MonthBudget(user_id=user_id, annual_budget_id=annual_id,
+                    expenses_tag_id=tag_id, amount=Decimal(1000),
+                    description='generated month budget')
+        for user_id, annual_id in AnnualBudget.objects.filter(
+            user__in=created).values_list('user', 'id')
+        for tag_id in tag_ids[user_id]
+    ])
+    # (user, year, tag) -> month budget
+    month_budget_ids = {
+        (user_id, year, tag_id): month_budget_id
+        for month_budget_id, user_id, year, tag_id in
+        MonthBudget.objects.filter(user__in=created).values_list(
+            'id', 'user', 'annual_budget__year', 'expenses_tag'
+        )
+    }
+
+    def expense(user):
+        tag_id = rnd.choice(tag_ids[user.id])
+        day = last_day - timedelta(days=rnd.randrange(span))
+        row = Expense(
+            user=user,
+            amount=Decimal(rnd.randrange(100, 50000)) / 100,
+            date=day,
+            description='generated expense',
+        )
+        if rnd.random() < budget_share:
+            row.month_budget_id = month_budget_ids[(user.id, day.year,
+                                                    tag_id)]
+        else:
+            row.expenses_tag_id = tag_id
+        return row
+
+    for user in created:
+        bulk_insert(Expense, (expense(user) for _ in range(expenses)))
+        bulk_insert(Income, (
+            Income(
+                user=user,
+                amount=Decimal(rnd.randrange(50000, 500000)) / 100,
+                date=last_day - timedelta(days=rnd.randrange(span)),
+                periodicity=rnd.choice(['', 'm', 'a']),
+                description='generated income',
+            )
+            for _ in range(incomes)
+        ))
+    rollups.rebuild(created)
+    return created
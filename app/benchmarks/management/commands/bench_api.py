@@ -0,0 +1,208 @@
+import json
+import os
+import statistics
+import time
+from collections import OrderedDict
+from django.conf import settings as django_settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+from benchmarks.generator import generate
+from core.models import Expense
+from core.query_audit import QueryAuditor
+
+
+BASELINE_FILE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    'baseline.json'
+)
+
+
+def endpoints(user):
+    """The ``(name, path)`` of the benchmarked GET requests of a user"""
+    expense = Expense.objects.filter(user=user).latest('id')
+    return (
+        ('expense list', '/api/expenses/expense/'),
+        ('expense list names', '/api/expenses/expense/?expand=names'),
+        ('expense list columns', '/api/expenses/expense/?layout=columns'),
+        ('expense list filtered',
+         '/api/expenses/expense/?amount_min=100&year=' +
+         str(expense.date.year)),
+        ('expense detail', f'/api/expenses/expense/{expense.id}/'),
+        ('income list', '/api/expenses/income/'),
+        ('annual budget list', '/api/expenses/annualbudget/'),
+        ('month budget list', '/api/expenses/monthbudget/?expand=names'),
+        ('expenses tag list', '/api/expenses/expensestag/'),
+        ('summary', '/api/expenses/summary/'),
+        ('report', '/api/expenses/report/'),
+        ('forecast', '/api/expenses/forecast/'),
+        ('changes', '/api/expenses/changes/'),
+        ('export', '/api/expenses/export/?kind=expense'),
+        ('user me', '/api/user/me/'),
+    )
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    index = min(len(values) - 1, int(len(values) * percent / 100))
+    return values[index]
+
+
+def regressions(results, baseline, tolerance, min_delta_ms):
+    """Lists the endpoints running more queries than the baseline or with
+    a median latency over it by more than ``tolerance`` (a fraction) and
+    ``min_delta_ms``. The median is compared because the tail of a few
+    dozen requests is too noisy to gate on."""
+    problems = []
+    for name, result in results.items():
+        base = baseline.get('endpoints', {}).get(name)
+        if base is None:
+            continue
+        if result['queries'] > base['queries']:
+            problems.append(f"{name}: {result['queries']} queries, "
+                            f"baseline {base['queries']}")
+        limit = max(base['p50_ms'] * (1 + tolerance),
+                    base['p50_ms'] + min_delta_ms)
+        if result['p50_ms'] > limit:
+            problems.append(f"{name}: p50 {result['p50_ms']:.2f} ms, "
+                            f"baseline {base['p50_ms']:.2f} ms")
+    return problems
+
+
+class Command(BaseCommand):
+    """Django command to benchmark every API endpoint through the full
+    request stack (middleware, token authentication, views, rendering).
+
+    The data is seeded with the synthetic generator in a fresh test
+    database, created and dropped like the test runner does. For each
+    endpoint it reports the throughput of back to back requests, the
+    p50/p95/p99 latency and the queries per request, and compares them
+    with the baseline file: more queries or a slower median fail the
+    command. ``--save`` writes the results as the new baseline. Timings
+    depend on the machine and database, so compare baselines recorded on
+    the same setup.
+    """
+    help = 'Benchmarks the API endpoints against a stored baseline'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5)
+        parser.add_argument('--expenses', type=int, default=5000,
+                            help='Expenses per user')
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--baseline', default=BASELINE_FILE)
+        parser.add_argument('--save', action='store_true',
+                            help='Store the results as the baseline')
+        parser.add_argument('--tolerance', type=float, default=0.5,
+                            help='Allowed median slowdown, as a fraction')
+        parser.add_argument('--min-delta-ms', type=float, default=5.0,
+                            help='Slowdowns below this are noise')
+
+    def handle(self, *args, **options):
+        settings = OrderedDict(
+            (name, options[name]) for name in ('users', 'expenses',
+                                               'requests', 'warmup')
+        )
+        # A fresh test database, so every run sees the same data
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        try:
+            # Back to back requests of one user would be throttled
+            rest_framework = dict(django_settings.REST_FRAMEWORK,
+                                  DEFAULT_THROTTLE_RATES={})
+            with override_settings(ALLOWED_HOSTS=['testserver'],
+                                   REST_FRAMEWORK=rest_framework):
+                self.stdout.write('Seeding data...')
+                user = generate(users=options['users'],
+                                expenses=options['expenses']).first()
+                token = Token.objects.create(user=user)
+                client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+                cache.clear()
+                results = OrderedDict(
+                    (name, self.measure(client, path, options))
+                    for name, path in endpoints(user)
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        baseline = self.load_baseline(options['baseline'])
+        self.report(results, baseline)
+        if options['save']:
+            with open(options['baseline'], 'w') as baseline_file:
+                json.dump({'options': settings, 'endpoints': results},
+                          baseline_file, indent=2)
+                baseline_file.write('\n')
+            self.stdout.write(f"Baseline saved to {options['baseline']}")
+            return
+        if baseline is None:
+            return
+        if baseline.get('options') != settings:
+            self.stdout.write(self.style.WARNING(
+                f"The baseline was recorded with {baseline.get('options')}"
+            ))
+        problems = regressions(results, baseline, options['tolerance'],
+                               options['min_delta_ms'])
+        if problems:
+            raise CommandError('Regressions against the baseline:\n' +
+                               '\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS('No regressions'))
+
+    def load_baseline(self, path):
+        if not os.path.exists(path):
+            return None
+        with open(path) as baseline_file:
+            return json.load(baseline_file)
+
+    def measure(self, client, path, options):
+        """Returns the throughput, latency percentiles and queries of one
+        endpoint"""
+        for _ in range(options['warmup']):
+            self.get(client, path)
+        timings = []
+        queries = 0
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            auditor = QueryAuditor(explain_rate=0)
+            with auditor.audit():
+                start = time.perf_counter()
+                self.get(client, path)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries = max(queries, len(auditor.queries))
+        elapsed = time.perf_counter() - started
+        return OrderedDict([
+            ('rps', round(len(timings) / elapsed, 1)),
+            ('p50_ms', round(percentile(timings, 50), 3)),
+            ('p95_ms', round(percentile(timings, 95), 3)),
+            ('p99_ms', round(percentile(timings, 99), 3)),
+            ('mean_ms', round(statistics.mean(timings), 3)),
+            ('queries', queries),
+        ])
+
+    def get(self, client, path):
+        response = client.get(path)
+        if response.status_code != 200:
+            raise CommandError(f'{path} answered {response.status_code}')
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+
+    def report(self, results, baseline):
+        base = (baseline or {}).get('endpoints', {})
+        self.stdout.write(f'{"endpoint":<24}{"req/s":>9}{"p50 ms":>9}'
+                          f'{"p95 ms":>9}{"p99 ms":>9}{"queries":>9}'
+                          f'{"p50 vs base":>13}')
+        for name, result in results.items():
+            change = ''
+            if name in base and base[name]['p50_ms']:
+                ratio = result['p50_ms'] / base[name]['p50_ms'] - 1
+                change = f'{ratio:+.0%}'
+            self.stdout.write(
+                f"{name:<24}{result['rps']:>9.1f}{result['p50_ms']:>9.2f}"
+                f"{result['p95_ms']:>9.2f}{result['p99_ms']:>9.2f}"
+                f"{result['queries']:>9}{change:>13}"
+            )
@@ -0,0 +1,136 @@
+import io
+import threading
+import time
+from urllib.parse import urlsplit
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+
+
+class Command(BaseCommand):
+    """Django command to compare API requests that open a DB connection
+    each (CONN_MAX_AGE=0) with requests that reuse persistent connections.
+
+    The requests go through the WSGI handler in ``--threads`` threads, so
+    connections are closed or kept at the end of each request exactly as
+    under gunicorn. Point the database settings at PostgreSQL, directly
+    or through pgbouncer (DB_HOST, DB_PORT, DB_POOL_MODE), to measure the
+    connection setup of a deployment.
+    """
+    help = 'Benchmarks requests with and without persistent connections'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--token', required=True,
+                            help='API token of the user')
+        parser.add_argument('--path', default='/api/expenses/expensestag/')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Requests per thread')
+        parser.add_argument('--max-age', type=int, default=600,
+                            help='CONN_MAX_AGE of the persistent run')
+
+    def handle(self, *args, **options):
+        handler = WSGIHandler()
+        settings_dict = connections.databases[DEFAULT_DB_ALIAS]
+        original_max_age = settings_dict.get('CONN_MAX_AGE', 0)
+        results = []
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver']):
+                for label, max_age in (('per request', 0),
+                                       ('persistent', options['max_age'])):
+                    # Read by every connection opened from now on
+                    settings_dict['CONN_MAX_AGE'] = max_age
+                    results.append((label, self.measure(handler, options)))
+        finally:
+            settings_dict['CONN_MAX_AGE'] = original_max_age
+
+        self.stdout.write(f'{"connections":<14}{"requests/s":>12}'
+                          f'{"p50 ms":>10}{"p99 ms":>10}{"opened":>10}'
+                          f'{"errors":>8}')
+        for label, (rate, latencies, opened, errors) in results:
+            self.stdout.write(
+                f'{label:<14}{rate:>12.1f}'
+                f'{self.percentile(latencies, 50):>10.2f}'
+                f'{self.percentile(latencies, 99):>10.2f}'
+                f'{opened:>10}{errors:>8}'
+            )
+
+    def percentile(self, values, percent):
+        if not values:
+            return 0.0
+        index = min(len(values) - 1, int(len(values) * percent / 100))
+        return values[index]
+
+    def environ(self, options):
+        url = urlsplit(options['path'])
+        return {
+            'REQUEST_METHOD': 'GET',
+            'SCRIPT_NAME': '',
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': 'testserver',
+            'HTTP_ACCEPT': 'application/json',
+            'HTTP_AUTHORIZATION': f"Token {options['token']}",
+            'wsgi.url_scheme': 'http',
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+
+    def measure(self, handler, options):
+        """Returns the requests/sec, sorted latencies in ms, connections
+        opened and failed requests of one run"""
+        environ = self.environ(options)
+        latencies = []
+        counters = {'opened': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def count_connection(**kwargs):
+            with lock:
+                counters['opened'] += 1
+
+        def start_response(status, headers, exc_info=None):
+            if not status.startswith('200'):
+                with lock:
+                    counters['errors'] += 1
+
+        def client():
+            timings = []
+            try:
+                for _ in range(options['requests']):
+                    start = time.perf_counter()
+                    response = handler(
+                        dict(environ, **{'wsgi.input': io.BytesIO()}),
+                        start_response
+                    )
+                    try:
+                        b''.join(response)
+                    finally:
+                        # Fires request_finished, which closes the
+                        # connection or keeps it for CONN_MAX_AGE
+                        response.close()
+                    timings.append((time.perf_counter() - start) * 1000)
+            finally:
+                connections.close_all()
+                with lock:
+                    latencies.extend(timings)
+
+        connection_created.connect(count_connection, weak=False)
+        threads = [threading.Thread(target=client)
+                   for _ in range(options['threads'])]
+        start = time.perf_counter()
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            connection_created.disconnect(count_connection)
+        elapsed = time.perf_counter() - start
+        return (len(latencies) / elapsed, sorted(latencies),
+                counters['opened'], counters['errors'])
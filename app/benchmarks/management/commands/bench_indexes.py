@@ -0,0 +1,108 @@
+import statistics
+import time
+from datetime import date, timedelta
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from benchmarks.generator import generate
+from expenses.pagination import DatedKeysetPagination
+from core.models import AnnualBudget, Expense, ExpensesTag, Income, \
+                        MonthBudget
+
+
+COMPOSITE_INDEXES = (
+    (Expense, 'expense_user_date_id_idx'),
+    (Income, 'income_user_date_id_idx'),
+    (MonthBudget, 'monthbudget_user_annual_idx'),
+    (ExpensesTag, 'expensestag_user_name_idx'),
+)
+
+
+def benchmark_queries(user, annual_budget):
+    """The per-user query shapes used by the expenses API"""
+    month_start = date.today().replace(day=1) - timedelta(days=90)
+    month_end = month_start + timedelta(days=31)
+    # A deep page, after the row in the middle of the user's expenses
+    expenses = Expense.objects.filter(user=user).order_by('-date', '-id')
+    middle = expenses.values('date', 'id')[expenses.count() // 2]
+    seek = DatedKeysetPagination().seek_filter(
+        DatedKeysetPagination.ordering, [middle['date'], middle['id']]
+    )
+    return (
+        ('expense list', expenses[:100]),
+        ('expense page', expenses.filter(seek)[:100]),
+        ('expense month', Expense.objects.filter(
+            user=user, date__gte=month_start, date__lt=month_end)),
+        ('income list', Income.objects.filter(
+            user=user).order_by('-date', '-id')[:100]),
+        ('month budgets', MonthBudget.objects.filter(
+            user=user, annual_budget=annual_budget)),
+        ('tag by name', ExpensesTag.objects.filter(
+            user=user, name='tag 3')),
+    )
+
+
+class Command(BaseCommand):
+    """Django command to compare the per-user queries with and without the
+    composite indexes. Everything runs in a transaction that is rolled
+    back, so it is safe to point at a scratch copy of production."""
+    help = 'Benchmarks the composite per-user indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--expenses', type=int, default=20000,
+                            help='Expenses per user')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.stdout.write('Seeding data...')
+            users = generate(users=options['users'],
+                             expenses=options['expenses'])
+            user = users.first()
+            annual_budget = AnnualBudget.objects.get(
+                user=user, year=date.today().year
+            )
+            self.analyze()
+
+            after = self.measure(user, annual_budget, options['repeat'])
+            self.drop_indexes()
+            self.analyze()
+            before = self.measure(user, annual_budget, options['repeat'])
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'{"query":<16}{"before ms":>12}{"after ms":>12}')
+        for name, (before_ms, _) in before.items():
+            after_ms = after[name][0]
+            self.stdout.write(f'{name:<16}{before_ms:>12.3f}{after_ms:>12.3f}')
+        for label, results in (('before', before), ('after', after)):
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Plans {label}'))
+            for name, (_, plan) in results.items():
+                self.stdout.write(f'{name}:\n{plan}\n')
+
+    def analyze(self):
+        if connection.vendor in ('postgresql', 'sqlite'):
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            for _, name in COMPOSITE_INDEXES:
+                cursor.execute(
+                    f'DROP INDEX {connection.ops.quote_name(name)}'
+                )
+
+    def measure(self, user, annual_budget, repeat):
+        """Returns the median time and the plan of every query"""
+        results = {}
+        for name, queryset in benchmark_queries(user, annual_budget):
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            if connection.vendor == 'postgresql':
+                plan = queryset.explain(analyze=True)
+            else:
+                plan = queryset.explain()
+            results[name] = (statistics.median(timings), plan)
+        return results
@@ -0,0 +1,132 @@
+import asyncio
+import statistics
+import time
+from urllib.parse import urlsplit
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    """Django command to load a running server with concurrent clients.
+
+    ``--connections`` clients send requests back to back (one connection
+    per request) while ``--slow-clients`` connections trickle their
+    request headers to hold sockets open, like slow mobile clients. Run it
+    against the WSGI and the ASGI deployment (docker-compose.asgi.yml) to
+    compare how many connections each one keeps serving.
+    """
+    help = 'Load tests a running server with fast and slow clients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('url', help='e.g. http://localhost:8010/api/'
+                                        'expenses/expensestag/')
+        parser.add_argument('--token', help='API token of the user')
+        parser.add_argument('--connections', type=int, default=50)
+        parser.add_argument('--slow-clients', type=int, default=0)
+        parser.add_argument('--slow-interval', type=float, default=1.0,
+                            help='Seconds between the slow clients lines')
+        parser.add_argument('--duration', type=float, default=10.0)
+        parser.add_argument('--timeout', type=float, default=10.0)
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['url'])
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError('Only http:// URLs are supported')
+        stats = asyncio.get_event_loop().run_until_complete(
+            self.run(url, options)
+        )
+        latencies = sorted(stats['latencies'])
+        self.stdout.write(
+            f"requests: {len(latencies)} "
+            f"({len(latencies) / options['duration']:.1f}/s), "
+            f"errors: {stats['errors']}, timeouts: {stats['timeouts']}"
+        )
+        if latencies:
+            self.stdout.write(
+                f'latency ms p50: {self.percentile(latencies, 50):.1f} '
+                f'p95: {self.percentile(latencies, 95):.1f} '
+                f'p99: {self.percentile(latencies, 99):.1f} '
+                f'mean: {statistics.mean(latencies):.1f}'
+            )
+
+    def percentile(self, values, percent):
+        index = min(len(values) - 1, int(len(values) * percent / 100))
+        return values[index]
+
+    def request_lines(self, url, token):
+        path = url.path or '/'
+        if url.query:
+            path += '?' + url.query
+        lines = [f'GET {path} HTTP/1.1', f'Host: {url.netloc}',
+                 'Accept: application/json', 'Connection: close']
+        if token:
+            lines.append(f'Authorization: Token {token}')
+        return [(line + '\r\n').encode('latin1') for line in lines]
+
+    async def run(self, url, options):
+        stats = {'latencies': [], 'errors': 0, 'timeouts': 0}
+        deadline = time.monotonic() + options['duration']
+        lines = self.request_lines(url, options['token'])
+        clients = [self.fast_client(url, lines, deadline, options, stats)
+                   for _ in range(options['connections'])]
+        clients.extend(self.slow_client(url, lines, deadline, options)
+                       for _ in range(options['slow_clients']))
+        await asyncio.gather(*clients)
+        return stats
+
+    async def fast_client(self, url, lines, deadline, options, stats):
+        while time.monotonic() < deadline:
+            start = time.monotonic()
+            try:
+                status = await asyncio.wait_for(
+                    self.fetch(url, lines), options['timeout']
+                )
+            except asyncio.TimeoutError:
+                stats['timeouts'] += 1
+                continue
+            except OSError:
+                stats['errors'] += 1
+                await asyncio.sleep(0.1)
+                continue
+            if status != 200:
+                stats['errors'] += 1
+                continue
+            stats['latencies'].append((time.monotonic() - start) * 1000)
+
+    async def fetch(self, url, lines):
+        reader, writer = await asyncio.open_connection(url.hostname,
+                                                       url.port or 80)
+        try:
+            writer.write(b''.join(lines) + b'\r\n')
+            await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()
+        finally:
+            writer.close()
+        parts = status_line.split()
+        return int(parts[1]) if len(parts) > 1 else 0
+
+    async def slow_client(self, url, lines, deadline, options):
+        """Holds a connection open by sending its headers line by line"""
+        while time.monotonic() < deadline:
+            try:
+                reader, writer = await asyncio.open_connection(
+                    url.hostname, url.port or 80
+                )
+            except OSError:
+                await asyncio.sleep(options['slow_interval'])
+                continue
+            try:
+                for line in lines:
+                    writer.write(line)
+                    await writer.drain()
+                    await asyncio.sleep(options['slow_interval'])
+                    if time.monotonic() >= deadline:
+                        break
+                else:
+                    writer.write(b'\r\n')
+                    await writer.drain()
+                    await reader.read()
+            except OSError:
+                pass
+            finally:
+                writer.close()
@@ -0,0 +1,71 @@
+import statistics
+import time
+from unittest import mock
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+from benchmarks.generator import generate
+from expenses import views
+
+
+VIEWSETS = (
+    ('expense', views.ExpenseViewSet),
+    ('income', views.IncomeViewSet),
+)
+
+
+class Command(BaseCommand):
+    """Django command to compare the rows/sec of list responses rendered by
+    the serializers and by the values() fast path. The data is seeded in a
+    transaction that is rolled back."""
+    help = 'Benchmarks the list serialization paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=20000,
+                            help='Expenses of the benchmark user')
+        parser.add_argument('--page-size', type=int, default=1000)
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def handle(self, *args, **options):
+        # The requests are built with APIRequestFactory's 'testserver' host
+        with transaction.atomic(), \
+                override_settings(ALLOWED_HOSTS=['testserver']):
+            self.stdout.write('Seeding data...')
+            user = generate(users=1, expenses=options['rows'],
+                            incomes=options['rows']).first()
+            results = [
+                (name, query, self.measure(viewset, user, query, options))
+                for name, viewset in VIEWSETS
+                for query in ('', 'expand=names', 'layout=columns')
+            ]
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'{"list":<28}{"serializer rows/s":>20}'
+                          f'{"fast rows/s":>14}{"speedup":>10}')
+        for name, query, (slow, fast) in results:
+            label = f'{name} {query}'.strip()
+            self.stdout.write(f'{label:<28}{slow:>20.0f}{fast:>14.0f}'
+                              f'{fast / slow:>9.2f}x')
+
+    def measure(self, viewset, user, query, options):
+        """Returns the median rows/sec of the serializer and fast paths"""
+        view = viewset.as_view({'get': 'list'})
+        page_size = options['page_size']
+        request_url = f'/?page_size={page_size}&{query}'
+        rates = []
+        for fast_list in (False, True):
+            timings = []
+            rows = 0
+            for _ in range(options['repeat']):
+                request = APIRequestFactory().get(request_url)
+                force_authenticate(request, user=user)
+                with mock.patch.object(viewset, 'fast_list', fast_list):
+                    start = time.perf_counter()
+                    response = view(request)
+                    response.render()
+                    timings.append(time.perf_counter() - start)
+                results = response.data['results']
+                rows = len(results['rows'] if 'rows' in results else results)
+            rates.append(rows / statistics.median(timings))
+        return rates
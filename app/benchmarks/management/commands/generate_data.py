@@ -0,0 +1,42 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+from benchmarks.generator import generate
+from core.models import Expense
+
+
+class Command(BaseCommand):
+    """Django command to seed synthetic users for load tests against a
+    running server (see bench_load). Prints an API token per user."""
+    help = 'Seeds synthetic users with budgets, expenses and incomes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10)
+        parser.add_argument('--expenses', type=int, default=5000,
+                            help='Expenses per user')
+        parser.add_argument('--incomes', type=int, default=None,
+                            help='Incomes per user (expenses / 20)')
+        parser.add_argument('--tags', type=int, default=8)
+        parser.add_argument('--years', type=int, default=3)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--email', default='bench{}@example.com',
+                            help='Format of the user emails')
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        with transaction.atomic():
+            users = generate(
+                users=options['users'], expenses=options['expenses'],
+                incomes=options['incomes'], tags=options['tags'],
+                years=options['years'], seed=options['seed'],
+                email=options['email']
+            )
+            tokens = [Token.objects.get_or_create(user=user)[0]
+                      for user in users]
+        elapsed = time.perf_counter() - start
+        rows = Expense.objects.filter(user__in=users).count()
+        self.stdout.write(f'{len(tokens)} users, {rows} expenses in '
+                          f'{elapsed:.1f}s ({rows / elapsed:.0f} rows/s)')
+        for token in tokens:
+            self.stdout.write(f'{token.user.email} {token.key}')
@@ -8,3 +8,45 @@ class UserAdmin(admin.ModelAdmin):
     list_display_links = ['email', 'name']
     ordering = ['email']
     search_fields = ['email', 'name']
+
+
+@admin.register(models.AnnualBudget)
+class AnnualBudgetAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'user', 'amount']
+    list_select_related = ['user']
+    ordering = ['-year']
+
+
+@admin.register(models.ExpensesTag)
+class ExpensesTagAdmin(admin.ModelAdmin):
+    list_display = ['name', 'user']
+    list_select_related = ['user']
+    search_fields = ['name']
+
+
+@admin.register(models.MonthBudget)
+class MonthBudgetAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'annual_budget', 'user', 'amount']
+    list_select_related = ['expenses_tag', 'annual_budget', 'user']
+
+
+@admin.register(models.Expense)
+class ExpenseAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'date', 'user', 'amount']
+    list_select_related = ['expenses_tag', 'month_budget__expenses_tag',
+                           'user']
+    ordering = ['-date', '-id']
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'month_budget':
+            kwargs['queryset'] = models.MonthBudget.objects.select_related(
+                'expenses_tag'
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+@admin.register(models.Income)
+class IncomeAdmin(admin.ModelAdmin):
+    list_display = ['date', 'user', 'amount', 'periodicity']
+    list_select_related = ['user']
+    ordering = ['-date', '-id']
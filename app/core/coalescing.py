@@ -0,0 +1,54 @@
+import threading
+
+
+class Flight:
+    """An in flight call and, once ``done`` is set, its result"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.failed = False
+
+
+class SingleFlight:
+    """Runs one call per key at a time in this process.
+
+    Callers asking for a key while a call of it is in flight wait for that
+    call and share its result instead of running their own. When the
+    call fails or takes longer than ``timeout`` seconds, each waiting
+    caller runs its own.
+    """
+
+    def __init__(self):
+        self._flights = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, function, timeout=None):
+        """Returns the result of ``function`` and whether it was shared
+        from another caller"""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = Flight()
+        if not leader:
+            if flight.done.wait(timeout) and not flight.failed:
+                return flight.result, True
+            return function(), False
+        try:
+            flight.result = function()
+        except BaseException:
+            flight.failed = True
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result, False
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._flights)
+
+
+single_flight = SingleFlight()
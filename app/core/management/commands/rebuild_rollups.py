@@ -0,0 +1,31 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from core import rollups
+
+
+class Command(BaseCommand):
+    """Django command to rebuild or verify the monthly rollups"""
+    help = 'Rebuilds the monthly rollups from the expenses and incomes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help='Only compare the rollups with raw data')
+        parser.add_argument('--user', action='append', dest='emails',
+                            help='Restrict to the user with this email')
+
+    def handle(self, *args, **options):
+        users = None
+        if options['emails']:
+            users = get_user_model().objects.filter(
+                email__in=options['emails']
+            )
+        if not options['check']:
+            rows = rollups.rebuild(users)
+            self.stdout.write(self.style.SUCCESS(f'{rows} rollups rebuilt'))
+            return
+        mismatches = rollups.differences(users)
+        for key, expected, stored in mismatches:
+            self.stdout.write(f'{key}: expected {expected}, stored {stored}')
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} rollups out of date')
+        self.stdout.write(self.style.SUCCESS('Rollups are up to date'))
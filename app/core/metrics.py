@@ -0,0 +1,270 @@
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from django.conf import settings
+from rest_framework import serializers
+
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+def metrics_settings():
+    """Returns the PERF_METRICS setting merged with the defaults"""
+    options = {
+        'SAMPLE_RATE': 0.0,
+        'LOG': False,
+        'TOKEN': None,
+    }
+    options.update(getattr(settings, 'PERF_METRICS', {}))
+    return options
+
+
+class Histogram:
+    """Thread safe Prometheus histogram with a ``view`` label"""
+
+    def __init__(self, name, description, buckets):
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, view, value):
+        with self._lock:
+            series = self._series.get(view)
+            if series is None:
+                series = self._series[view] = \
+                    [[0] * (len(self.buckets) + 1), 0, 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+    def exposition(self, worker):
+        """Returns the lines of the histogram in the Prometheus text
+        format"""
+        with self._lock:
+            series = [(view, list(counts), total, count)
+                      for view, (counts, total, count)
+                      in sorted(self._series.items())]
+        lines = [f'# HELP {self.name} {self.description}',
+                 f'# TYPE {self.name} histogram']
+        for view, counts, total, count in series:
+            labels = f'view="{escape_label(view)}",worker="{worker}"'
+            cumulative = 0
+            bounds = [str(bound) for bound in self.buckets] + ['+Inf']
+            for bound, bucket_count in zip(bounds, counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} '
+                             f'{cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+        return lines
+
+
+class Counter:
+    """Thread safe Prometheus counter with one label"""
+
+    def __init__(self, name, description, label):
+        self.name = name
+        self.description = description
+        self.label = label
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, value, amount=1):
+        with self._lock:
+            self._values[value] = self._values.get(value, 0) + amount
+
+    def get(self, value):
+        with self._lock:
+            return self._values.get(value, 0)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def exposition(self, worker):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f'# HELP {self.name} {self.description}',
+                 f'# TYPE {self.name} counter']
+        lines.extend(
+            f'{self.name}{{{self.label}="{escape_label(value)}",'
+            f'worker="{worker}"}} {count}'
+            for value, count in values
+        )
+        return lines
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+# Sample attribute -> histogram
+HISTOGRAMS = {
+    'duration': Histogram('http_request_duration_seconds',
+                          'Time to build the response', SECONDS_BUCKETS),
+    'queries': Histogram('http_request_db_queries',
+                         'DB queries per request', QUERIES_BUCKETS),
+    'db_time': Histogram('http_request_db_duration_seconds',
+                         'Time spent in DB queries', SECONDS_BUCKETS),
+    'serializer_time': Histogram('http_request_serializer_duration_seconds',
+                                 'Time spent building the response data',
+                                 SECONDS_BUCKETS),
+    'render_time': Histogram('http_request_render_duration_seconds',
+                             'Time spent rendering the response data',
+                             SECONDS_BUCKETS),
+    'size': Histogram('http_response_size_bytes',
+                      'Size of the (non streaming) response bodies',
+                      BYTES_BUCKETS),
+}
+
+
+COUNTERS = {
+    'response_cache': Counter('response_cache_lookups_total',
+                              'Response cache lookups', 'result'),
+}
+
+
+class Sample:
+    """Measurements of one sampled request"""
+
+    def __init__(self):
+        self.view = 'unresolved'
+        self.duration = 0.0
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.render_time = 0.0
+        self.size = None
+
+    def record_query(self, execute, sql, params, many, context):
+        """``execute_wrapper`` counting the queries and their time"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+# The sample of the request running in this thread
+_local = threading.local()
+
+
+def start(sample):
+    """Makes ``sample`` the sample of this thread, returns the previous"""
+    previous = getattr(_local, 'sample', None)
+    _local.sample = sample
+    return previous
+
+
+def current():
+    return getattr(_local, 'sample', None)
+
+
+@contextmanager
+def timed(attribute):
+    """Adds the time of the block to an attribute of the current sample,
+    when the request is sampled"""
+    sample = getattr(_local, 'sample', None)
+    if sample is None:
+        yield
+        return
+    begin = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(sample, attribute,
+                getattr(sample, attribute) + time.perf_counter() - begin)
+
+
+def record(sample, request, response):
+    """Adds a finished sample to the histograms and logs it"""
+    for attribute, histogram in HISTOGRAMS.items():
+        value = getattr(sample, attribute)
+        if value is not None:
+            histogram.observe(sample.view, value)
+    if metrics_settings()['LOG']:
+        logger.info(json.dumps({
+            'view': sample.view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round(sample.duration * 1000, 2),
+            'db_queries': sample.queries,
+            'db_ms': round(sample.db_time * 1000, 2),
+            'serializer_ms': round(sample.serializer_time * 1000, 2),
+            'render_ms': round(sample.render_time * 1000, 2),
+            'response_bytes': sample.size,
+        }))
+
+
+def exposition(histograms=True):
+    """Returns the counters and, unless ``histograms`` is False, the
+    histograms of this process in the Prometheus text format"""
+    worker = os.getpid()
+    lines = []
+    for histogram in HISTOGRAMS.values() if histograms else ():
+        lines.extend(histogram.exposition(worker))
+    for counter in COUNTERS.values():
+        lines.extend(counter.exposition(worker))
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    for histogram in HISTOGRAMS.values():
+        histogram.clear()
+    for counter in COUNTERS.values():
+        counter.clear()
+
+
+def exempt(view_func):
+    """Marks a view whose requests are never recorded, like the metrics
+    scrapes"""
+    view_func.perf_exempt = True
+    return view_func
+
+
+def view_name(view_func, method):
+    """Names a resolved view like ``ExpenseViewSet.list``"""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__name__', type(view_func).__name__)
+    method = method.lower()
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{cls.__name__}.{actions.get(method, method)}'
+
+
+class TimedListSerializer(serializers.ListSerializer):
+    """List serializer counting ``.data`` as serializer time"""
+
+    @property
+    def data(self):
+        with timed('serializer_time'):
+            return super().data
+
+
+class TimedSerializerMixin:
+    """Counts ``.data`` as serializer time of the sampled request. Set
+    ``Meta.list_serializer_class`` to ``TimedListSerializer`` to count
+    lists too."""
+
+    @property
+    def data(self):
+        with timed('serializer_time'):
+            return super().data
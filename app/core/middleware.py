@@ -0,0 +1,103 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from core import metrics
+from core.query_audit import QueryAuditor, audit_settings
+
+
+logger = logging.getLogger('core.query_audit')
+
+
+class PerformanceMiddleware:
+    """Records the latency, DB queries and time, serializer and render time
+    and response size of a sample of the requests, per view.
+
+    The samples go to the histograms served by ``core.views.metrics`` and,
+    with ``PERF_METRICS['LOG']``, to a JSON log line. With a
+    ``SAMPLE_RATE`` of 0 the middleware removes itself from the chain, so
+    it costs nothing when disabled. Streaming bodies are sent after the
+    middleware returns and aren't measured.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = metrics.metrics_settings()['SAMPLE_RATE']
+        if self.sample_rate <= 0:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        if random.random() >= self.sample_rate:
+            return self.get_response(request)
+        sample = metrics.Sample()
+        request.perf_sample = sample
+        previous = metrics.start(sample)
+        begin = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(sample.record_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            metrics.start(previous)
+        if request.perf_sample is None:
+            return response
+        sample.duration = time.perf_counter() - begin
+        if not response.streaming:
+            sample.size = len(response.content)
+        metrics.record(sample, request, response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        sample = getattr(request, 'perf_sample', None)
+        if sample is None:
+            return
+        if getattr(view_func, 'perf_exempt', False):
+            request.perf_sample = None
+        else:
+            sample.view = metrics.view_name(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        """Times the rendering, which happens right after this hook of the
+        outermost middleware"""
+        sample = getattr(request, 'perf_sample', None)
+        if sample is not None:
+            begin = time.perf_counter()
+
+            def rendered(response):
+                sample.render_time += time.perf_counter() - begin
+
+            response.add_post_render_callback(rendered)
+        return response
+
+
+class QueryAuditMiddleware:
+    """Audits the queries of every request with ``QueryAuditor`` and logs
+    a JSON warning for the requests with N+1 patterns, slow queries or
+    sequential scans. Meant for staging; enabled with
+    ``QUERY_AUDIT['ENABLED']``."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if not audit_settings()['ENABLED']:
+            raise MiddlewareNotUsed
+
+    def __call__(self, request):
+        auditor = QueryAuditor()
+        with auditor.audit():
+            response = self.get_response(request)
+        findings = auditor.findings()
+        if findings:
+            logger.warning(json.dumps(dict(
+                method=request.method,
+                path=request.path,
+                status=response.status_code,
+                queries=len(auditor.queries),
+                **findings
+            )))
+        return response
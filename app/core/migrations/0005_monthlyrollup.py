@@ -0,0 +1,67 @@
+# Generated by Django 3.0.14 on 2026-10-18 10:37
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear
+import django.db.models.deletion
+
+
+def populate_rollups(apps, schema_editor):
+    """Seeds the rollups from the rows that already exist"""
+    Expense = apps.get_model('core', 'Expense')
+    Income = apps.get_model('core', 'Income')
+    MonthlyRollup = apps.get_model('core', 'MonthlyRollup')
+    expenses = Expense.objects.annotate(
+        year=ExtractYear('date'),
+        month=ExtractMonth('date'),
+        tag=Coalesce('expenses_tag', 'month_budget__expenses_tag'),
+    ).values('user', 'year', 'month', 'tag').annotate(
+        total=Sum('amount'), count=Count('id')
+    ).order_by()
+    incomes = Income.objects.annotate(
+        year=ExtractYear('date'),
+        month=ExtractMonth('date'),
+    ).values('user', 'year', 'month').annotate(
+        total=Sum('amount'), count=Count('id')
+    ).order_by()
+    rows = [
+        MonthlyRollup(user_id=row['user'], year=row['year'],
+                      month=row['month'], expenses_tag_id=row['tag'],
+                      kind='e', total=row['total'], count=row['count'])
+        for row in expenses
+    ]
+    rows.extend(
+        MonthlyRollup(user_id=row['user'], year=row['year'],
+                      month=row['month'], kind='i', total=row['total'],
+                      count=row['count'])
+        for row in incomes
+    )
+    MonthlyRollup.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_auto_20200519_2013'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MonthlyRollup',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField(verbose_name='Year')),
+                ('month', models.PositiveSmallIntegerField(verbose_name='Month')),
+                ('kind', models.CharField(choices=[('e', 'Expense'), ('i', 'Income')], max_length=1)),
+                ('total', models.FloatField(default=0)),
+                ('count', models.IntegerField(default=0)),
+                ('expenses_tag', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.ExpensesTag', verbose_name='Expenses tag')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'unique_together': {('user', 'year', 'month', 'expenses_tag', 'kind')},
+            },
+        ),
+        migrations.RunPython(populate_rollups, migrations.RunPython.noop),
+    ]
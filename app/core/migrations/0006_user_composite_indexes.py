@@ -0,0 +1,29 @@
+# Generated by Django 3.0.14 on 2026-10-18 10:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_monthlyrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'date'], name='expense_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expensestag',
+            index=models.Index(fields=['user', 'name'], name='expensestag_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['user', 'date'], name='income_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='monthbudget',
+            index=models.Index(fields=['user', 'annual_budget'], name='monthbudget_user_annual_idx'),
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 3.0.14 on 2026-10-18 10:43
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+VERSIONED_MODELS = ('annualbudget', 'expensestag', 'monthbudget', 'expense',
+                    'income')
+
+
+def seed_versions(apps, schema_editor):
+    """Starts a version for every collection that already has rows"""
+    CollectionVersion = apps.get_model('core', 'CollectionVersion')
+    versions = []
+    for model_name in VERSIONED_MODELS:
+        model = apps.get_model('core', model_name)
+        users = model.objects.values_list('user', flat=True).distinct()
+        versions.extend(
+            CollectionVersion(user_id=user_id, collection=f'core.{model_name}',
+                              revision=1)
+            for user_id in users.order_by()
+        )
+    CollectionVersion.objects.bulk_create(versions)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_user_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='annualbudget',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Updated at'),
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Updated at'),
+        ),
+        migrations.AddField(
+            model_name='income',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Updated at'),
+        ),
+        migrations.AddField(
+            model_name='monthbudget',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Updated at'),
+        ),
+        migrations.CreateModel(
+            name='CollectionVersion',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('collection', models.CharField(max_length=100)),
+                ('revision', models.PositiveIntegerField(default=0)),
+                ('modified', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'unique_together': {('user', 'collection')},
+            },
+        ),
+        migrations.RunPython(seed_versions, migrations.RunPython.noop),
+    ]
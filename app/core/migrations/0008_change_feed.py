@@ -0,0 +1,51 @@
+# Generated by Django 3.0.14 on 2026-10-18 10:44
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+SYNCED_MODELS = ('annualbudget', 'expensestag', 'monthbudget', 'expense',
+                 'income')
+
+
+def seed_changes(apps, schema_editor):
+    """Records the existing rows as created so a first sync returns them"""
+    Change = apps.get_model('core', 'Change')
+    for model_name in SYNCED_MODELS:
+        model = apps.get_model('core', model_name)
+        rows = model.objects.order_by('pk').values_list('pk', 'user')
+        batch = []
+        for pk, user_id in rows.iterator(chunk_size=2000):
+            batch.append(Change(user_id=user_id, object_id=pk, action='c',
+                                collection=f'core.{model_name}'))
+            if len(batch) == 2000:
+                Change.objects.bulk_create(batch)
+                batch = []
+        Change.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_collection_versions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Change',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('collection', models.CharField(max_length=100)),
+                ('object_id', models.PositiveIntegerField()),
+                ('action', models.CharField(choices=[('c', 'Created'), ('u', 'Updated'), ('d', 'Deleted')], max_length=1)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='change',
+            index=models.Index(fields=['user', 'id'], name='change_user_id_idx'),
+        ),
+        migrations.RunPython(seed_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 3.0.14 on 2026-10-18 10:54
+
+import core.models
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear
+
+
+def recompute_rollups(apps, schema_editor):
+    """Recomputes the rollup totals with exact SQL sums of the decimal
+    amounts, dropping the drift accumulated by the float totals"""
+    Expense = apps.get_model('core', 'Expense')
+    Income = apps.get_model('core', 'Income')
+    MonthlyRollup = apps.get_model('core', 'MonthlyRollup')
+    expenses = Expense.objects.annotate(
+        year=ExtractYear('date'),
+        month=ExtractMonth('date'),
+        tag=Coalesce('expenses_tag', 'month_budget__expenses_tag'),
+    ).values('user', 'year', 'month', 'tag').annotate(
+        total=Sum('amount'), count=Count('id')
+    ).order_by()
+    incomes = Income.objects.annotate(
+        year=ExtractYear('date'),
+        month=ExtractMonth('date'),
+    ).values('user', 'year', 'month').annotate(
+        total=Sum('amount'), count=Count('id')
+    ).order_by()
+    rows = [
+        MonthlyRollup(user_id=row['user'], year=row['year'],
+                      month=row['month'], expenses_tag_id=row['tag'],
+                      kind='e', total=row['total'], count=row['count'])
+        for row in expenses
+    ]
+    rows.extend(
+        MonthlyRollup(user_id=row['user'], year=row['year'],
+                      month=row['month'], kind='i', total=row['total'],
+                      count=row['count'])
+        for row in incomes
+    )
+    MonthlyRollup.objects.all().delete()
+    MonthlyRollup.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_importjob'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='annualbudget',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=12, validators=[core.models.validate_cero], verbose_name='Cantidad'),
+        ),
+        migrations.AlterField(
+            model_name='expense',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=12, validators=[core.models.validate_cero], verbose_name='Cantidad'),
+        ),
+        migrations.AlterField(
+            model_name='income',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=12, validators=[core.models.validate_cero], verbose_name='Cantidad'),
+        ),
+        migrations.AlterField(
+            model_name='monthbudget',
+            name='amount',
+            field=models.DecimalField(decimal_places=2, max_digits=12, validators=[core.models.validate_cero], verbose_name='Cantidad'),
+        ),
+        migrations.AlterField(
+            model_name='monthlyrollup',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.RunPython(recompute_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 3.0.14 on 2026-10-18 13:05
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Max
+import django.db.models.deletion
+
+
+def number_changes(apps, schema_editor):
+    """Keeps the ids as the revisions of the existing changes, so the
+    revisions clients synced to stay valid, and starts the sequence of
+    every user after them"""
+    Change = apps.get_model('core', 'Change')
+    ChangeFeed = apps.get_model('core', 'ChangeFeed')
+    Change.objects.update(revision=F('id'))
+    latest = Change.objects.values('user').annotate(
+        revision=Max('id')
+    ).order_by()
+    ChangeFeed.objects.bulk_create([
+        ChangeFeed(user_id=row['user'], revision=row['revision'])
+        for row in latest
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_decimal_amounts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeFeed',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revision', models.BigIntegerField(default=0)),
+                ('pruned_revision', models.BigIntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='change',
+            name='revision',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.RunPython(number_changes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='change',
+            name='revision',
+            field=models.BigIntegerField(),
+        ),
+        migrations.RemoveIndex(
+            model_name='change',
+            name='change_user_id_idx',
+        ),
+        migrations.AlterUniqueTogether(
+            name='change',
+            unique_together={('user', 'revision')},
+        ),
+    ]
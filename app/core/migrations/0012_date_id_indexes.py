@@ -0,0 +1,29 @@
+# Generated by Django 3.0.14 on 2026-10-18 15:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_change_feed_revisions'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='expense',
+            name='expense_user_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='income',
+            name='income_user_date_idx',
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['user', 'date', 'id'], name='expense_user_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='income',
+            index=models.Index(fields=['user', 'date', 'id'], name='income_user_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 3.0.14 on 2026-10-18 16:02
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_untagged_duplicates(apps, schema_editor):
+    """Folds the untagged rollups created twice by concurrent writes into
+    the oldest row of their key"""
+    MonthlyRollup = apps.get_model('core', 'MonthlyRollup')
+    duplicates = MonthlyRollup.objects.filter(
+        expenses_tag__isnull=True
+    ).values('user', 'year', 'month', 'kind').annotate(
+        rows=Count('id'), first=Min('id'), total_sum=Sum('total'),
+        count_sum=Sum('count')
+    ).filter(rows__gt=1).order_by()
+    for row in duplicates:
+        rollups = MonthlyRollup.objects.filter(
+            user=row['user'], year=row['year'], month=row['month'],
+            kind=row['kind'], expenses_tag__isnull=True
+        )
+        rollups.exclude(id=row['first']).delete()
+        rollups.update(total=row['total_sum'], count=row['count_sum'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_date_id_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_untagged_duplicates,
+                             migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='monthlyrollup',
+            constraint=models.UniqueConstraint(condition=models.Q(expenses_tag__isnull=True), fields=('user', 'year', 'month', 'kind'), name='rollup_untagged_unique'),
+        ),
+    ]
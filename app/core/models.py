@@ -1,5 +1,6 @@
 from django.db import models
 from django.core.exceptions import ValidationError
+from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, \
                                         PermissionsMixin
 from django.utils.translation import gettext_lazy as _
@@ -24,10 +25,16 @@ def current_year():
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
         """Creates and saves a new user"""
+        return self.create_user_with_hash(email, make_password(password),
+                                          **extra_fields)
+
+    def create_user_with_hash(self, email, password_hash, **extra_fields):
+        """Creates and saves a new user whose password is hashed already,
+        e.g. by the hashing pool of user.credentials"""
         if not email:
             raise ValueError('Users must have an email address')
-        user = self.model(email=self.normalize_email(email), **extra_fields)
-        user.set_password(password)
+        user = self.model(email=self.normalize_email(email),
+                          password=password_hash, **extra_fields)
         user.save(using=self._db)
         return user
 
@@ -54,10 +61,12 @@ class BaseBudget(models.Model):
     """Base budget model that validates amount"""
     description = models.CharField(max_length=255,
                                    verbose_name='Descripción', blank=True)
-    amount = models.FloatField(verbose_name='Cantidad',
-                               validators=[validate_cero])
+    amount = models.DecimalField(verbose_name='Cantidad', max_digits=12,
+                                 decimal_places=2, validators=[validate_cero])
     user = models.ForeignKey('User', on_delete=models.CASCADE,
                              verbose_name='Usuario')
+    updated_at = models.DateTimeField(auto_now=True,
+                                      verbose_name=_('Updated at'))
 
     class Meta:
         abstract = True
@@ -84,6 +93,12 @@ class AnnualBudget(BaseBudget):
 
 class ExpensesTag(BaseTag):
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'name'],
+                         name='expensestag_user_name_idx'),
+        ]
+
     def __str__(self):
         return _('Expense') + ' ' + self.name
 
@@ -94,6 +109,12 @@ class MonthBudget(BaseBudget):
     expenses_tag = models.ForeignKey('ExpensesTag', on_delete=models.CASCADE,
                                      verbose_name=_('Expenses tag'))
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'annual_budget'],
+                         name='monthbudget_user_annual_idx'),
+        ]
+
     def __str__(self):
         return _('Budget for') + ' ' + self.expenses_tag.name
 
@@ -116,13 +137,23 @@ class Expense(BaseBudget):
         verbose_name=_('Month budget')
     )
 
-    def save(self, *args, **kwargs):
-        if self.expenses_tag and self.month_budget:
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date', 'id'],
+                         name='expense_user_date_id_idx'),
+        ]
+
+    def validate_budget_choice(self):
+        """Checks that exactly one of month budget or expenses tag is set"""
+        if self.expenses_tag_id and self.month_budget_id:
             raise ValueError(_("""You can choose just one option:
                                   month budget or expenses tag"""))
-        elif not self.expenses_tag and not self.month_budget:
+        elif not self.expenses_tag_id and not self.month_budget_id:
             raise ValueError(_("""You need to choose just option:
                                   month budget or expenses tag"""))
+
+    def save(self, *args, **kwargs):
+        self.validate_budget_choice()
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -140,3 +171,140 @@ class Income(BaseBudget):
     periodicity = models.CharField(max_length=255, blank=True,
                                    choices=periodicityChoices)
     date = models.DateField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'date', 'id'],
+                         name='income_user_date_id_idx'),
+        ]
+
+
+class MonthlyRollup(models.Model):
+    """Running totals of expenses and incomes per user, month and tag.
+
+    Rows are maintained incrementally by ``core.signals`` and can be
+    rebuilt with the ``rebuild_rollups`` management command.
+    """
+    EXPENSE = 'e'
+    INCOME = 'i'
+    kindChoices = (
+        (EXPENSE, _('Expense')),
+        (INCOME, _('Income'))
+    )
+    user = models.ForeignKey('User', on_delete=models.CASCADE,
+                             verbose_name=_('User'))
+    year = models.IntegerField(verbose_name=_('Year'))
+    month = models.PositiveSmallIntegerField(verbose_name=_('Month'))
+    expenses_tag = models.ForeignKey('ExpensesTag', on_delete=models.CASCADE,
+                                     blank=True, null=True,
+                                     verbose_name=_('Expenses tag'))
+    kind = models.CharField(max_length=1, choices=kindChoices)
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ['user', 'year', 'month', 'expenses_tag', 'kind']
+        # NULLs are distinct in unique indexes, so untagged rows (incomes)
+        # need their own constraint
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'year', 'month', 'kind'],
+                condition=models.Q(expenses_tag__isnull=True),
+                name='rollup_untagged_unique'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.year}-{self.month:02d} {self.get_kind_display()}'
+
+
+class CollectionVersion(models.Model):
+    """Revision counter of a user's rows of one model.
+
+    Bumped by ``core.signals`` on every write so clients can revalidate
+    their copy of a collection without reading it.
+    """
+    user = models.ForeignKey('User', on_delete=models.CASCADE,
+                             verbose_name=_('User'))
+    collection = models.CharField(max_length=100)
+    revision = models.PositiveIntegerField(default=0)
+    modified = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['user', 'collection']
+
+    def __str__(self):
+        return f'{self.collection} r{self.revision}'
+
+
+class ChangeFeed(models.Model):
+    """Revision sequence of a user's change feed.
+
+    Changes take their revision from here while holding the row lock
+    until their transaction commits, so the revisions of a user become
+    visible in order. ``pruned_revision`` is the last revision removed by
+    the ``prune_changes`` command.
+    """
+    user = models.OneToOneField('User', on_delete=models.CASCADE,
+                                verbose_name=_('User'))
+    revision = models.BigIntegerField(default=0)
+    pruned_revision = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'r{self.revision}'
+
+
+class Change(models.Model):
+    """Change feed entry of a user's row, deletions included (tombstones).
+
+    ``revision`` comes from the user's ``ChangeFeed`` and is what clients
+    sync from.
+    """
+    CREATED = 'c'
+    UPDATED = 'u'
+    DELETED = 'd'
+    actionChoices = (
+        (CREATED, _('Created')),
+        (UPDATED, _('Updated')),
+        (DELETED, _('Deleted'))
+    )
+    id = models.BigAutoField(primary_key=True)
+    user = models.ForeignKey('User', on_delete=models.CASCADE,
+                             verbose_name=_('User'))
+    collection = models.CharField(max_length=100)
+    object_id = models.PositiveIntegerField()
+    action = models.CharField(max_length=1, choices=actionChoices)
+    revision = models.BigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ['user', 'revision']
+
+    def __str__(self):
+        return f'{self.collection} {self.object_id} {self.action}'
+
+
+class ImportJob(models.Model):
+    """Progress of a bank statement import, used to resume it"""
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    statusChoices = (
+        (RUNNING, _('Running')),
+        (DONE, _('Done')),
+        (FAILED, _('Failed'))
+    )
+    user = models.ForeignKey('User', on_delete=models.CASCADE,
+                             verbose_name=_('User'))
+    source = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=10, choices=statusChoices,
+                              default=RUNNING)
+    rows_done = models.PositiveIntegerField(default=0)
+    expenses = models.PositiveIntegerField(default=0)
+    incomes = models.PositiveIntegerField(default=0)
+    skipped = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.source} ({self.status})'
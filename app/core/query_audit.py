@@ -0,0 +1,152 @@
+import random
+import re
+import time
+from collections import Counter, namedtuple
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+
+AuditedQuery = namedtuple('AuditedQuery',
+                          ('alias', 'sql', 'params', 'many', 'duration'))
+
+IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+# Statements the transaction machinery repeats on its own
+IGNORED_SHAPES = re.compile(r'^(?:SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO '
+                            r'SAVEPOINT|BEGIN|COMMIT|ROLLBACK)\b')
+# PostgreSQL EXPLAIN lines and SQLite EXPLAIN QUERY PLAN details
+SEQ_SCAN_PATTERNS = (
+    re.compile(r'Seq Scan on (\w+)'),
+    re.compile(r'^SCAN (?:TABLE )?(\w+)\s*$'),
+)
+
+
+def audit_settings():
+    """Returns the QUERY_AUDIT setting merged with the defaults"""
+    options = {
+        'ENABLED': False,
+        'REPEAT_THRESHOLD': 3,
+        'SLOW_MS': 100,
+        'EXPLAIN_RATE': 0.0,
+    }
+    options.update(getattr(settings, 'QUERY_AUDIT', {}))
+    return options
+
+
+def query_shape(sql):
+    """Normalizes the SQL of a query so that queries differing only by
+    their values (including the length of ``IN`` lists) are equal"""
+    sql = IN_LIST.sub('IN (...)', sql)
+    sql = STRING_LITERAL.sub('?', sql)
+    return NUMBER_LITERAL.sub('?', sql)
+
+
+def seq_scans(plan_rows):
+    """Returns the tables read by sequential scans in EXPLAIN output"""
+    tables = []
+    for row in plan_rows:
+        line = str(row[-1])
+        for pattern in SEQ_SCAN_PATTERNS:
+            match = pattern.search(line)
+            if match:
+                tables.append(match.group(1))
+    return tables
+
+
+class QueryAuditor:
+    """Records the queries of a block of code through
+    ``connection.execute_wrapper`` and reports the suspicious ones:
+
+    * ``repeated``: the same SQL shape run ``REPEAT_THRESHOLD`` times or
+      more, which is how N+1 queries look like,
+    * ``slow``: queries over ``SLOW_MS`` milliseconds,
+    * ``seq_scans``: sequential scans in the plan of the SELECT shapes,
+      each shape explained with a probability of ``EXPLAIN_RATE`` once
+      the block is done.
+
+    Options default to the QUERY_AUDIT setting.
+    """
+
+    def __init__(self, repeat_threshold=None, slow_ms=None,
+                 explain_rate=None):
+        options = audit_settings()
+        self.repeat_threshold = repeat_threshold or \
+            options['REPEAT_THRESHOLD']
+        self.slow_ms = options['SLOW_MS'] if slow_ms is None else slow_ms
+        self.explain_rate = options['EXPLAIN_RATE'] \
+            if explain_rate is None else explain_rate
+        self.queries = []
+        self.seq_scans = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append(AuditedQuery(
+                context['connection'].alias, sql, params, many,
+                time.perf_counter() - start
+            ))
+
+    @contextmanager
+    def audit(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+        if self.explain_rate > 0:
+            self.explain()
+
+    def repeated(self):
+        """Returns ``(shape, count)`` of the shapes run too many times"""
+        counts = Counter(query_shape(query.sql) for query in self.queries)
+        return [(shape, count) for shape, count in counts.most_common()
+                if count >= self.repeat_threshold and
+                not IGNORED_SHAPES.match(shape)]
+
+    def slow(self):
+        return [query for query in self.queries
+                if query.duration * 1000 >= self.slow_ms]
+
+    def explain(self):
+        """Explains a sample of the SELECT shapes and records the tables
+        they scan sequentially as ``(table, sql)``"""
+        explained = set()
+        for query in self.queries:
+            shape = query_shape(query.sql)
+            if query.many or shape in explained or \
+                    not query.sql.lstrip().upper().startswith('SELECT'):
+                continue
+            explained.add(shape)
+            if random.random() >= self.explain_rate:
+                continue
+            connection = connections[query.alias]
+            prefix = connection.ops.explain_query_prefix()
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute(f'{prefix} {query.sql}', query.params)
+                    rows = cursor.fetchall()
+            except DatabaseError:
+                continue
+            self.seq_scans.extend((table, query.sql)
+                                  for table in seq_scans(rows))
+
+    def findings(self):
+        """Returns the suspicious queries, empty when there are none"""
+        findings = {}
+        repeated = self.repeated()
+        if repeated:
+            findings['repeated'] = [{'sql': shape, 'count': count}
+                                    for shape, count in repeated]
+        slow = self.slow()
+        if slow:
+            findings['slow'] = [
+                {'sql': query.sql, 'ms': round(query.duration * 1000, 2)}
+                for query in slow
+            ]
+        if self.seq_scans:
+            findings['seq_scans'] = [{'table': table, 'sql': sql}
+                                     for table, sql in self.seq_scans]
+        return findings
@@ -0,0 +1,44 @@
+import hashlib
+from django.conf import settings
+from django.core.cache import caches
+from core import metrics
+
+
+def cache_settings():
+    """Returns the RESPONSE_CACHE setting merged with the defaults"""
+    options = {
+        'CACHE': 'default',
+        'TIMEOUT': 300,
+    }
+    options.update(getattr(settings, 'RESPONSE_CACHE', {}))
+    return options
+
+
+def response_cache():
+    return caches[cache_settings()['CACHE']]
+
+
+def response_key(user_id, version, path):
+    """Returns the key of a response.
+
+    ``version`` identifies the DB state the response was built from: the
+    ``CollectionVersion`` revisions of every collection it renders, see
+    ``versions.version_key``. Writes bump those revisions in the DB, so
+    every worker stops reading the old entries, which just expire, even
+    when the cache isn't shared between workers.
+    """
+    digest = hashlib.md5(path.encode('utf-8')).hexdigest()
+    return f'responses:{user_id}:{version}:{digest}'
+
+
+def get_response(key):
+    """Returns the cached data of a response, counting hits and misses in
+    the metrics of the process"""
+    data = response_cache().get(key)
+    metrics.COUNTERS['response_cache'].inc('miss' if data is None
+                                           else 'hit')
+    return data
+
+
+def store_response(key, data):
+    response_cache().set(key, data, cache_settings()['TIMEOUT'])
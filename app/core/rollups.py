@@ -0,0 +1,219 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Coalesce, ExtractMonth, ExtractYear
+from core.models import Expense, Income, MonthBudget, MonthlyRollup
+
+
+def rollup_key(instance, budget_tags=None):
+    """Returns the rollup key an expense or income contributes to.
+
+    The key is ``(user_id, year, month, expenses_tag_id, kind)``, or None
+    when the row can't be placed (e.g. it has no date yet). Expenses booked
+    on a month budget are accounted under the tag of that budget, looked up
+    in ``budget_tags`` when given or queried otherwise.
+    """
+    date = instance._meta.get_field('date').to_python(instance.date)
+    if date is None or instance.user_id is None:
+        return None
+    if isinstance(instance, Income):
+        return (instance.user_id, date.year, date.month, None,
+                MonthlyRollup.INCOME)
+    expenses_tag_id = instance.expenses_tag_id
+    if expenses_tag_id is None and budget_tags is not None:
+        expenses_tag_id = budget_tags.get(instance.month_budget_id)
+    elif expenses_tag_id is None and instance.month_budget_id is not None:
+        expenses_tag_id = MonthBudget.objects.filter(
+            pk=instance.month_budget_id
+        ).values_list('expenses_tag_id', flat=True).first()
+        if expenses_tag_id is None:
+            return None
+    return (instance.user_id, date.year, date.month, expenses_tag_id,
+            MonthlyRollup.EXPENSE)
+
+
+def contribution(instance, budget_tags=None):
+    """Returns the ``(key, amount)`` pair a row adds to the rollups"""
+    amount = instance._meta.get_field('amount').to_python(instance.amount)
+    return rollup_key(instance, budget_tags), amount
+
+
+def month_budget_tags(instances):
+    """Maps the month budgets used by the expenses to their tag with a
+    single query"""
+    ids = {getattr(instance, 'month_budget_id', None)
+           for instance in instances} - {None}
+    if not ids:
+        return {}
+    return dict(MonthBudget.objects.filter(pk__in=ids).values_list(
+        'pk', 'expenses_tag_id'
+    ))
+
+
+def apply_bulk(created=(), updated=()):
+    """Applies rows written with bulk_create/bulk_update to the rollups.
+
+    ``updated`` holds ``(previous, current)`` instance pairs. Contributions
+    are merged per key first so each touched rollup is written once.
+    """
+    instances = list(created)
+    instances.extend(instance for pair in updated for instance in pair)
+    budget_tags = month_budget_tags(instances)
+    deltas = {}
+
+    def merge(instance, sign):
+        key, amount = contribution(instance, budget_tags)
+        if key is None:
+            return
+        total, count = deltas.get(key, (0, 0))
+        deltas[key] = (total + sign * amount, count + sign)
+
+    for instance in created:
+        merge(instance, 1)
+    for previous, current in updated:
+        merge(previous, -1)
+        merge(current, 1)
+    for key, (total, count) in deltas.items():
+        if count < 0:
+            subtract(key, -total, -count)
+        elif count or total:
+            add(key, total, count)
+
+
+def move_budget_expenses(month_budget_id, old_tag_id, new_tag_id):
+    """Moves the contributions of the expenses booked on a month budget
+    from its previous tag to its new one"""
+    months = Expense.objects.filter(
+        month_budget_id=month_budget_id, expenses_tag__isnull=True
+    ).annotate(
+        year=ExtractYear('date'),
+        month=ExtractMonth('date'),
+    ).values('user', 'year', 'month').annotate(
+        total=Sum('amount'), count=Count('id')
+    ).order_by()
+    for row in months:
+        old_key = (row['user'], row['year'], row['month'], old_tag_id,
+                   MonthlyRollup.EXPENSE)
+        subtract(old_key, row['total'], row['count'])
+        add(old_key[:3] + (new_tag_id, MonthlyRollup.EXPENSE),
+            row['total'], row['count'])
+
+
+def rollup_filter(key):
+    user_id, year, month, expenses_tag_id, kind = key
+    return MonthlyRollup.objects.filter(
+        user_id=user_id, year=year, month=month,
+        expenses_tag_id=expenses_tag_id, kind=kind
+    )
+
+
+def rollup_row(key, total, count):
+    user_id, year, month, expenses_tag_id, kind = key
+    return MonthlyRollup(user_id=user_id, year=year, month=month,
+                         expenses_tag_id=expenses_tag_id, kind=kind,
+                         total=total, count=count)
+
+
+def add(key, total, count=1):
+    """Adds an amount to the rollup row of the key, creating it if needed"""
+    if key is None:
+        return
+    updated = rollup_filter(key).update(total=F('total') + total,
+                                        count=F('count') + count)
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            rollup_row(key, total, count).save(force_insert=True)
+    except IntegrityError:
+        # Somebody else created the row meanwhile
+        rollup_filter(key).update(total=F('total') + total,
+                                  count=F('count') + count)
+
+
+def subtract(key, total, count=1):
+    """Removes an amount from the rollup row of the key.
+
+    Never creates rows: when the row is already gone (e.g. its tag is
+    being cascade deleted) there is nothing left to correct.
+    """
+    if key is None:
+        return
+    rows = rollup_filter(key)
+    rows.update(total=F('total') - total, count=F('count') - count)
+    rows.filter(count__lte=0).delete()
+
+
+def raw_totals(users=None):
+    """Computes the rollup values straight from the expenses and incomes.
+
+    Returns a dict mapping rollup keys to ``(total, count)`` tuples.
+    """
+    expenses = Expense.objects.all()
+    incomes = Income.objects.all()
+    if users is not None:
+        expenses = expenses.filter(user__in=users)
+        incomes = incomes.filter(user__in=users)
+    totals = {}
+    expense_rows = expenses.annotate(
+        year=ExtractYear('date'),
+        month=ExtractMonth('date'),
+        tag=Coalesce('expenses_tag', 'month_budget__expenses_tag'),
+    ).values('user', 'year', 'month', 'tag').annotate(
+        total=Sum('amount'), count=Count('id')
+    ).order_by()
+    for row in expense_rows:
+        key = (row['user'], row['year'], row['month'], row['tag'],
+               MonthlyRollup.EXPENSE)
+        totals[key] = (row['total'], row['count'])
+    income_rows = incomes.annotate(
+        year=ExtractYear('date'),
+        month=ExtractMonth('date'),
+    ).values('user', 'year', 'month').annotate(
+        total=Sum('amount'), count=Count('id')
+    ).order_by()
+    for row in income_rows:
+        key = (row['user'], row['year'], row['month'], None,
+               MonthlyRollup.INCOME)
+        totals[key] = (row['total'], row['count'])
+    return totals
+
+
+def stored_totals(users=None):
+    """Returns the rollup table content in the same shape as raw_totals"""
+    rollups = MonthlyRollup.objects.all()
+    if users is not None:
+        rollups = rollups.filter(user__in=users)
+    return {
+        (row[0], row[1], row[2], row[3], row[4]): (row[5], row[6])
+        for row in rollups.values_list(
+            'user', 'year', 'month', 'expenses_tag', 'kind', 'total', 'count'
+        )
+    }
+
+
+def rebuild(users=None):
+    """Replaces the rollup rows with values computed from the raw tables"""
+    totals = raw_totals(users)
+    with transaction.atomic():
+        rollups = MonthlyRollup.objects.all()
+        if users is not None:
+            rollups = rollups.filter(user__in=users)
+        rollups.delete()
+        MonthlyRollup.objects.bulk_create([
+            rollup_row(key, total, count)
+            for key, (total, count) in totals.items()
+        ], batch_size=1000)
+    return len(totals)
+
+
+def differences(users=None, tolerance=0):
+    """Lists the keys whose stored rollup doesn't match the raw tables"""
+    expected = raw_totals(users)
+    stored = stored_totals(users)
+    mismatches = []
+    for key in sorted(set(expected) | set(stored), key=repr):
+        want = expected.get(key, (0, 0))
+        have = stored.get(key, (0, 0))
+        if want[1] != have[1] or abs(want[0] - have[0]) > tolerance:
+            mismatches.append((key, want, have))
+    return mismatches
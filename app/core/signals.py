@@ -0,0 +1,203 @@
+import threading
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections, transaction
+from django.db.models.signals import pre_save, post_save, pre_delete, \
+                                   post_delete
+from django.dispatch import Signal, receiver
+from core import rollups, versions
+from core.models import AnnualBudget, ExpensesTag, MonthBudget, Expense, \
+                        Income, Change, User
+
+
+VERSIONED_MODELS = (AnnualBudget, ExpensesTag, MonthBudget, Expense, Income)
+
+
+# Sent after rows are written with bulk_create/bulk_update, which skip the
+# model signals. Arguments: ``created`` (list of instances) and ``updated``
+# (list of ``(previous, current)`` instance pairs).
+bulk_saved = Signal()
+
+
+@receiver(pre_save, sender=Expense)
+@receiver(pre_save, sender=Income)
+def remember_rollup_contribution(sender, instance, raw, **kwargs):
+    """Stores what the row contributed to the rollups before the update"""
+    instance._rollup_previous = None
+    if raw or instance.pk is None:
+        return
+    previous = sender.objects.filter(pk=instance.pk).first()
+    if previous is not None:
+        instance._rollup_previous = rollups.contribution(previous)
+
+
+@receiver(post_save, sender=Expense)
+@receiver(post_save, sender=Income)
+def update_rollup_on_save(sender, instance, raw, **kwargs):
+    """Moves the contribution of the saved row into its rollup"""
+    if raw:
+        return
+    key, amount = rollups.contribution(instance)
+    previous = getattr(instance, '_rollup_previous', None)
+    instance._rollup_previous = None
+    if previous is None:
+        rollups.add(key, amount)
+    elif previous[0] == key:
+        rollups.add(key, amount - previous[1], count=0)
+    else:
+        rollups.subtract(*previous)
+        rollups.add(key, amount)
+
+
+@receiver(post_delete, sender=Expense)
+@receiver(post_delete, sender=Income)
+def update_rollup_on_delete(sender, instance, **kwargs):
+    """Removes the contribution of the deleted row from its rollup"""
+    rollups.subtract(*rollups.contribution(instance))
+
+
+@receiver(pre_save, sender=MonthBudget)
+def remember_budget_tag(sender, instance, raw, **kwargs):
+    """Stores the tag of the month budget before the update"""
+    instance._rollup_previous_tag = None
+    if raw or instance.pk is None:
+        return
+    instance._rollup_previous_tag = sender.objects.filter(
+        pk=instance.pk
+    ).values_list('expenses_tag_id', flat=True).first()
+
+
+@receiver(post_save, sender=MonthBudget)
+def move_budget_rollups_on_save(sender, instance, raw, **kwargs):
+    """Moves the expenses of the budget to the rollups of its new tag"""
+    previous = getattr(instance, '_rollup_previous_tag', None)
+    instance._rollup_previous_tag = None
+    if raw or previous is None or previous == instance.expenses_tag_id:
+        return
+    rollups.move_budget_expenses(instance.pk, previous,
+                                 instance.expenses_tag_id)
+
+
+@receiver(bulk_saved, sender=Expense)
+@receiver(bulk_saved, sender=Income)
+def update_rollup_on_bulk_save(sender, created=(), updated=(), **kwargs):
+    """Applies bulk written rows to the rollups"""
+    rollups.apply_bulk(created, updated)
+
+
+def bump_version_on_save(sender, instance, raw, **kwargs):
+    """Marks the user's collection as changed"""
+    if not raw:
+        versions.bump(instance.user_id, sender)
+
+
+def bump_version_on_delete(sender, instance, **kwargs):
+    """Marks the user's collection as changed, without creating versions"""
+    versions.bump(instance.user_id, sender, create=False)
+
+
+def bump_version_on_bulk_save(sender, created=(), updated=(), **kwargs):
+    """Marks the collections of every user touched by a bulk write"""
+    user_ids = {instance.user_id for instance in created}
+    user_ids.update(current.user_id for previous, current in updated)
+    for user_id in user_ids:
+        versions.bump(user_id, sender)
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_version_on_save, sender=model)
+    post_delete.connect(bump_version_on_delete, sender=model)
+    bulk_saved.connect(bump_version_on_bulk_save, sender=model)
+
+
+# Users whose deletion is in progress in this thread. Their rows are being
+# cascade deleted and there is no point in recording tombstones for them.
+_deleting_users = threading.local()
+
+
+def deleting_users():
+    if not hasattr(_deleting_users, 'ids'):
+        _deleting_users.ids = set()
+    return _deleting_users.ids
+
+
+@receiver(pre_delete, sender=User)
+def start_user_deletion(sender, instance, **kwargs):
+    deleting_users().add(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def finish_user_deletion(sender, instance, **kwargs):
+    deleting_users().discard(instance.pk)
+
+
+def record_change_on_save(sender, instance, created, raw, **kwargs):
+    """Adds the saved row to the user's change feed"""
+    if raw:
+        return
+    with transaction.atomic(savepoint=False):
+        Change.objects.create(
+            user_id=instance.user_id,
+            collection=versions.collection_name(sender),
+            object_id=instance.pk,
+            action=Change.CREATED if created else Change.UPDATED,
+            revision=versions.reserve_revisions(instance.user_id)
+        )
+
+
+def record_change_on_delete(sender, instance, **kwargs):
+    """Leaves a tombstone of the deleted row in the user's change feed"""
+    if instance.user_id in deleting_users():
+        return
+    with transaction.atomic(savepoint=False):
+        Change.objects.create(
+            user_id=instance.user_id,
+            collection=versions.collection_name(sender),
+            object_id=instance.pk,
+            action=Change.DELETED,
+            revision=versions.reserve_revisions(instance.user_id)
+        )
+
+
+def record_changes_on_bulk_save(sender, created=(), updated=(), **kwargs):
+    """Adds bulk written rows to the change feeds in one insert"""
+    collection = versions.collection_name(sender)
+    changes = [
+        Change(user_id=instance.user_id, collection=collection,
+               object_id=instance.pk, action=Change.CREATED)
+        for instance in created if instance.pk is not None
+    ]
+    changes.extend(
+        Change(user_id=current.user_id, collection=collection,
+               object_id=current.pk, action=Change.UPDATED)
+        for previous, current in updated
+    )
+    by_user = {}
+    for change in changes:
+        by_user.setdefault(change.user_id, []).append(change)
+    with transaction.atomic(savepoint=False):
+        for user_id, user_changes in by_user.items():
+            first = versions.reserve_revisions(user_id, len(user_changes))
+            for revision, change in enumerate(user_changes, first):
+                change.revision = revision
+        Change.objects.bulk_create(changes)
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(record_change_on_save, sender=model)
+    post_delete.connect(record_change_on_delete, sender=model)
+    bulk_saved.connect(record_changes_on_bulk_save, sender=model)
+
+
+@receiver(request_started)
+def close_broken_db_connections(**kwargs):
+    """Pings the persistent DB connections when a request starts and closes
+    the ones the server dropped (restarts, idle timeouts), so the request
+    reconnects instead of failing on its first query"""
+    if not getattr(settings, 'DB_CONN_HEALTH_CHECKS', False):
+        return
+    for connection in connections.all():
+        if connection.connection is None or connection.in_atomic_block:
+            continue
+        if not connection.is_usable():
+            connection.close()
@@ -0,0 +1,177 @@
+import asyncio
+import json
+import threading
+import time
+from unittest import mock
+from django.http import HttpResponse
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from core.models import ExpensesTag
+from expenses.tests.utils import sample_user, sample_expenses_tag, \
+                                 sample_expense
+from expenses.views import ExpensesTagViewSet
+from finances.asgi import ThreadPoolASGIHandler
+
+
+TAGS_URL = reverse('expenses:expensestag-list')
+EXPORT_URL = reverse('expenses:export')
+
+
+def http_scope(path, method='GET', query=b'', headers=()):
+    return {
+        'type': 'http',
+        'method': method,
+        'path': path,
+        'query_string': query,
+        'headers': [(b'host', b'testserver')] + list(headers),
+    }
+
+
+def request_body(*parts):
+    """Returns an ASGI receive callable sending the body in parts"""
+    messages = [
+        {'type': 'http.request', 'body': part,
+         'more_body': index < len(parts) - 1}
+        for index, part in enumerate(parts or (b'',))
+    ]
+
+    async def receive():
+        return messages.pop(0)
+    return receive
+
+
+def response_of(messages):
+    """Returns the status, headers and body sent for a response"""
+    start = messages[0]
+    assert start['type'] == 'http.response.start'
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    assert not messages[-1].get('more_body', False)
+    return start['status'], dict(start['headers']), body
+
+
+@override_settings(ASGI_THREADS=2)
+class ThreadPoolASGIHandlerTests(TransactionTestCase):
+    """Test the ASGI handler running requests in a bounded thread pool"""
+
+    def setUp(self):
+        self.handler = ThreadPoolASGIHandler()
+        self.user = sample_user()
+        self.token = Token.objects.create(user=self.user)
+        self.auth = (b'authorization', f'Token {self.token.key}'.encode())
+
+    def tearDown(self):
+        self.handler.executor.shutdown()
+
+    def call(self, *scopes_and_bodies):
+        """Runs concurrent requests, returns the messages sent for each"""
+        sent = [[] for _ in scopes_and_bodies]
+
+        async def run():
+            async def request(index, scope, receive):
+                async def send(message):
+                    sent[index].append(message)
+                await self.handler(scope, receive, send)
+            await asyncio.gather(*(
+                request(index, scope, receive)
+                for index, (scope, receive) in enumerate(scopes_and_bodies)
+            ))
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(run())
+        finally:
+            loop.close()
+        return sent
+
+    def test_buffered_response(self):
+        """Test a regular response is sent with its headers and body"""
+        sample_expenses_tag(self.user, name='tacos')
+        messages, = self.call(
+            (http_scope(TAGS_URL, headers=[self.auth]), request_body())
+        )
+        status, headers, body = response_of(messages)
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'Content-Type'], b'application/json')
+        self.assertEqual(
+            [tag['name'] for tag in json.loads(body)['results']], ['tacos']
+        )
+
+    def test_streaming_response(self):
+        """Test a streamed export is sent in several body messages"""
+        tag = sample_expenses_tag(self.user)
+        for _ in range(3):
+            sample_expense(self.user, expenses_tag=tag)
+        messages, = self.call((
+            http_scope(EXPORT_URL, query=b'output=csv', headers=[self.auth]),
+            request_body()
+        ))
+        status, headers, body = response_of(messages)
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b'Content-Type'], b'text/csv')
+        self.assertGreater(len(messages), 3)
+        self.assertEqual(messages[-1], {'type': 'http.response.body'})
+        self.assertEqual(len(body.decode().splitlines()), 4)
+
+    def test_request_body_upload(self):
+        """Test a body received in several messages reaches the view"""
+        parts = (b'{"name": ', b'"groceries"}')
+        messages, = self.call((
+            http_scope(TAGS_URL, method='POST', headers=[
+                self.auth, (b'content-type', b'application/json'),
+                (b'content-length', str(len(b''.join(parts))).encode())
+            ]),
+            request_body(*parts)
+        ))
+        self.assertEqual(response_of(messages)[0], 201)
+        self.assertTrue(ExpensesTag.objects.filter(
+            user=self.user, name='groceries').exists())
+
+    def test_disconnected_client(self):
+        """Test nothing runs for a client gone before sending its body"""
+        async def receive():
+            return {'type': 'http.disconnect'}
+        with mock.patch.object(self.handler, 'get_response') as get_response:
+            messages, = self.call((http_scope(TAGS_URL), receive))
+        self.assertEqual(messages, [])
+        get_response.assert_not_called()
+
+    def test_threads_are_bounded(self):
+        """Test concurrent requests never use more than ASGI_THREADS"""
+        lock = threading.Lock()
+        running = []
+        peak = []
+        threads = set()
+
+        def get_response(request):
+            with lock:
+                running.append(request)
+                peak.append(len(running))
+                threads.add(threading.current_thread().name)
+            time.sleep(0.05)
+            with lock:
+                running.remove(request)
+            return HttpResponse('ok')
+
+        with mock.patch.object(self.handler, 'get_response', get_response):
+            sent = self.call(*(
+                (http_scope('/'), request_body()) for _ in range(6)
+            ))
+        self.assertEqual([response_of(messages)[0] for messages in sent],
+                         [200] * 6)
+        self.assertEqual(max(peak), 2)
+        self.assertEqual(len(threads), 2)
+        self.assertTrue(all(name.startswith('asgi') for name in threads))
+
+    def test_error_responses(self):
+        """Test unknown paths and failing views answer with errors"""
+        messages, = self.call((http_scope('/missing/'), request_body()))
+        self.assertEqual(response_of(messages)[0], 404)
+
+        with mock.patch.object(ExpensesTagViewSet, 'list',
+                               side_effect=RuntimeError('boom')), \
+                self.assertLogs('django.request', 'ERROR'):
+            messages, = self.call(
+                (http_scope(TAGS_URL, headers=[self.auth]), request_body())
+            )
+        self.assertEqual(response_of(messages)[0], 500)
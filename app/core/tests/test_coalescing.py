@@ -0,0 +1,82 @@
+import threading
+from django.test import SimpleTestCase
+from core.coalescing import SingleFlight
+
+
+class SingleFlightTests(SimpleTestCase):
+    """Test the single flight call sharing"""
+
+    def setUp(self):
+        self.flights = SingleFlight()
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+        self.calls = 0
+
+    def slow(self):
+        self.calls += 1
+        self.release.wait(5)
+        return self.calls
+
+    def start(self, results, key='key', timeout=5):
+        def call():
+            results.append(self.flights.do(key, self.slow, timeout))
+
+        thread = threading.Thread(target=call)
+        thread.start()
+        self.addCleanup(thread.join)
+        return thread
+
+    def wait_in_flight(self, count=1):
+        while self.flights.in_flight() < count:
+            pass
+
+    def test_concurrent_calls_shared(self):
+        """Test callers of an in flight key share its result"""
+        results = []
+        threads = [self.start(results)]
+        self.wait_in_flight()
+        threads += [self.start(results) for _ in range(3)]
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(sorted(results),
+                         [(1, False), (1, True), (1, True), (1, True)])
+        self.assertEqual(self.flights.in_flight(), 0)
+
+    def test_other_keys_not_shared(self):
+        """Test calls of different keys run on their own"""
+        results = []
+        threads = [self.start(results, 'a'), self.start(results, 'b')]
+        self.wait_in_flight(2)
+        self.release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 2)
+        self.assertFalse(any(shared for result, shared in results))
+
+    def test_sequential_calls_not_shared(self):
+        """Test a finished call isn't reused"""
+        self.release.set()
+        self.assertEqual(self.flights.do('key', self.slow), (1, False))
+        self.assertEqual(self.flights.do('key', self.slow), (2, False))
+
+    def test_failed_call_runs_again(self):
+        """Test waiting callers run their own call when the leader fails"""
+        failing = threading.Event()
+
+        def fail():
+            failing.wait(5)
+            raise ValueError('boom')
+
+        def leader():
+            with self.assertRaises(ValueError):
+                self.flights.do('key', fail)
+
+        thread = threading.Thread(target=leader)
+        thread.start()
+        self.wait_in_flight()
+        threading.Timer(0.1, failing.set).start()
+        self.release.set()
+        self.assertEqual(self.flights.do('key', self.slow, 5), (1, False))
+        thread.join()
@@ -0,0 +1,47 @@
+from unittest import mock
+from django.test import SimpleTestCase, override_settings
+from core.signals import close_broken_db_connections
+
+
+def sample_connection(usable=True, open=True, in_atomic_block=False):
+    connection = mock.Mock(in_atomic_block=in_atomic_block)
+    connection.connection = object() if open else None
+    connection.is_usable.return_value = usable
+    return connection
+
+
+@mock.patch('core.signals.connections')
+class DBConnectionHealthCheckTests(SimpleTestCase):
+    """Test the health check of persistent DB connections"""
+
+    @override_settings(DB_CONN_HEALTH_CHECKS=True)
+    def test_closes_broken_connection(self, connections):
+        """Test a connection the server dropped is closed"""
+        broken = sample_connection(usable=False)
+        healthy = sample_connection()
+        connections.all.return_value = [broken, healthy]
+
+        close_broken_db_connections()
+
+        broken.close.assert_called_once_with()
+        healthy.close.assert_not_called()
+
+    @override_settings(DB_CONN_HEALTH_CHECKS=True)
+    def test_skips_closed_and_atomic_connections(self, connections):
+        """Test closed connections and open transactions aren't pinged"""
+        closed = sample_connection(open=False)
+        atomic = sample_connection(usable=False, in_atomic_block=True)
+        connections.all.return_value = [closed, atomic]
+
+        close_broken_db_connections()
+
+        closed.is_usable.assert_not_called()
+        atomic.is_usable.assert_not_called()
+        atomic.close.assert_not_called()
+
+    @override_settings(DB_CONN_HEALTH_CHECKS=False)
+    def test_disabled(self, connections):
+        """Test nothing is pinged when the health checks are off"""
+        close_broken_db_connections()
+
+        connections.all.assert_not_called()
@@ -0,0 +1,170 @@
+import json
+from unittest import mock
+from django.core.exceptions import MiddlewareNotUsed
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import serializers
+from rest_framework.test import APIClient
+from core import metrics
+from core.middleware import PerformanceMiddleware
+from expenses.tests.utils import sample_user, sample_expense, \
+                                 sample_expenses_tag
+
+
+EXPENSE_LIST_URL = reverse('expenses:expense-list')
+METRICS_URL = reverse('metrics')
+
+
+def metric_value(text, line_start):
+    """Returns the value of the first exposition line starting with
+    ``line_start``"""
+    for line in text.splitlines():
+        if line.startswith(line_start):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+
+class HistogramTests(TestCase):
+    """Test the Prometheus histograms"""
+
+    def test_exposition(self):
+        """Test buckets are cumulative and sums and counts are exposed"""
+        histogram = metrics.Histogram('test_seconds', 'Test', (0.1, 1.0))
+        histogram.observe('View.list', 0.05)
+        histogram.observe('View.list', 0.5)
+        histogram.observe('View.list', 5)
+
+        lines = histogram.exposition(1)
+
+        self.assertEqual(lines, [
+            '# HELP test_seconds Test',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{view="View.list",worker="1",le="0.1"} 1',
+            'test_seconds_bucket{view="View.list",worker="1",le="1.0"} 2',
+            'test_seconds_bucket{view="View.list",worker="1",le="+Inf"} 3',
+            'test_seconds_sum{view="View.list",worker="1"} 5.55',
+            'test_seconds_count{view="View.list",worker="1"} 3',
+        ])
+
+    @mock.patch('core.metrics.time.perf_counter', side_effect=[1.0, 1.5])
+    def test_timed_serializer_data(self, perf_counter):
+        """Test building list data counts as serializer time"""
+        sample = metrics.Sample()
+        previous = metrics.start(sample)
+        try:
+            data = metrics.TimedListSerializer(
+                child=serializers.IntegerField(), instance=[1, 2]
+            ).data
+        finally:
+            metrics.start(previous)
+
+        self.assertEqual(data, [1, 2])
+        self.assertEqual(sample.serializer_time, 0.5)
+
+    def test_timed_without_sample(self):
+        """Test timed blocks are no-ops outside sampled requests"""
+        with metrics.timed('serializer_time'):
+            pass
+
+        self.assertIsNone(metrics.current())
+
+
+@override_settings(PERF_METRICS={'SAMPLE_RATE': 1.0, 'LOG': True,
+                                 'TOKEN': None})
+class PerformanceMiddlewareTests(TestCase):
+    """Test the request instrumentation"""
+
+    def setUp(self):
+        metrics.reset()
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        expenses_tag = sample_expenses_tag(self.user)
+        for _ in range(3):
+            sample_expense(self.user, expenses_tag=expenses_tag)
+
+    def tearDown(self):
+        metrics.reset()
+
+    def test_records_view_metrics(self):
+        """Test a sampled request is recorded under its view name"""
+        with self.assertLogs('core.metrics', 'INFO') as logs:
+            self.client.get(EXPENSE_LIST_URL)
+            self.client.get(EXPENSE_LIST_URL)
+
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['view'], 'ExpenseViewSet.list')
+        self.assertEqual(entry['status'], 200)
+        self.assertGreater(entry['db_queries'], 0)
+        self.assertGreater(entry['response_bytes'], 0)
+        self.assertGreater(entry['render_ms'], 0)
+
+        text = self.client.get(METRICS_URL).content.decode()
+        labels = 'view="ExpenseViewSet.list"'
+        self.assertEqual(metric_value(
+            text, f'http_request_duration_seconds_count{{{labels}'
+        ), 2)
+        self.assertGreater(metric_value(
+            text, f'http_request_db_queries_sum{{{labels}'
+        ), 0)
+        self.assertGreater(metric_value(
+            text, f'http_response_size_bytes_sum{{{labels}'
+        ), 0)
+
+    def test_action_view_name(self):
+        """Test APIViews and viewset actions are named after them"""
+        with self.assertLogs('core.metrics', 'INFO') as logs:
+            self.client.get(reverse('expenses:income-detail', args=[0]))
+            self.client.get(reverse('expenses:forecast'))
+
+        views = [json.loads(record.getMessage())['view']
+                 for record in logs.records]
+        self.assertEqual(views,
+                         ['IncomeViewSet.retrieve', 'ForecastView.get'])
+
+    def test_unsampled_requests(self):
+        """Test requests are skipped outside the sample rate"""
+        with override_settings(PERF_METRICS={'SAMPLE_RATE': 0.5}), \
+                mock.patch('core.middleware.random.random',
+                           return_value=0.7):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            client.get(EXPENSE_LIST_URL)
+
+        self.assertNotIn('ExpenseViewSet',
+                         self.client.get(METRICS_URL).content.decode())
+
+    def test_metrics_token(self):
+        """Test the metrics endpoint requires the configured token"""
+        with override_settings(PERF_METRICS={'SAMPLE_RATE': 1.0,
+                                             'TOKEN': 'secret'}):
+            forbidden = self.client.get(METRICS_URL)
+            allowed = self.client.get(METRICS_URL,
+                                      HTTP_AUTHORIZATION='Bearer secret')
+
+        self.assertEqual(forbidden.status_code, 403)
+        self.assertEqual(allowed.status_code, 200)
+
+
+class DisabledMetricsTests(TestCase):
+    """Test the instrumentation is off by default"""
+
+    def test_middleware_not_used(self):
+        """Test the middleware removes itself without a sample rate"""
+        with self.assertRaises(MiddlewareNotUsed):
+            PerformanceMiddleware(lambda request: None)
+
+    def test_counters_served(self):
+        """Test the counters are served without sampling, the histograms
+        aren't"""
+        metrics.reset()
+        self.addCleanup(metrics.reset)
+        metrics.COUNTERS['response_cache'].inc('hit')
+        res = APIClient().get(METRICS_URL)
+
+        self.assertEqual(res.status_code, 200)
+        text = res.content.decode()
+        self.assertEqual(
+            metric_value(text, 'response_cache_lookups_total{result="hit"'), 1
+        )
+        self.assertNotIn('http_request_duration_seconds', text)
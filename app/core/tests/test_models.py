@@ -1,5 +1,6 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from core import models
 from django.db.utils import IntegrityError
 
@@ -29,6 +30,17 @@ class UserModelTests(TestCase):
         with self.assertRaises(ValueError):
             get_user_model().objects.create_user(None, '213we')
 
+    def test_create_user_with_hash(self):
+        """Tests creating a user with a password hashed beforehand"""
+        encoded = make_password('password1234')
+        user = get_user_model().objects.create_user_with_hash(
+            'test@ASDSS.com', encoded, name='test'
+        )
+        user.refresh_from_db()
+        self.assertEqual(user.email, 'test@asdss.com')
+        self.assertEqual(user.password, encoded)
+        self.assertTrue(user.check_password('password1234'))
+
     def test_create_superuser(self):
         """Test thta superuser is created"""
         user = get_user_model().objects.create_superuser(
@@ -0,0 +1,91 @@
+import json
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from core.models import Expense, ExpensesTag
+from core.query_audit import QueryAuditor, query_shape, seq_scans
+from expenses.tests.utils import sample_user, sample_expenses_tag, \
+                                 sample_expense
+
+
+EXPENSE_LIST_URL = reverse('expenses:expense-list')
+
+
+class QueryAuditorTests(TestCase):
+    """Test the query auditor"""
+
+    def setUp(self):
+        self.user = sample_user()
+        for name in ('food', 'rent', 'fun'):
+            sample_expense(self.user,
+                           expenses_tag=sample_expenses_tag(self.user, name))
+
+    def test_query_shape(self):
+        """Test values and IN list lengths don't change the shape"""
+        self.assertEqual(
+            query_shape("SELECT a FROM t WHERE b IN (%s, %s) AND c = 'x' "
+                        "LIMIT 21"),
+            query_shape("SELECT a FROM t WHERE b IN (%s) AND c = 'y' "
+                        "LIMIT 3")
+        )
+
+    def test_flags_n_plus_one(self):
+        """Test a related row loaded per row is reported"""
+        auditor = QueryAuditor(repeat_threshold=3)
+        with auditor.audit():
+            names = [expense.expenses_tag.name
+                     for expense in Expense.objects.all()]
+
+        self.assertEqual(len(names), 3)
+        repeated = auditor.findings()['repeated']
+        self.assertEqual(len(repeated), 1)
+        self.assertEqual(repeated[0]['count'], 3)
+        self.assertIn('core_expensestag', repeated[0]['sql'])
+
+    def test_select_related_is_clean(self):
+        """Test joined related rows aren't reported"""
+        auditor = QueryAuditor(repeat_threshold=3)
+        with auditor.audit():
+            list(Expense.objects.select_related('expenses_tag'))
+
+        self.assertEqual(len(auditor.queries), 1)
+        self.assertEqual(auditor.findings(), {})
+
+    def test_flags_slow_queries(self):
+        auditor = QueryAuditor(slow_ms=0)
+        with auditor.audit():
+            ExpensesTag.objects.count()
+
+        self.assertEqual(len(auditor.findings()['slow']), 1)
+
+    def test_explain_finds_sequential_scans(self):
+        """Test sampled plans report full table scans, not index lookups"""
+        auditor = QueryAuditor(explain_rate=1.0)
+        with auditor.audit():
+            list(ExpensesTag.objects.filter(name='food'))
+            ExpensesTag.objects.filter(pk=1).first()
+
+        tables = [scan['table'] for scan in auditor.findings()['seq_scans']]
+        self.assertEqual(tables, ['core_expensestag'])
+
+    def test_seq_scans_parsing(self):
+        """Test PostgreSQL and SQLite plans are understood"""
+        self.assertEqual(seq_scans([
+            ('Seq Scan on core_expense  (cost=0.00..1.01 rows=1 width=4)',),
+            ('  ->  Index Scan using core_user_pkey on core_user',),
+            (2, 0, 0, 'SCAN core_income'),
+            (3, 0, 0, 'SEARCH core_user USING INTEGER PRIMARY KEY (rowid=?)'),
+            (4, 0, 0, 'SCAN core_change USING INDEX core_change_user'),
+        ]), ['core_expense', 'core_income'])
+
+    @override_settings(QUERY_AUDIT={'ENABLED': True, 'SLOW_MS': 0})
+    def test_middleware_logs_findings(self):
+        """Test the staging middleware logs requests with findings"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.assertLogs('core.query_audit', 'WARNING') as logs:
+            client.get(EXPENSE_LIST_URL)
+
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['path'], EXPENSE_LIST_URL)
+        self.assertEqual(len(entry['slow']), entry['queries'])
@@ -0,0 +1,88 @@
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core import metrics, versions
+from core.models import AnnualBudget, ExpensesTag, MonthBudget
+from expenses.tests.utils import sample_user, sample_expenses_tag,\
+                                 sample_annual_budget
+
+
+EXPENSES_TAG_LIST_URL = reverse('expenses:expensestag-list')
+MONTH_BUDGET_LIST_URL = reverse('expenses:monthbudget-list')
+
+
+def month_budget_url(month_budget_id):
+    return reverse('expenses:monthbudget-detail', args=[month_budget_id])
+
+
+class ResponseCacheTests(TestCase):
+    """Test the per user response cache"""
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.expenses_tag = sample_expenses_tag(self.user, name='food')
+        self.month_budget = MonthBudget.objects.create(
+            user=self.user, amount=100, expenses_tag=self.expenses_tag,
+            annual_budget=sample_annual_budget(self.user)
+        )
+
+    def test_list_served_from_cache(self):
+        """Test a repeated list runs no list query and counts hits"""
+        self.client.get(EXPENSES_TAG_LIST_URL)
+        with self.assertNumQueries(1):
+            # Only the collection version behind the ETag
+            response = self.client.get(EXPENSES_TAG_LIST_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [{'name': 'food'}])
+        lookups = metrics.COUNTERS['response_cache']
+        self.assertEqual((lookups.get('hit'), lookups.get('miss')), (1, 1))
+        self.assertIn('response_cache_lookups_total{result="hit"',
+                      metrics.exposition())
+
+    def test_save_invalidates(self):
+        """Test saving a row drops the user's cached list"""
+        self.client.get(EXPENSES_TAG_LIST_URL)
+        sample_expenses_tag(self.user, name='car')
+        response = self.client.get(EXPENSES_TAG_LIST_URL)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_related_write_invalidates(self):
+        """Test renaming a tag drops cached month budgets showing it"""
+        url = month_budget_url(self.month_budget.id)
+        response = self.client.get(url, {'expand': 'names'})
+        self.assertEqual(response.data['expenses_tag_name'], 'food')
+        self.expenses_tag.name = 'groceries'
+        self.expenses_tag.save()
+        response = self.client.get(url, {'expand': 'names'})
+        self.assertEqual(response.data['expenses_tag_name'], 'groceries')
+
+    def test_delete_invalidates(self):
+        """Test deleting a row drops the cached responses"""
+        self.client.get(MONTH_BUDGET_LIST_URL)
+        AnnualBudget.objects.filter(user=self.user).delete()
+        response = self.client.get(MONTH_BUDGET_LIST_URL)
+        self.assertEqual(response.data['results'], [])
+
+    def test_cache_per_user(self):
+        """Test users never see each other's cached responses"""
+        self.client.get(EXPENSES_TAG_LIST_URL)
+        other = sample_user(email='other@test.com')
+        self.client.force_authenticate(other)
+        response = self.client.get(EXPENSES_TAG_LIST_URL)
+        self.assertEqual(response.data['results'], [])
+        self.assertFalse(ExpensesTag.objects.filter(user=other).exists())
+
+    def test_write_of_other_worker_invalidates(self):
+        """Test a write made by another process, which can't drop the
+        entries of this process, is seen through the DB revision"""
+        self.client.get(EXPENSES_TAG_LIST_URL)
+        ExpensesTag.objects.filter(user=self.user).update(name='car')
+        versions.bump(self.user.pk, ExpensesTag)
+        response = self.client.get(EXPENSES_TAG_LIST_URL)
+        self.assertEqual(response.data['results'], [{'name': 'car'}])
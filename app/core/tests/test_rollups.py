@@ -0,0 +1,131 @@
+from datetime import date
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, transaction
+from django.db.models import QuerySet
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from core import models, rollups
+
+
+def rollup_values(user):
+    return list(models.MonthlyRollup.objects.filter(user=user).order_by(
+        'kind', 'year', 'month', 'expenses_tag'
+    ).values_list('kind', 'year', 'month', 'expenses_tag', 'total', 'count'))
+
+
+class MonthlyRollupTests(TestCase):
+    """Test the incrementally maintained monthly rollups"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'rollup@test.com', 'password123'
+        )
+        self.tag = models.ExpensesTag.objects.create(user=self.user,
+                                                     name='food')
+        annual_budget = models.AnnualBudget.objects.create(
+            user=self.user, amount=10000, year=2020
+        )
+        self.month_budget = models.MonthBudget.objects.create(
+            user=self.user, amount=1000, annual_budget=annual_budget,
+            expenses_tag=self.tag
+        )
+
+    def create_expense(self, amount, day, **params):
+        params.setdefault('expenses_tag', self.tag)
+        return models.Expense.objects.create(user=self.user, amount=amount,
+                                             date=day, **params)
+
+    def test_create_accumulates(self):
+        """Test expenses and incomes are added to their month"""
+        self.create_expense(100, date(2020, 5, 1))
+        self.create_expense(50, '2020-05-20',
+                            expenses_tag=None, month_budget=self.month_budget)
+        models.Income.objects.create(user=self.user, amount=900,
+                                     date='2020-05-02')
+        self.assertEqual(rollup_values(self.user), [
+            ('e', 2020, 5, self.tag.id, 150, 2),
+            ('i', 2020, 5, None, 900, 1),
+        ])
+
+    def test_untagged_rollups_are_unique(self):
+        """Test a concurrent write can't insert a second income row of
+        a month, so it falls back to updating the first one"""
+        models.Income.objects.create(user=self.user, amount=900,
+                                     date='2020-05-02')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            models.MonthlyRollup.objects.create(
+                user=self.user, year=2020, month=5, kind='i', total=1,
+                count=1
+            )
+        # The other writer found no row to update before inserting
+        update = QuerySet.update
+        calls = []
+
+        def missed_update(queryset, **kwargs):
+            calls.append(kwargs)
+            return update(queryset, **kwargs) if len(calls) > 1 else 0
+
+        with mock.patch.object(QuerySet, 'update', missed_update):
+            rollups.add((self.user.id, 2020, 5, None, 'i'), 100)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(rollup_values(self.user),
+                         [('i', 2020, 5, None, 1000, 2)])
+
+    def test_update_moves_between_months(self):
+        """Test changing the date moves the amount to the new month"""
+        expense = self.create_expense(100, date(2020, 5, 1))
+        self.create_expense(10, date(2020, 5, 3))
+        expense.date = date(2020, 6, 1)
+        expense.amount = 120
+        expense.save()
+        self.assertEqual(rollup_values(self.user), [
+            ('e', 2020, 5, self.tag.id, 10, 1),
+            ('e', 2020, 6, self.tag.id, 120, 1),
+        ])
+
+    def test_delete_removes_empty_rollup(self):
+        """Test deleting the last expense of a month drops its rollup"""
+        expense = self.create_expense(100, date(2020, 5, 1))
+        expense.delete()
+        self.assertEqual(rollup_values(self.user), [])
+
+    def test_cascade_delete_of_tag(self):
+        """Test deleting a tag with expenses leaves no stale rollups"""
+        self.create_expense(100, date(2020, 5, 1))
+        self.tag.delete()
+        self.assertEqual(rollup_values(self.user), [])
+
+    def test_budget_tag_change_moves_expenses(self):
+        """Test changing the tag of a month budget moves its expenses"""
+        expense = self.create_expense(50, date(2020, 5, 1),
+                                      expenses_tag=None,
+                                      month_budget=self.month_budget)
+        self.create_expense(10, date(2020, 5, 2))
+        other = models.ExpensesTag.objects.create(user=self.user,
+                                                  name='rent')
+        self.month_budget.expenses_tag = other
+        self.month_budget.save()
+        self.assertEqual(rollup_values(self.user), [
+            ('e', 2020, 5, self.tag.id, 10, 1),
+            ('e', 2020, 5, other.id, 50, 1),
+        ])
+        expense.delete()
+        self.assertEqual(rollup_values(self.user), [
+            ('e', 2020, 5, self.tag.id, 10, 1),
+        ])
+        self.assertEqual(rollups.differences([self.user]), [])
+
+    def test_rebuild_and_check_command(self):
+        """Test the command detects and fixes drifted rollups"""
+        self.create_expense(100, date(2020, 5, 1))
+        models.MonthlyRollup.objects.update(total=1)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_rollups', '--check', stdout=StringIO())
+        call_command('rebuild_rollups', stdout=StringIO())
+        call_command('rebuild_rollups', '--check', stdout=StringIO())
+        self.assertEqual(rollup_values(self.user), [
+            ('e', 2020, 5, self.tag.id, 100, 1),
+        ])
@@ -0,0 +1,129 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from core.throttling import LocalBuckets, local_buckets, take
+from expenses.tests.utils import sample_user
+
+
+EXPENSE_LIST_URL = reverse('expenses:expense-list')
+CREATE_USER_URL = reverse('user:create')
+
+
+def throttle_rates(**rates):
+    return dict(settings.REST_FRAMEWORK, DEFAULT_THROTTLE_RATES=dict(
+        {'user': None, 'token': None}, **rates
+    ))
+
+
+class TokenBucketTests(TestCase):
+    """Test the token bucket arithmetic"""
+
+    def test_burst_then_rate(self):
+        """Test a full bucket allows the capacity and then refills"""
+        state = None
+        for _ in range(3):
+            state, wait = take(state, 3, 1.0, 100)
+            self.assertEqual(wait, 0)
+        state, wait = take(state, 3, 1.0, 100)
+        self.assertEqual(wait, 1)
+        state, wait = take(state, 3, 1.0, 100.5)
+        self.assertEqual(wait, 0.5)
+        state, wait = take(state, 3, 1.0, 101)
+        self.assertEqual(wait, 0)
+
+    def test_refill_capped(self):
+        """Test an idle bucket doesn't grow past its capacity"""
+        state, wait = take((0, 0), 3, 1.0, 1000)
+        self.assertEqual(state, (2, 1000))
+
+    def test_local_buckets_evict_oldest(self):
+        """Test the process buckets keep at most maxsize keys"""
+        buckets = LocalBuckets(maxsize=2)
+        for key in ('a', 'b', 'c'):
+            buckets.take(key, 1, 1.0)
+        self.assertEqual(list(buckets._buckets), ['b', 'c'])
+
+
+class ThrottleApiTests(TestCase):
+    """Test the per user and per token throttles"""
+
+    def setUp(self):
+        local_buckets.clear()
+        self.addCleanup(local_buckets.clear)
+        self.user = sample_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertThrottledAfter(self, client, count):
+        for _ in range(count):
+            response = client.get(EXPENSE_LIST_URL)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = client.get(EXPENSE_LIST_URL)
+        self.assertEqual(response.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        return response
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(user='3/min'),
+                       THROTTLE_BUCKETS={'BURST': {}})
+    def test_user_throttled(self):
+        """Test a user is throttled past the burst, others aren't"""
+        response = self.assertThrottledAfter(self.client, 3)
+        self.assertEqual(response['Retry-After'], '20')
+        other = APIClient()
+        other.force_authenticate(sample_user(email='other@test.com'))
+        response = other.get(EXPENSE_LIST_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(REST_FRAMEWORK=dict(throttle_rates(user='2/min'),
+                                           NUM_PROXIES=1),
+                       THROTTLE_BUCKETS={'BURST': {}})
+    def test_anonymous_throttled_by_proxied_address(self):
+        """Test anonymous clients are told apart by the address the proxy
+        appended, not by the forwarded addresses they send"""
+        client = APIClient()
+        for spoofed in ('1.1.1.1', '2.2.2.2'):
+            response = client.post(
+                CREATE_USER_URL, {},
+                HTTP_X_FORWARDED_FOR=f'{spoofed}, 10.0.0.7'
+            )
+            self.assertEqual(response.status_code,
+                             status.HTTP_400_BAD_REQUEST)
+        response = client.post(CREATE_USER_URL, {},
+                               HTTP_X_FORWARDED_FOR='3.3.3.3, 10.0.0.7')
+        self.assertEqual(response.status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        response = client.post(CREATE_USER_URL, {},
+                               HTTP_X_FORWARDED_FOR='10.0.0.8')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(token='60/min'),
+                       THROTTLE_BUCKETS={'BURST': {'token': 2}})
+    def test_token_throttled(self):
+        """Test the token bucket uses the burst capacity"""
+        token = Token.objects.create(user=self.user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.assertThrottledAfter(client, 2)
+        # Forced authentication carries no token
+        response = self.client.get(EXPENSE_LIST_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates(user='2/min'),
+                       THROTTLE_BUCKETS={'CACHE': 'default', 'BURST': {}})
+    def test_shared_cache_buckets(self):
+        """Test the buckets can live in a shared cache"""
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.assertThrottledAfter(self.client, 2)
+        self.assertEqual(len(local_buckets._buckets), 0)
+
+    @override_settings(REST_FRAMEWORK=throttle_rates())
+    def test_disabled(self):
+        """Test scopes without a rate don't throttle"""
+        for _ in range(5):
+            response = self.client.get(EXPENSE_LIST_URL)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -0,0 +1,23 @@
+from contextlib import contextmanager
+from core.query_audit import QueryAuditor
+
+
+class QueryBudgetMixin:
+    """Asserts a block of code runs at most a budget of queries, with no
+    N+1 patterns or slow queries (and, with ``explain``, no sequential
+    scans)"""
+
+    @contextmanager
+    def assertQueryBudget(self, budget, repeat_threshold=None,
+                          slow_ms=None, explain=False):
+        auditor = QueryAuditor(repeat_threshold, slow_ms,
+                               explain_rate=1.0 if explain else 0.0)
+        with auditor.audit():
+            yield auditor
+        queries = '\n'.join(query.sql for query in auditor.queries)
+        self.assertLessEqual(
+            len(auditor.queries), budget,
+            f'{len(auditor.queries)} queries, over the budget of {budget}:'
+            f'\n{queries}'
+        )
+        self.assertEqual(auditor.findings(), {})
@@ -0,0 +1,146 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import SimpleRateThrottle
+
+
+def bucket_settings():
+    """Returns the THROTTLE_BUCKETS setting merged with the defaults"""
+    options = {
+        'CACHE': None,
+        'MAXSIZE': 10000,
+        'BURST': {},
+    }
+    options.update(getattr(settings, 'THROTTLE_BUCKETS', {}))
+    return options
+
+
+def refill(state, capacity, rate, now):
+    """Returns the tokens of a bucket at ``now``; missing buckets are
+    full"""
+    if state is None:
+        return capacity
+    tokens, updated = state
+    return min(capacity, tokens + max(0, now - updated) * rate)
+
+
+def take(state, capacity, rate, now):
+    """Takes a token from a bucket. Returns the new state and the seconds
+    to wait for a token, 0 when one was taken."""
+    tokens = refill(state, capacity, rate, now)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / rate
+
+
+class LocalBuckets:
+    """Thread safe, process local LRU of bucket key -> (tokens, updated)"""
+    timer = time.monotonic
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        with self._lock:
+            state, wait = take(self._buckets.get(key), capacity, rate,
+                               self.timer())
+            self._buckets[key] = state
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBuckets:
+    """Buckets shared between workers through a Django cache.
+
+    The cache API has no compare and swap, so concurrent requests of one
+    key on different workers may both take the last token; the bucket is
+    still right within a few requests.
+    """
+    timer = time.time
+
+    def __init__(self, cache):
+        self.cache = cache
+
+    def take(self, key, capacity, rate):
+        state, wait = take(self.cache.get(key), capacity, rate, self.timer())
+        # Expire once full again, it reads the same as a missing bucket
+        self.cache.set(key, state, int((capacity - state[0]) / rate) + 1)
+        return wait
+
+
+local_buckets = LocalBuckets(bucket_settings()['MAXSIZE'])
+
+
+def buckets():
+    alias = bucket_settings()['CACHE']
+    if alias:
+        return CacheBuckets(caches[alias])
+    return local_buckets
+
+
+class BucketRateThrottle(SimpleRateThrottle):
+    """Token bucket throttle.
+
+    The ``DEFAULT_THROTTLE_RATES`` entry of the scope (``600/min``) is the
+    refill rate, and ``THROTTLE_BUCKETS['BURST']`` the capacity of the
+    bucket, the number of requests by default. So a client can burst up
+    to the capacity and then sustain the rate, instead of being locked
+    out until a whole window passes. A rate of None disables the scope.
+    The buckets are per process unless ``THROTTLE_BUCKETS['CACHE']`` names
+    a shared cache.
+    """
+
+    def get_rate(self):
+        # Read on every request, so the rates follow setting overrides
+        return api_settings.DEFAULT_THROTTLE_RATES.get(self.scope)
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        bursts = bucket_settings()['BURST']
+        capacity = bursts.get(self.scope, self.num_requests)
+        self.delay = buckets().take(self.key, capacity,
+                                    self.num_requests / self.duration)
+        return self.delay == 0
+
+    def wait(self):
+        return self.delay
+
+
+class UserBucketThrottle(BucketRateThrottle):
+    """One bucket per user, or per IP for anonymous requests"""
+    scope = 'user'
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+
+class TokenBucketThrottle(BucketRateThrottle):
+    """One bucket per API token; requests without one aren't throttled"""
+    scope = 'token'
+
+    def get_cache_key(self, request, view):
+        key = getattr(request.auth, 'key', None)
+        if key is None:
+            return None
+        ident = hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
@@ -0,0 +1,93 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from core.models import CollectionVersion, ChangeFeed
+
+
+def collection_name(model):
+    """Returns the collection label used for a model, e.g. core.expense"""
+    return model._meta.label_lower
+
+
+def get_version(user_id, model):
+    """Returns the ``(revision, modified)`` pair of a user's collection.
+
+    Collections that were never written have revision 0 and no date.
+    """
+    version = CollectionVersion.objects.filter(
+        user_id=user_id, collection=collection_name(model)
+    ).values_list('revision', 'modified').first()
+    return version or (0, None)
+
+
+def get_versions(user_id, models):
+    """Returns the combined ``(revision, modified)`` of several collections
+    of a user, e.g. a collection and the ones its responses render names
+    from, with a single query.
+
+    The revision joins the revisions of the models in order and the date
+    is the latest change of any of them.
+    """
+    names = [collection_name(model) for model in models]
+    found = {
+        collection: (revision, modified)
+        for collection, revision, modified in CollectionVersion.objects.filter(
+            user_id=user_id, collection__in=names
+        ).values_list('collection', 'revision', 'modified')
+    }
+    versions = [found.get(name, (0, None)) for name in names]
+    dates = [modified for revision, modified in versions
+             if modified is not None]
+    return ('.'.join(str(revision) for revision, modified in versions),
+            max(dates) if dates else None)
+
+
+def version_key(revision, modified):
+    """Returns a cache key part naming a version of collections. The date
+    tells apart the versions of a reused user id, which count their
+    revisions from scratch."""
+    stamp = modified.timestamp() if modified is not None else 0
+    return f'{revision}@{stamp}'
+
+
+def bump(user_id, model, create=True):
+    """Increments the revision of a user's collection.
+
+    ``create`` is False when deleting rows: the version exists already for
+    any collection that had rows, and creating one while the user itself
+    is being cascade deleted would violate its foreign key.
+    """
+    versions = CollectionVersion.objects.filter(
+        user_id=user_id, collection=collection_name(model)
+    )
+    now = timezone.now()
+    if versions.update(revision=F('revision') + 1, modified=now) or \
+            not create:
+        return
+    try:
+        with transaction.atomic():
+            CollectionVersion.objects.create(
+                user_id=user_id, collection=collection_name(model),
+                revision=1
+            )
+    except IntegrityError:
+        versions.update(revision=F('revision') + 1, modified=now)
+
+
+def reserve_revisions(user_id, count=1):
+    """Takes the next ``count`` revisions of a user's change feed and
+    returns the first one.
+
+    The update locks the feed row until the surrounding transaction ends,
+    so a transaction reserving revisions of the same user waits for this
+    one to commit and its changes always get the higher revisions.
+    """
+    feeds = ChangeFeed.objects.filter(user_id=user_id)
+    if not feeds.update(revision=F('revision') + count):
+        try:
+            with transaction.atomic():
+                ChangeFeed.objects.create(user_id=user_id, revision=count)
+            return 1
+        except IntegrityError:
+            feeds.update(revision=F('revision') + count)
+    return feeds.values_list('revision', flat=True).get() - count + 1
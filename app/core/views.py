@@ -0,0 +1,23 @@
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.http import require_GET
+from core import metrics
+
+
+@metrics.exempt
+@require_GET
+def metrics_view(request):
+    """Serves the counters of this process in the Prometheus text format,
+    and the request histograms while sampling is enabled. Protected by
+    ``PERF_METRICS['TOKEN']`` (``Authorization: Bearer <token>``) when
+    set."""
+    options = metrics.metrics_settings()
+    if options['TOKEN'] and not constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''),
+        f"Bearer {options['TOKEN']}"
+    ):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        metrics.exposition(histograms=options['SAMPLE_RATE'] > 0),
+        content_type='text/plain; version=0.0.4'
+    )
@@ -0,0 +1,244 @@
+import calendar
+from collections import OrderedDict
+from datetime import date
+from decimal import Decimal
+import numpy as np
+from django.db.models import BigIntegerField, DecimalField, \
+                             ExpressionWrapper, F
+from django.db.models.functions import Cast, Coalesce, Round
+from core.models import AnnualBudget, Expense, ExpensesTag, Income, \
+                        MonthBudget
+
+
+CENTS = 100
+CENTS_EXPRESSION = Cast(
+    Round(ExpressionWrapper(F('amount') * CENTS,
+                            output_field=DecimalField())),
+    BigIntegerField()
+)
+
+
+def cents_to_decimal(cents):
+    """Turns an integer amount of cents back into a 2 places Decimal"""
+    return Decimal(int(cents)).scaleb(-2)
+
+
+def load_amounts(queryset):
+    """Loads the date and amount columns of a queryset in one query.
+
+    Returns ``(days, cents)``: a ``datetime64[D]`` array and an ``int64``
+    array of amounts in cents, both ordered by date. The conversion to
+    cents happens in SQL, so the sums below are exact integer sums.
+    """
+    rows = queryset.order_by('date', 'id').annotate(
+        cents=CENTS_EXPRESSION
+    ).values_list('date', 'cents')
+    days, cents = [], []
+    for day, amount in rows.iterator():
+        days.append(day)
+        cents.append(amount)
+    return (np.array(days, dtype='datetime64[D]'),
+            np.array(cents, dtype=np.int64))
+
+
+def user_amounts(user, model=Expense, date_from=None, date_to=None):
+    """Loads the amounts of a user's expenses (or incomes)"""
+    queryset = model.objects.filter(user=user)
+    if date_from is not None:
+        queryset = queryset.filter(date__gte=date_from)
+    if date_to is not None:
+        queryset = queryset.filter(date__lte=date_to)
+    return load_amounts(queryset)
+
+
+def total(cents):
+    return cents_to_decimal(cents.sum(dtype=np.int64))
+
+
+def monthly_totals(days, cents):
+    """Sums date ordered amounts per month.
+
+    Returns the ``datetime64[M]`` months that have rows and their totals
+    in cents.
+    """
+    if not len(days):
+        return np.array([], dtype='datetime64[M]'), \
+            np.array([], dtype=np.int64)
+    months = days.astype('datetime64[M]')
+    starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    return months[starts], np.add.reduceat(cents, starts)
+
+
+def running_balance(incomes, expenses):
+    """Returns the balance at the end of every day with movements.
+
+    ``incomes`` and ``expenses`` are ``(days, cents)`` pairs as returned
+    by ``load_amounts``; the result is a ``(days, cents)`` pair too.
+    """
+    days = np.concatenate([incomes[0], expenses[0]])
+    cents = np.concatenate([incomes[1], -expenses[1]])
+    order = np.argsort(days, kind='stable')
+    days = days[order]
+    balance = np.cumsum(cents[order])
+    if not len(days):
+        return days, balance
+    last = np.r_[days[1:] != days[:-1], True]
+    return days[last], balance[last]
+
+
+def user_balance(user, date_from=None, date_to=None):
+    """Running balance of a user's incomes minus expenses"""
+    return running_balance(
+        user_amounts(user, Income, date_from, date_to),
+        user_amounts(user, Expense, date_from, date_to),
+    )
+
+
+def as_arrays(rows, dtypes):
+    """Turns ``values_list`` rows into one array per column"""
+    columns = [[] for _ in dtypes]
+    for row in rows.iterator():
+        for column, value in zip(columns, row):
+            column.append(value)
+    return [np.array(column, dtype=dtype)
+            for column, dtype in zip(columns, dtypes)]
+
+
+def group_sum(groups, index, cents):
+    """Exact int64 sums of ``cents`` into ``groups`` buckets"""
+    sums = np.zeros(groups, dtype=np.int64)
+    np.add.at(sums, index, cents)
+    return sums
+
+
+def pace(spent, budget, has_budget, elapsed, days):
+    """Vectorized burn rate, projection and variance of a period.
+
+    ``spent`` and ``budget`` are int64 cents arrays; ``elapsed`` of the
+    ``days`` of the period have gone by. Budget based metrics are masked
+    out where ``has_budget`` is False.
+    """
+    burn_rate = np.rint(spent / elapsed).astype(np.int64)
+    projected = np.rint(spent * (days / elapsed)).astype(np.int64)
+    return OrderedDict([
+        ('budget', budget),
+        ('spent', spent),
+        ('variance', budget - spent),
+        ('burn_rate', burn_rate),
+        ('projected', projected),
+        ('projected_overrun', np.maximum(projected - budget, 0)),
+    ]), has_budget
+
+
+def metrics_at(columns, position):
+    """Builds the Decimal metrics of one row of ``pace`` output"""
+    values, has_budget = columns
+    budgeted = bool(has_budget[position])
+    return OrderedDict(
+        (name, cents_to_decimal(column[position])
+         if budgeted or name in ('spent', 'burn_rate', 'projected')
+         else None)
+        for name, column in values.items()
+    )
+
+
+def budget_reports(user_ids, as_of=None):
+    """Compares the budgets of a batch of users with their spending.
+
+    For the month and the year of ``as_of`` (today by default) returns,
+    per user id, the budget, spent amount, variance, daily burn rate,
+    projected spending at the end of the period and the projected
+    overrun, for the whole month, the whole year and per expenses tag in
+    the month. The expenses, budgets and tags of the whole batch are read
+    with four queries and every metric is computed on NumPy arrays of
+    cents, so a batch costs about the same for one user or a thousand.
+    """
+    as_of = as_of or date.today()
+    ids = np.unique(np.array(list(user_ids), dtype=np.int64))
+    id_list = ids.tolist()
+    year_start = date(as_of.year, 1, 1)
+    month_start = as_of.replace(day=1)
+
+    users, days, tags, cents = as_arrays(
+        Expense.objects.filter(
+            user__in=id_list, date__gte=year_start, date__lte=as_of
+        ).annotate(
+            tag=Coalesce('expenses_tag', 'month_budget__expenses_tag'),
+            cents=CENTS_EXPRESSION,
+        ).values_list('user', 'date', 'tag', 'cents').order_by(),
+        (np.int64, 'datetime64[D]', np.int64, np.int64)
+    )
+    budget_users, budget_tags, budget_cents = as_arrays(
+        MonthBudget.objects.filter(
+            user__in=id_list, annual_budget__year=as_of.year
+        ).annotate(cents=CENTS_EXPRESSION).values_list(
+            'user', 'expenses_tag', 'cents'
+        ).order_by(),
+        (np.int64, np.int64, np.int64)
+    )
+    annual_users, annual_cents = as_arrays(
+        AnnualBudget.objects.filter(
+            user__in=id_list, year=as_of.year
+        ).annotate(cents=CENTS_EXPRESSION).values_list(
+            'user', 'cents'
+        ).order_by(),
+        (np.int64, np.int64)
+    )
+
+    # Per user totals
+    in_month = days >= np.datetime64(month_start)
+    user_index = np.searchsorted(ids, users)
+    year_spent = group_sum(len(ids), user_index, cents)
+    month_spent = group_sum(len(ids), user_index[in_month], cents[in_month])
+    year_budget = group_sum(len(ids), np.searchsorted(ids, annual_users),
+                            annual_cents)
+    has_year_budget = np.isin(ids, annual_users)
+    month_budget = group_sum(len(ids), np.searchsorted(ids, budget_users),
+                             budget_cents)
+    has_month_budget = np.isin(ids, budget_users)
+
+    # Per (user, tag) totals of the month, keyed by user << 32 | tag
+    spent_keys = (users[in_month] << 32) | tags[in_month]
+    budget_keys = (budget_users << 32) | budget_tags
+    keys = np.union1d(spent_keys, budget_keys)
+    tag_spent = group_sum(len(keys), np.searchsorted(keys, spent_keys),
+                          cents[in_month])
+    tag_budget = group_sum(len(keys), np.searchsorted(keys, budget_keys),
+                           budget_cents)
+
+    month_days = calendar.monthrange(as_of.year, as_of.month)[1]
+    year_days = 366 if calendar.isleap(as_of.year) else 365
+    month = pace(month_spent, month_budget, has_month_budget, as_of.day,
+                 month_days)
+    year = pace(year_spent, year_budget, has_year_budget,
+                as_of.timetuple().tm_yday, year_days)
+    per_tag = pace(tag_spent, tag_budget, np.isin(keys, budget_keys),
+                   as_of.day, month_days)
+
+    tag_names = dict(ExpensesTag.objects.filter(
+        user__in=id_list
+    ).values_list('id', 'name'))
+    key_users = keys >> 32
+    key_tags = keys & 0xffffffff
+    reports = OrderedDict()
+    for position, user_id in enumerate(id_list):
+        reports[user_id] = OrderedDict([
+            ('as_of', as_of),
+            ('month', metrics_at(month, position)),
+            ('year', metrics_at(year, position)),
+            ('tags', []),
+        ])
+    for position in range(len(keys)):
+        tag_id = int(key_tags[position])
+        row = OrderedDict([
+            ('expenses_tag', tag_id),
+            ('expenses_tag_name', tag_names.get(tag_id)),
+        ])
+        row.update(metrics_at(per_tag, position))
+        reports[int(key_users[position])]['tags'].append(row)
+    return reports
+
+
+def budget_report(user, as_of=None):
+    """Budget vs actual report of a single user"""
+    return budget_reports([user.pk], as_of)[user.pk]
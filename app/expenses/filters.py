@@ -0,0 +1,81 @@
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from django.db.models import Q
+from django.utils.dateparse import parse_date
+from django.utils.translation import gettext_lazy as _
+
+
+def parse_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(_('A valid integer is required.'))
+
+
+def parse_number(value):
+    try:
+        number = Decimal(value)
+    except InvalidOperation:
+        number = None
+    if number is None or not number.is_finite():
+        raise ValueError(_('A valid number is required.'))
+    return number
+
+
+def parse_day(value):
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValueError(_('Use the YYYY-MM-DD format.'))
+    return parsed
+
+
+def parse_year(value):
+    year = parse_int(value)
+    if not date.min.year <= year < date.max.year:
+        raise ValueError(_('Value out of range.'))
+    return year
+
+
+def lookup(*names, parse=str):
+    """A filter matching any of the lookups against the parsed value"""
+    def build(value):
+        value = parse(value)
+        condition = Q()
+        for name in names:
+            condition |= Q(**{name: value})
+        return condition
+    return build
+
+
+def year_range(name):
+    """A filter on the dates of a year, as a range the index can seek"""
+    def build(value):
+        year = parse_year(value)
+        return Q(**{f'{name}__gte': date(year, 1, 1),
+                    f'{name}__lt': date(year + 1, 1, 1)})
+    return build
+
+
+def choice(name, choices):
+    def build(value):
+        if value not in dict(choices):
+            raise ValueError(_('Must be one of: %s.') %
+                             ', '.join(sorted(dict(choices))))
+        return Q(**{name: value})
+    return build
+
+
+AMOUNT_FILTERS = {
+    'amount_min': lookup('amount__gte', parse=parse_number),
+    'amount_max': lookup('amount__lte', parse=parse_number),
+    'search': lookup('description__icontains'),
+}
+
+DATE_FILTERS = {
+    'date_from': lookup('date__gte', parse=parse_day),
+    'date_to': lookup('date__lte', parse=parse_day),
+    'year': year_range('date'),
+}
@@ -0,0 +1,123 @@
+import calendar
+from collections import OrderedDict
+from datetime import date
+from decimal import Decimal
+from core import response_cache
+from core.models import Income, MonthlyRollup
+from core.versions import get_version, version_key
+
+
+PERIOD_MONTHS = {
+    'm': 1,
+    'a': 12,
+}
+
+
+def add_months(day, months):
+    """Moves a date by whole months, clamping the day to the month end"""
+    month_index = day.year * 12 + day.month - 1 + months
+    year, month = divmod(month_index, 12)
+    month += 1
+    last_day = calendar.monthrange(year, month)[1]
+    return date(year, month, min(day.day, last_day))
+
+
+def month_range(start, months):
+    """The first and last day of a window of months starting at ``start``"""
+    first = start.replace(day=1)
+    last = add_months(first, months - 1)
+    return first, last.replace(day=calendar.monthrange(last.year,
+                                                       last.month)[1])
+
+
+def income_occurrences(incomes, start, end):
+    """Yields ``(date, amount, income)`` for the recurrences of periodic
+    incomes between ``start`` and ``end``.
+
+    The stored date of an income is its first occurrence and is already
+    accounted for by the income row itself, so only the later ones are
+    yielded. Each income jumps straight to its first recurrence in the
+    window, so the work is proportional to the months requested, not to
+    the age of the income.
+    """
+    for income in incomes:
+        step = PERIOD_MONTHS.get(income.periodicity)
+        if step is None or income.date > end:
+            continue
+        elapsed = (start.year - income.date.year) * 12 + \
+            start.month - income.date.month
+        index = max(1, -(-elapsed // step))
+        day = add_months(income.date, index * step)
+        if day < start:
+            index += 1
+            day = add_months(income.date, index * step)
+        while day <= end:
+            yield day, income.amount, income
+            index += 1
+            day = add_months(income.date, index * step)
+
+
+def projected_incomes(user, start, months):
+    """Sums the recurrences of a user's periodic incomes per month.
+
+    Returns a dict mapping ``(year, month)`` to the projected amount. The
+    result is cached under the revision of the user's incomes, read from
+    the DB, so every worker stops using it once an income is written.
+    """
+    first, last = month_range(start, months)
+    version = version_key(*get_version(user.pk, Income))
+    key = response_cache.response_key(user.pk, f'forecast:{version}',
+                                      f'{first.isoformat()}:{months}')
+    cached = response_cache.get_response(key)
+    if cached is not None:
+        return cached
+    incomes = Income.objects.filter(
+        user=user, periodicity__in=list(PERIOD_MONTHS), date__lte=last
+    ).only('date', 'amount', 'periodicity').order_by()
+    totals = {}
+    occurrences = income_occurrences(incomes.iterator(), first, last)
+    for day, amount, income in occurrences:
+        month = (day.year, day.month)
+        totals[month] = totals.get(month, 0) + amount
+    response_cache.store_response(key, totals)
+    return totals
+
+
+def cash_flow_forecast(user, start, months):
+    """Builds the month by month cash flow of a window of months.
+
+    Recorded incomes and expenses come from the monthly rollups and the
+    recurrences of periodic incomes are added as projected incomes.
+    ``balance`` is the running net of the window.
+    """
+    first, last = month_range(start, months)
+    recorded = {}
+    rollups = MonthlyRollup.objects.filter(
+        user=user, year__gte=first.year, year__lte=last.year
+    ).values_list('year', 'month', 'kind', 'total').order_by()
+    for year, month, kind, total in rollups:
+        totals = recorded.setdefault((year, month), {})
+        totals[kind] = totals.get(kind, 0) + total
+    projected = projected_incomes(user, start, months)
+
+    balance = Decimal(0)
+    forecast = []
+    for offset in range(months):
+        day = add_months(first, offset)
+        month = (day.year, day.month)
+        totals = recorded.get(month, {})
+        incomes = totals.get(MonthlyRollup.INCOME, Decimal(0))
+        expenses = totals.get(MonthlyRollup.EXPENSE, Decimal(0))
+        projected_income = projected.get(month, Decimal(0))
+        net = incomes + projected_income - expenses
+        balance += net
+        forecast.append(OrderedDict([
+            ('year', day.year),
+            ('month', day.month),
+            ('incomes', incomes),
+            ('projected_incomes', projected_income),
+            ('expenses', expenses),
+            ('net', net),
+            ('balance', balance),
+        ]))
+    return forecast
@@ -0,0 +1,48 @@
+import json
+import time
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.dateparse import parse_date
+from expenses.analytics import budget_reports
+
+
+class Command(BaseCommand):
+    """Django command to compute the budget vs actual report of every
+    user, meant to run nightly. Reports are written as JSON lines."""
+    help = 'Writes the budget vs actual reports of the users'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--as-of', help='YYYY-MM-DD, defaults to today')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Users computed per batch of queries')
+        parser.add_argument('--output', help='File to write, or stdout')
+        parser.add_argument('--user', action='append', dest='emails',
+                            help='Restrict to the user with this email')
+
+    def handle(self, *args, **options):
+        as_of = None
+        if options['as_of']:
+            as_of = parse_date(options['as_of'])
+            if as_of is None:
+                raise CommandError('Use the YYYY-MM-DD format for --as-of')
+        users = get_user_model().objects.filter(is_active=True)
+        if options['emails']:
+            users = users.filter(email__in=options['emails'])
+        user_ids = list(users.order_by('id').values_list('id', flat=True))
+
+        output = open(options['output'], 'w') if options['output'] \
+            else self.stdout
+        start = time.perf_counter()
+        try:
+            for offset in range(0, len(user_ids), options['batch_size']):
+                batch = user_ids[offset:offset + options['batch_size']]
+                for user_id, report in budget_reports(batch, as_of).items():
+                    report['user'] = user_id
+                    output.write(json.dumps(report, cls=DjangoJSONEncoder) +
+                                 '\n')
+        finally:
+            if options['output']:
+                output.close()
+        self.stderr.write(f'{len(user_ids)} reports in '
+                          f'{time.perf_counter() - start:.1f}s')
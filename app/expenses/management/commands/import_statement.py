@@ -0,0 +1,60 @@
+import os
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from core.models import ImportJob
+from expenses.statements import PARSERS, StatementError, \
+                                StatementImporter, statement_rows
+
+
+class Command(BaseCommand):
+    """Django command to import a CSV/OFX bank statement for a user"""
+    help = 'Imports a bank statement as expenses and incomes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--user', required=True,
+                            help='Email of the owner of the statement')
+        parser.add_argument('--format', choices=sorted(PARSERS),
+                            dest='statement_format',
+                            help='Defaults to the file extension')
+        parser.add_argument('--job', type=int,
+                            help='Resume the import job with this id')
+        parser.add_argument('--date-format', default=None,
+                            help='strptime format of CSV dates')
+        parser.add_argument('--default-tag', default='Uncategorized')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--encoding', default='utf-8-sig')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['user']} not found")
+        statement_format = options['statement_format'] or \
+            os.path.splitext(path)[1].lstrip('.').lower()
+        if statement_format not in PARSERS:
+            raise CommandError('Unknown statement format, use --format')
+
+        if options['job']:
+            try:
+                job = ImportJob.objects.get(pk=options['job'], user=user)
+            except ImportJob.DoesNotExist:
+                raise CommandError(f"Import job {options['job']} not found")
+            self.stdout.write(f'Resuming after {job.rows_done} rows')
+        else:
+            job = ImportJob.objects.create(user=user,
+                                           source=os.path.basename(path))
+
+        importer = StatementImporter(job, options['default_tag'],
+                                     options['chunk_size'])
+        with open(path, encoding=options['encoding'], newline='') as stream:
+            try:
+                job = importer.run(statement_rows(stream, statement_format,
+                                                  options['date_format']))
+            except StatementError as exc:
+                raise CommandError(f'Job {job.pk} failed: {exc}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Job {job.pk}: {job.expenses} expenses, {job.incomes} incomes, '
+            f'{job.skipped} rows skipped'
+        ))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from expenses.sync import feed_settings, prune_changes
+
+
+class Command(BaseCommand):
+    """Django command to delete old entries of the change feeds"""
+    help = 'Deletes the change feed entries older than the retention'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=feed_settings()['RETENTION_DAYS'],
+                            help='Keep the changes of the last days')
+
+    def handle(self, *args, **options):
+        deleted = prune_changes(options['days'])
+        self.stdout.write(self.style.SUCCESS(f'{deleted} changes pruned'))
@@ -0,0 +1,542 @@
+import hashlib
+from collections import Counter, OrderedDict
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.http import http_date, parse_http_date_safe
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import PKOnlyObject, RelatedField
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from core import metrics, response_cache
+from core.coalescing import single_flight
+from core.signals import bulk_saved
+from core.versions import collection_name, get_versions, version_key
+
+
+class BulkWriteMixin:
+    """Adds a ``bulk`` action that creates and updates many rows at once.
+
+    The payload is a list of objects; the ones carrying an ``id`` update
+    the existing row of the user (partially), the rest are created. All
+    the items are validated first and nothing is written unless all of
+    them are valid, in which case everything is stored with
+    bulk_create/bulk_update inside one transaction.
+    """
+    bulk_max_items = 1000
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError(
+                {'non_field_errors': [_('Expected a list of items.')]}
+            )
+        if len(items) > self.bulk_max_items:
+            raise ValidationError({'non_field_errors': [
+                _('At most %(count)d items are allowed.') %
+                {'count': self.bulk_max_items}
+            ]})
+
+        ids = [self.bulk_pk(item) for item in items]
+        occurrences = Counter(ids)
+        existing = self.get_queryset().in_bulk(
+            [pk for pk in ids if pk is not None]
+        )
+        self.bulk_related_objects = self.bulk_prefetch_related(items)
+        errors = []
+        created = []
+        updated = []
+        update_fields = set()
+        for item, pk in zip(items, ids):
+            if pk is not None and occurrences[pk] > 1:
+                errors.append({'id': [_('Duplicated in the payload.')]})
+                continue
+            instance, fields, item_errors = self.bulk_validate_item(
+                item, existing.get(pk)
+            )
+            errors.append(item_errors)
+            if item_errors:
+                continue
+            if pk is None:
+                created.append(instance)
+            else:
+                updated.append((existing[pk], instance))
+                update_fields.update(fields)
+        if any(errors):
+            return Response({'errors': errors},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        model = self.get_queryset().model
+        if updated and self.bulk_has_field(model, 'updated_at'):
+            # bulk_update doesn't run the auto_now pre_save hook
+            now = timezone.now()
+            for previous, current in updated:
+                current.updated_at = now
+            update_fields.add('updated_at')
+        with transaction.atomic():
+            model.objects.bulk_create(created)
+            if updated and update_fields:
+                model.objects.bulk_update(
+                    [current for previous, current in updated], update_fields
+                )
+            bulk_saved.send(sender=model, created=created, updated=updated)
+        return Response(OrderedDict([
+            ('created', len(created)),
+            ('updated', len(updated)),
+            ('ids', [instance.pk for instance in self.bulk_order(
+                items, created, updated)]),
+        ]))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        related = getattr(self, 'bulk_related_objects', None)
+        if related is not None:
+            context['related_objects'] = related
+        return context
+
+    def bulk_prefetch_related(self, items):
+        """Loads the rows the items refer to with one query per related
+        field, for the serializer's ``PrefetchedPrimaryKeyRelatedField``"""
+        related = {}
+        for name, field in self.get_serializer().fields.items():
+            if field.read_only or \
+                    not isinstance(field, serializers.PrimaryKeyRelatedField):
+                continue
+            pks = set()
+            for item in items:
+                if isinstance(item, dict):
+                    try:
+                        pks.add(int(item.get(name)))
+                    except (TypeError, ValueError):
+                        pass
+            if pks:
+                related[name] = field.get_queryset().in_bulk(pks)
+        return related
+
+    def bulk_validate_item(self, item, instance):
+        """Validates one item of the payload.
+
+        Returns the unsaved instance, the fields it sets and the errors.
+        ``instance`` is the existing row for updates, None for creates.
+        """
+        if not isinstance(item, dict):
+            return None, (), {'non_field_errors': [_('Expected an object.')]}
+        if item.get('id') is not None and instance is None:
+            return None, (), {'id': [_('Not found.')]}
+        serializer = self.get_serializer(instance, data=item,
+                                         partial=instance is not None)
+        if not serializer.is_valid():
+            return None, (), serializer.errors
+
+        model = serializer.Meta.model
+        if instance is None:
+            current = model(user=self.request.user)
+        else:
+            current = model(**{
+                field.attname: getattr(instance, field.attname)
+                for field in model._meta.concrete_fields
+            })
+        for attr, value in serializer.validated_data.items():
+            setattr(current, attr, value)
+        try:
+            self.bulk_validate_instance(current)
+        except ValueError as exc:
+            message = ' '.join(str(exc).split())
+            return None, (), {'non_field_errors': [message]}
+        return current, serializer.validated_data.keys(), {}
+
+    def bulk_validate_instance(self, instance):
+        """Hook for model rules that are otherwise enforced in save()"""
+
+    def bulk_has_field(self, model, name):
+        try:
+            model._meta.get_field(name)
+        except FieldDoesNotExist:
+            return False
+        return True
+
+    def bulk_pk(self, item):
+        """Returns the integer id of an item, None for new or invalid ones"""
+        if not isinstance(item, dict):
+            return None
+        try:
+            return int(item.get('id'))
+        except (TypeError, ValueError):
+            return None
+
+    def bulk_order(self, items, created, updated):
+        """Returns the written instances in the order of the payload"""
+        created = iter(created)
+        updated = iter(current for previous, current in updated)
+        return [
+            next(updated) if self.bulk_pk(item) is not None else next(created)
+            for item in items
+        ]
+
+
+class ConditionalGetMixin:
+    """Answers list and retrieve requests with ETag/Last-Modified headers.
+
+    The validators come from the user's ``CollectionVersion`` of the
+    viewset model and of the models the rendered fields read through
+    relations (the tag names of ``?expand=names``), so a request whose
+    ``If-None-Match`` (or, lacking it, ``If-Modified-Since``) still
+    matches gets a 304 with a single query, before the list query or the
+    serializer run.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+    def conditional(self, handler, request, *args, **kwargs):
+        revision, modified = get_versions(request.user.pk,
+                                          self.get_version_models())
+        self.collection_version = (revision, modified)
+        etag = self.collection_etag(request, revision)
+        self.response_etag = etag
+        if self.not_modified(request, etag, modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            if modified is not None:
+                response['Last-Modified'] = http_date(modified.timestamp())
+        return response
+
+    def get_version_models(self):
+        """Returns the viewset model followed by the related models whose
+        rows the rendered fields read"""
+        models = [self.get_queryset().model]
+        for field in self.get_serializer().fields.values():
+            if field.write_only:
+                continue
+            model = models[0]
+            for attr in field.source_attrs[:-1]:
+                try:
+                    model = model._meta.get_field(attr).related_model
+                except FieldDoesNotExist:
+                    model = None
+                if model is None:
+                    break
+                if model not in models:
+                    models.append(model)
+        return models
+
+    def collection_etag(self, request, revision):
+        """The revision, scoped to the user and the exact URL"""
+        scope = f'{request.user.pk}:{request.get_full_path()}'
+        digest = hashlib.md5(scope.encode('utf-8')).hexdigest()[:16]
+        return f'"{revision}-{digest}"'
+
+    def not_modified(self, request, etag, modified):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return etag in tags or '*' in tags
+        since = parse_http_date_safe(
+            request.META.get('HTTP_IF_MODIFIED_SINCE', '')
+        )
+        return modified is not None and since is not None and \
+            int(modified.timestamp()) <= since
+
+
+class QueryFilterMixin:
+    """Filters list requests with the query params in ``filter_params``.
+
+    ``filter_params`` maps a param to a function turning its value into a
+    Q on indexed (or user scoped) columns, see ``expenses.filters``. Any
+    other param, except pagination and ``allowed_query_params``, is
+    rejected with a 400 instead of being ignored, so a typo can't turn
+    into an unfiltered fetch of every row.
+    """
+    filter_params = {}
+    allowed_query_params = ('expand', api_settings.URL_FORMAT_OVERRIDE)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.query_filter = Q()
+        if self.action == 'list':
+            self.query_filter = self.parse_query_filter(request.query_params)
+
+    def filter_queryset(self, queryset):
+        return super().filter_queryset(queryset).filter(self.query_filter)
+
+    def parse_query_filter(self, query_params):
+        allowed = self.get_allowed_query_params()
+        errors = {}
+        condition = Q()
+        for name in query_params:
+            if name not in allowed:
+                errors[name] = [_('Unknown filter.')]
+                continue
+            value = query_params.get(name)
+            if name not in self.filter_params or value in (None, ''):
+                continue
+            try:
+                condition &= self.filter_params[name](value)
+            except ValueError as exc:
+                errors[name] = [str(exc)]
+        if errors:
+            raise ValidationError(errors)
+        return condition
+
+    def get_allowed_query_params(self):
+        allowed = set(self.filter_params)
+        allowed.update(name for name in self.allowed_query_params if name)
+        paginator = self.paginator
+        for attr in ('cursor_query_param', 'page_size_query_param'):
+            name = getattr(paginator, attr, None)
+            if name:
+                allowed.add(name)
+        return allowed
+
+
+class SparseFieldsViewMixin:
+    """Adds ``?fields=`` and, where ``layouts`` allows it, ``?layout=``
+    to list requests.
+
+    ``fields`` is a comma separated list of serializer fields; only those
+    are rendered and the SELECT is trimmed to the columns (and joins)
+    they need with ``only()``. ``layout=columns`` renders the page as
+    ``{"columns": [...], "rows": [[...], ...]}`` so the names are sent
+    once instead of once per row.
+    """
+    fields_query_param = 'fields'
+    layout_query_param = 'layout'
+    layouts = ('objects',)
+
+    def initial(self, request, *args, **kwargs):
+        self.sparse_fields = None
+        self.layout = self.layouts[0]
+        super().initial(request, *args, **kwargs)
+        if self.action == 'list':
+            self.sparse_fields = self.parse_sparse_fields(request)
+            self.layout = self.parse_layout(request)
+
+    def get_allowed_query_params(self):
+        allowed = super().get_allowed_query_params()
+        allowed.add(self.fields_query_param)
+        if len(self.layouts) > 1:
+            allowed.add(self.layout_query_param)
+        return allowed
+
+    def parse_sparse_fields(self, request):
+        value = request.query_params.get(self.fields_query_param) or ''
+        wanted = tuple(name.strip() for name in value.split(',')
+                       if name.strip())
+        if not wanted:
+            return None
+        available = self.get_serializer_class()(context=dict(
+            self.get_serializer_context(), fields=wanted
+        )).fields
+        unknown = [name for name in wanted if name not in available]
+        if unknown:
+            raise ValidationError({self.fields_query_param: [
+                _('Unknown fields: %s.') % ', '.join(unknown)
+            ]})
+        return wanted
+
+    def parse_layout(self, request):
+        value = request.query_params.get(self.layout_query_param)
+        if not value:
+            return self.layouts[0]
+        if value not in self.layouts:
+            raise ValidationError({self.layout_query_param: [
+                _('Must be one of: %s.') % ', '.join(self.layouts)
+            ]})
+        return value
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if getattr(self, 'sparse_fields', None) is not None:
+            context['fields'] = self.sparse_fields
+        return context
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if getattr(self, 'sparse_fields', None) is None:
+            return queryset
+        return self.trim_queryset(queryset, self.get_serializer().fields)
+
+    def trim_queryset(self, queryset, fields):
+        """Selects only the columns and joins the fields read"""
+        model = queryset.model
+        columns = {model._meta.pk.name}
+        columns.update(name.lstrip('-') for name in
+                       getattr(self.paginator, 'ordering', ()))
+        relations = set()
+        for field in fields.values():
+            if field.source == '*':
+                return queryset
+            columns.add('__'.join(field.source_attrs))
+            if len(field.source_attrs) > 1:
+                relations.add('__'.join(field.source_attrs[:-1]))
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*columns)
+
+    def get_paginated_response(self, data):
+        if self.layout == 'columns':
+            data = OrderedDict([
+                ('columns', list(self.get_serializer().fields)),
+                ('rows', [list(row.values()) for row in data]),
+            ])
+        return super().get_paginated_response(data)
+
+
+class CachedResponseMixin:
+    """Serves list and retrieve responses from the per user response cache.
+
+    The serialized data is stored in ``core.response_cache`` per user,
+    full path and version of the collections the response renders, as
+    read from the DB by ``ConditionalGetMixin`` (which must come before
+    this mixin). A write anywhere bumps the version, so no worker reads
+    the old entry again. Enabled with ``cache_responses = True``.
+    """
+    cache_responses = False
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(super().retrieve, request, *args, **kwargs)
+
+    def cached(self, handler, request, *args, **kwargs):
+        version = getattr(self, 'collection_version', None)
+        if not self.cache_responses or version is None:
+            return handler(request, *args, **kwargs)
+        key = response_cache.response_key(
+            request.user.pk,
+            f'{collection_name(self.get_queryset().model)}:'
+            f'{version_key(*version)}',
+            request.get_full_path()
+        )
+        data = response_cache.get_response(key)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response_cache.store_response(key, response.data)
+        return response
+
+
+class CoalescedReadMixin:
+    """Shares one response between concurrent identical list and retrieve
+    requests of a user.
+
+    While a request is building its response, the identical ones arriving
+    on other threads of the process wait for it and answer with a copy of
+    its data, so N concurrent requests run the DB queries and the
+    serializer once. Requests are identical when they have the same
+    ``ConditionalGetMixin`` ETag, which covers the user, the full path and
+    the collection revision: a read starting after a write never shares
+    the result of a read that started before it. Enabled with
+    ``coalesce_reads = True``.
+    """
+    coalesce_reads = False
+    coalesce_timeout = 30
+
+    def list(self, request, *args, **kwargs):
+        return self.coalesced(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.coalesced(super().retrieve, request, *args, **kwargs)
+
+    def coalesced(self, handler, request, *args, **kwargs):
+        if not self.coalesce_reads:
+            return handler(request, *args, **kwargs)
+
+        def respond():
+            response = handler(request, *args, **kwargs)
+            # Copied now, the response is rendered by its own thread
+            return response, (response.status_code, response.data,
+                              dict(response.items()))
+
+        (response, copy), shared = single_flight.do(
+            self.coalesce_key(request), respond, self.coalesce_timeout
+        )
+        if not shared:
+            return response
+        status_code, data, headers = copy
+        return Response(data, status=status_code, headers=headers)
+
+    def coalesce_key(self, request):
+        etag = getattr(self, 'response_etag', None)
+        if etag is None:
+            etag = f'{request.user.pk}:{request.get_full_path()}'
+        return f'{type(self).__name__}:{etag}'
+
+
+def value_converter(field):
+    """Returns a function rendering a raw column value like ``field``"""
+    if isinstance(field, RelatedField) and field.use_pk_only_optimization():
+        def convert(value):
+            if value is None:
+                return None
+            return field.to_representation(PKOnlyObject(pk=value))
+    else:
+        def convert(value):
+            if value is None:
+                return None
+            return field.to_representation(value)
+    return convert
+
+
+class FastListMixin:
+    """Builds list responses from ``values()`` rows instead of instances.
+
+    Each serializer field is mapped to the column (or related column) of
+    its source and rendered with the field's own ``to_representation``,
+    so the output is the same as the serializer's while skipping model
+    instantiation and the per row serializer machinery. Writes, retrieve
+    and serializers with fields that aren't plain columns keep the
+    regular path. Enabled with ``fast_list = True``.
+    """
+    fast_list = False
+
+    def list(self, request, *args, **kwargs):
+        plan = self.fast_list_plan() if self.fast_list else None
+        if plan is None:
+            return super().list(request, *args, **kwargs)
+        names, paths, converters = plan
+        queryset = self.filter_queryset(self.get_queryset())
+        extra = [name.lstrip('-') for name in
+                 getattr(self.paginator, 'ordering', ())]
+        queryset = queryset.values(*paths, *[name for name in extra
+                                             if name not in paths])
+        page = self.paginate_queryset(queryset)
+        with metrics.timed('serializer_time'):
+            rows = [
+                {name: convert(row[path])
+                 for name, path, convert in zip(names, paths, converters)}
+                for row in (queryset if page is None else page)
+            ]
+        if page is None:
+            return Response(rows)
+        return self.get_paginated_response(rows)
+
+    def fast_list_plan(self):
+        """Returns the field names, value paths and converters, or None
+        when some field can't be read from a column"""
+        names, paths, converters = [], [], []
+        for name, field in self.get_serializer().fields.items():
+            if field.write_only:
+                continue
+            if field.source == '*' or \
+                    isinstance(field, (serializers.BaseSerializer,
+                                       serializers.SerializerMethodField)):
+                return None
+            names.append(name)
+            paths.append('__'.join(field.source_attrs))
+            converters.append(value_converter(field))
+        return names, paths, converters
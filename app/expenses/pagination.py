@@ -0,0 +1,170 @@
+import base64
+import json
+from collections import OrderedDict
+from urllib import parse
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination that seeks on the ordering columns.
+
+    Every page is fetched with a ``WHERE (a, b) < (x, y)`` style predicate
+    built from the last row of the previous page, so no OFFSET is ever
+    issued. With an index on the ordering columns (after ``user``) a page
+    reads only its own rows, so deep pages cost the same as the first one.
+    The last ordering field must be unique (usually ``id``) to keep the
+    cursor stable.
+    """
+    ordering = ('id',)
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.base_url = request.build_absolute_uri()
+        position, reverse = self.decode_cursor(queryset.model, request)
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(_invert(field) for field in ordering)
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(ordering, position))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        self.page = rows[:self.page_size]
+        if reverse:
+            self.page.reverse()
+
+        # Going forward we know from the extra row whether a next page
+        # exists, and any cursor implies there was something before it.
+        # Going backwards the roles are swapped.
+        if reverse:
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_position(self, obj):
+        """Returns the values of the ordering fields for a row"""
+        names = [field.lstrip('-') for field in self.ordering]
+        if isinstance(obj, dict):
+            return [obj[name] for name in names]
+        return [getattr(obj, name) for name in names]
+
+    def seek_filter(self, ordering, position):
+        """Builds the lexicographic ``(a, b) > (x, y)`` predicate.
+
+        Django has no row comparison, so it is written as
+        ``a > x OR (a = x AND b > y)`` together with the redundant
+        ``a >= x``, which the planner can use as an index range.
+        """
+        first = ordering[0]
+        lookup = 'lte' if first.startswith('-') else 'gte'
+        bound = Q(**{f"{first.lstrip('-')}__{lookup}": position[0]})
+        seek = Q()
+        for index, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition = Q(**{f'{name}__{lookup}': position[index]})
+            for previous, value in zip(ordering[:index], position):
+                condition &= Q(**{previous.lstrip('-'): value})
+            seek |= condition
+        return bound & seek
+
+    def encode_cursor(self, obj, reverse):
+        position = [
+            value if isinstance(value, (int, str)) or value is None
+            else str(value)
+            for value in self.get_position(obj)
+        ]
+        payload = json.dumps({'p': position, 'r': int(reverse)},
+                             separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode('ascii'))
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   token.decode('ascii'))
+
+    def decode_cursor(self, model, request):
+        """Returns the (position, reverse) pair stored in the cursor"""
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(
+                base64.urlsafe_b64decode(parse.unquote(token).encode('ascii'))
+            )
+            values = payload['p']
+            reverse = bool(payload['r'])
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+
+class DatedKeysetPagination(KeysetPagination):
+    """Newest first, for models with a ``date`` column"""
+    ordering = ('-date', '-id')
+
+
+def _invert(field):
+    return field[1:] if field.startswith('-') else '-' + field
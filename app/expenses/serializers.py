@@ -1,48 +1,125 @@
 from rest_framework import serializers
+from core.metrics import TimedListSerializer, TimedSerializerMixin
 from core.models import AnnualBudget, MonthBudget, Expense, ExpensesTag, Income
 
 
-class AnnualBudgetSerializer(serializers.ModelSerializer):
+class SparseFieldsSerializerMixin:
+    """Renders only the fields listed in the ``fields`` context entry,
+    when the view passes one"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        wanted = self.context.get('fields')
+        if wanted is not None:
+            for name in list(self.fields):
+                if name not in wanted:
+                    self.fields.pop(name)
+
+
+class ExpandableNamesMixin:
+    """Keeps the related ``*_name`` fields only when the request asks for
+    them with ``?expand=names`` or lists them in ``?fields=``"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        wanted = self.context.get('fields') or ()
+        if request is None or request.query_params.get('expand') != 'names':
+            for name in self.Meta.expandable_fields:
+                if name not in wanted:
+                    self.fields.pop(name, None)
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Takes the related rows from ``context['related_objects']`` (field
+    name -> {pk: row}) when the view loaded them upfront, e.g. for the
+    items of a bulk write"""
+
+    def to_internal_value(self, data):
+        prefetched = self.context.get('related_objects', {}).get(
+            self.field_name
+        )
+        if prefetched is not None and self.pk_field is None and \
+                not isinstance(data, bool):
+            try:
+                return prefetched[int(data)]
+            except (KeyError, TypeError, ValueError):
+                pass
+        return super().to_internal_value(data)
+
+
+class AnnualBudgetSerializer(TimedSerializerMixin, SparseFieldsSerializerMixin,
+                             serializers.ModelSerializer):
     """Serializer for annual budget model"""
 
     class Meta:
         model = AnnualBudget
+        list_serializer_class = TimedListSerializer
         fields = ('year', 'description', 'amount')
         read_only_fields = ('user', 'id',)
 
 
-class ExpensesTagSerializer(serializers.ModelSerializer):
+class ExpensesTagSerializer(TimedSerializerMixin, SparseFieldsSerializerMixin,
+                            serializers.ModelSerializer):
     """Serializer for expenses tag"""
 
     class Meta:
         model = ExpensesTag
+        list_serializer_class = TimedListSerializer
         fields = ('name',)
         read_only_fields = ('user', 'id',)
 
 
-class MonthBudgetSerializer(serializers.ModelSerializer):
+class MonthBudgetSerializer(TimedSerializerMixin, SparseFieldsSerializerMixin,
+                            ExpandableNamesMixin,
+                            serializers.ModelSerializer):
     """Serializer for annual budget model"""
+    expenses_tag_name = serializers.CharField(source='expenses_tag.name',
+                                              read_only=True)
 
     class Meta:
         model = MonthBudget
-        fields = ('annual_budget', 'expenses_tag', 'description', 'amount',)
+        list_serializer_class = TimedListSerializer
+        fields = ('annual_budget', 'expenses_tag', 'description', 'amount',
+                  'expenses_tag_name')
         read_only_fields = ('user', 'id',)
+        expandable_fields = ('expenses_tag_name',)
 
 
-class ExpenseSerializer(serializers.ModelSerializer):
+class ExpenseSerializer(TimedSerializerMixin, SparseFieldsSerializerMixin,
+                        ExpandableNamesMixin, serializers.ModelSerializer):
     """Serializer for single expesnes"""
+    serializer_related_field = PrefetchedPrimaryKeyRelatedField
+    expenses_tag_name = serializers.CharField(source='expenses_tag.name',
+                                              read_only=True, allow_null=True)
+    month_budget_name = serializers.CharField(
+        source='month_budget.expenses_tag.name',
+        read_only=True,
+        allow_null=True
+    )
 
     class Meta:
         model = Expense
+        list_serializer_class = TimedListSerializer
         fields = ('date', 'description', 'amount', 'month_budget',
-                  'expenses_tag')
+                  'expenses_tag', 'expenses_tag_name', 'month_budget_name')
         read_only_fields = ('user', 'id',)
+        expandable_fields = ('expenses_tag_name', 'month_budget_name')
+        extra_kwargs = {
+            'month_budget': {
+                'queryset': MonthBudget.objects.select_related(
+                    'expenses_tag'
+                )
+            },
+        }
 
 
-class IncomeSerializer(serializers.ModelSerializer):
+class IncomeSerializer(TimedSerializerMixin, SparseFieldsSerializerMixin,
+                       serializers.ModelSerializer):
     """Serializer for single incomes"""
 
     class Meta:
         model = Income
+        list_serializer_class = TimedListSerializer
         fields = ('date', 'description', 'amount', 'periodicity', 'id')
         read_only_fields = ('user', 'id')
@@ -0,0 +1,244 @@
+import csv
+import re
+from collections import namedtuple
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from core.models import Expense, ExpensesTag, Income, ImportJob
+from core.signals import bulk_saved
+
+
+StatementRow = namedtuple('StatementRow', ['date', 'amount', 'description'])
+
+CSV_COLUMNS = {
+    'date': ('date', 'fecha', 'posted', 'transaction date'),
+    'amount': ('amount', 'cantidad', 'monto', 'importe'),
+    'description': ('description', 'descripción', 'descripcion', 'memo',
+                    'name', 'concept', 'concepto'),
+}
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+class StatementError(ValueError):
+    """Raised when a statement can't be parsed at all"""
+
+
+def parse_amount(value):
+    """Returns the amount rounded to cents, raising ValueError when it
+    isn't a number or doesn't fit the amount fields"""
+    value = value.strip().replace(',', '').replace('$', '')
+    if value.startswith('(') and value.endswith(')'):
+        value = '-' + value[1:-1]
+    field = Expense._meta.get_field('amount')
+    try:
+        amount = Decimal(value).quantize(
+            Decimal(1).scaleb(-field.decimal_places)
+        )
+    except InvalidOperation:
+        amount = None
+    if amount is None or not amount.is_finite() or \
+            len(amount.as_tuple().digits) > field.max_digits:
+        raise ValueError(f'Invalid amount {value!r}')
+    return amount
+
+
+def parse_csv(stream, date_format='%Y-%m-%d'):
+    """Yields the rows of a CSV statement, reading it line by line.
+
+    The header must name a date, an amount and optionally a description
+    column. Rows that can't be parsed are yielded as None so they can be
+    counted and skipped without losing track of the position.
+    """
+    reader = csv.reader(stream)
+    try:
+        header = [name.strip().lower() for name in next(reader)]
+    except StopIteration:
+        return
+    positions = {}
+    for column, aliases in CSV_COLUMNS.items():
+        for alias in aliases:
+            if alias in header:
+                positions[column] = header.index(alias)
+                break
+    if 'date' not in positions or 'amount' not in positions:
+        raise StatementError(_('The CSV header needs date and amount.'))
+
+    for line in reader:
+        if not any(value.strip() for value in line):
+            continue
+        try:
+            description = ''
+            if 'description' in positions:
+                description = line[positions['description']].strip()
+            yield StatementRow(
+                datetime.strptime(line[positions['date']].strip(),
+                                  date_format).date(),
+                parse_amount(line[positions['amount']]),
+                description[:255],
+            )
+        except (IndexError, ValueError):
+            yield None
+
+
+def ofx_tokens(stream, chunk_size=65536):
+    """Yields ``(closing, tag, text)`` tokens of an OFX/SGML document
+    without loading it whole"""
+    buffer = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        buffer += chunk
+        end = buffer.rfind('<') if chunk else len(buffer)
+        for match in OFX_TAG.finditer(buffer, 0, end):
+            yield match.group(1) == '/', match.group(2).upper(), \
+                match.group(3).strip()
+        buffer = buffer[end:]
+        if not chunk:
+            return
+
+
+def parse_ofx(stream):
+    """Yields the transactions (STMTTRN blocks) of an OFX statement"""
+    transaction_fields = None
+    for closing, tag, text in ofx_tokens(stream):
+        if tag == 'STMTTRN':
+            if not closing:
+                transaction_fields = {}
+                continue
+            if transaction_fields is not None:
+                yield ofx_row(transaction_fields)
+            transaction_fields = None
+        elif transaction_fields is not None and not closing:
+            transaction_fields[tag] = text
+
+
+def ofx_row(fields):
+    try:
+        description = fields.get('NAME') or fields.get('MEMO') or ''
+        if fields.get('MEMO') and fields.get('NAME'):
+            description = f"{fields['NAME']} {fields['MEMO']}"
+        return StatementRow(
+            datetime.strptime(fields['DTPOSTED'][:8], '%Y%m%d').date(),
+            parse_amount(fields['TRNAMT']),
+            description[:255],
+        )
+    except (KeyError, ValueError):
+        return None
+
+
+class TagMatcher:
+    """Picks the expenses tag whose name appears in a description.
+
+    Longer names win so 'car insurance' beats 'car'. Descriptions matching
+    no tag go to the default tag, created on first use.
+    """
+
+    def __init__(self, user, default_name):
+        self.user = user
+        self.default_name = default_name
+        self.default_tag_id = None
+        tags = ExpensesTag.objects.filter(user=user).values_list('id', 'name')
+        self.patterns = [
+            (re.compile(r'\b' + re.escape(name.lower()) + r'\b'), tag_id)
+            for tag_id, name in sorted(tags, key=lambda tag: -len(tag[1]))
+            if name.strip()
+        ]
+
+    def match(self, description):
+        description = description.lower()
+        for pattern, tag_id in self.patterns:
+            if pattern.search(description):
+                return tag_id
+        if self.default_tag_id is None:
+            # Names aren't unique, use the oldest tag when there are many
+            tag = ExpensesTag.objects.filter(
+                user=self.user, name=self.default_name
+            ).order_by('id').first()
+            if tag is None:
+                tag = ExpensesTag.objects.create(user=self.user,
+                                                 name=self.default_name)
+            self.default_tag_id = tag.id
+        return self.default_tag_id
+
+
+class StatementImporter:
+    """Loads parsed statement rows as expenses (negative amounts) and
+    incomes (positive amounts).
+
+    Rows are inserted in chunks with bulk_create; each chunk commits
+    together with the job progress, so an interrupted import can be
+    resumed with the same job and file.
+    """
+
+    def __init__(self, job, default_tag='Uncategorized', chunk_size=5000):
+        self.job = job
+        self.chunk_size = chunk_size
+        self.matcher = TagMatcher(job.user, default_tag)
+
+    def run(self, rows):
+        rows = islice(rows, self.job.rows_done, None)
+        try:
+            while True:
+                chunk = list(islice(rows, self.chunk_size))
+                if not chunk:
+                    break
+                self.save_chunk(chunk)
+        except Exception:
+            ImportJob.objects.filter(pk=self.job.pk).update(
+                status=ImportJob.FAILED, updated_at=timezone.now()
+            )
+            self.job.status = ImportJob.FAILED
+            raise
+        ImportJob.objects.filter(pk=self.job.pk).update(
+            status=ImportJob.DONE, updated_at=timezone.now()
+        )
+        self.job.refresh_from_db()
+        return self.job
+
+    def save_chunk(self, chunk):
+        expenses = []
+        incomes = []
+        skipped = 0
+        for row in chunk:
+            if row is None or not row.amount:
+                skipped += 1
+            elif row.amount < 0:
+                expenses.append(Expense(
+                    user=self.job.user, date=row.date, amount=-row.amount,
+                    description=row.description,
+                    expenses_tag_id=self.matcher.match(row.description),
+                ))
+            else:
+                incomes.append(Income(
+                    user=self.job.user, date=row.date, amount=row.amount,
+                    description=row.description,
+                ))
+        with transaction.atomic():
+            for model, created in ((Expense, expenses), (Income, incomes)):
+                if created:
+                    model.objects.bulk_create(created)
+                    bulk_saved.send(sender=model, created=created, updated=[])
+            ImportJob.objects.filter(pk=self.job.pk).update(
+                rows_done=F('rows_done') + len(chunk),
+                expenses=F('expenses') + len(expenses),
+                incomes=F('incomes') + len(incomes),
+                skipped=F('skipped') + skipped,
+                status=ImportJob.RUNNING,
+                updated_at=timezone.now(),
+            )
+
+
+PARSERS = {
+    'csv': parse_csv,
+    'ofx': parse_ofx,
+}
+
+
+def statement_rows(stream, statement_format, date_format=None):
+    """Returns the row iterator for a statement format"""
+    if statement_format == 'csv' and date_format:
+        return parse_csv(stream, date_format)
+    return PARSERS[statement_format](stream)
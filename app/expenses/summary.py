@@ -0,0 +1,73 @@
+from collections import OrderedDict
+from django.db.models import F, Sum
+from core.models import AnnualBudget, MonthBudget, MonthlyRollup
+
+
+def monthly_tag_totals(user, year=None, month=None):
+    """Returns expense totals grouped by year, month and expenses tag.
+
+    Totals are read from the incrementally maintained monthly rollups, so
+    the cost depends on the number of months and tags rather than on the
+    number of expenses. Expenses booked against a month budget are counted
+    under the tag of that budget.
+    """
+    queryset = MonthlyRollup.objects.filter(user=user,
+                                            kind=MonthlyRollup.EXPENSE)
+    if year is not None:
+        queryset = queryset.filter(year=year)
+    if month is not None:
+        queryset = queryset.filter(month=month)
+    return queryset.annotate(
+        tag=F('expenses_tag'),
+        tag_name=F('expenses_tag__name'),
+    ).values(
+        'year', 'month', 'tag', 'tag_name', 'total', 'count'
+    ).order_by('year', 'month', 'tag')
+
+
+def spending_summary(user, year=None, month=None):
+    """Builds the spending summary compared against the user budgets"""
+    rows = monthly_tag_totals(user, year, month)
+    month_budgets = MonthBudget.objects.filter(user=user)
+    annual_budgets = AnnualBudget.objects.filter(user=user)
+    if year is not None:
+        month_budgets = month_budgets.filter(annual_budget__year=year)
+        annual_budgets = annual_budgets.filter(year=year)
+    tag_budgets = {
+        (budget['annual_budget__year'], budget['expenses_tag']):
+            budget['amount']
+        for budget in month_budgets.values(
+            'annual_budget__year', 'expenses_tag'
+        ).annotate(amount=Sum('amount')).order_by()
+    }
+    year_budgets = dict(annual_budgets.values_list('year', 'amount'))
+
+    months = []
+    years = OrderedDict()
+    for row in rows:
+        budget = tag_budgets.get((row['year'], row['tag']))
+        months.append(OrderedDict([
+            ('year', row['year']),
+            ('month', row['month']),
+            ('expenses_tag', row['tag']),
+            ('expenses_tag_name', row['tag_name']),
+            ('total', row['total']),
+            ('count', row['count']),
+            ('budget', budget),
+            ('remaining', None if budget is None else budget - row['total']),
+        ]))
+        years[row['year']] = years.get(row['year'], 0) + row['total']
+
+    for budget_year in year_budgets:
+        years.setdefault(budget_year, 0)
+    annual = []
+    for summary_year in sorted(years):
+        budget = year_budgets.get(summary_year)
+        total = years[summary_year]
+        annual.append(OrderedDict([
+            ('year', summary_year),
+            ('total', total),
+            ('budget', budget),
+            ('remaining', None if budget is None else budget - total),
+        ]))
+    return OrderedDict([('months', months), ('years', annual)])
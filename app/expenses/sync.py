@@ -0,0 +1,147 @@
+from collections import OrderedDict
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from core.models import AnnualBudget, MonthBudget, Expense, ExpensesTag, \
+                        Income, Change, ChangeFeed
+from core.versions import collection_name
+from expenses import serializers
+
+
+SYNCED_COLLECTIONS = OrderedDict(
+    (collection_name(model), (model, serializer))
+    for model, serializer in (
+        (AnnualBudget, serializers.AnnualBudgetSerializer),
+        (ExpensesTag, serializers.ExpensesTagSerializer),
+        (MonthBudget, serializers.MonthBudgetSerializer),
+        (Expense, serializers.ExpenseSerializer),
+        (Income, serializers.IncomeSerializer),
+    )
+)
+
+ACTION_NAMES = {
+    Change.CREATED: 'created',
+    Change.UPDATED: 'updated',
+    Change.DELETED: 'deleted',
+}
+
+
+def feed_settings():
+    """Returns the CHANGE_FEED setting merged with the defaults"""
+    options = {
+        'RETENTION_DAYS': 90,
+    }
+    options.update(getattr(settings, 'CHANGE_FEED', {}))
+    return options
+
+
+class ResyncRequired(APIException):
+    """The changes after the revision were pruned from the feed, so the
+    client has to fetch the collections again"""
+    status_code = status.HTTP_410_GONE
+    default_detail = _('Revision too old, fetch the collections again.')
+    default_code = 'resync_required'
+
+    def __init__(self, revision):
+        super().__init__()
+        self.detail = {'detail': self.detail, 'revision': revision}
+
+
+def changes_since(user, since, limit, context=None):
+    """Returns the page of the user's change feed after a revision.
+
+    Several changes of the same row within the page are folded into the
+    latest one, which carries the current data of the row (or a tombstone
+    when it doesn't exist anymore). Rows are fetched with one query per
+    collection present in the page.
+
+    Raises ``ResyncRequired`` with the current revision when changes after
+    ``since`` were pruned.
+    """
+    revision, pruned = ChangeFeed.objects.filter(user=user).values_list(
+        'revision', 'pruned_revision'
+    ).first() or (0, 0)
+    if since < pruned:
+        raise ResyncRequired(revision)
+    page = list(
+        Change.objects.filter(user=user, revision__gt=since)
+        .order_by('revision')
+        .values_list('revision', 'collection', 'object_id', 'action')
+        [:limit + 1]
+    )
+    has_more = len(page) > limit
+    page = page[:limit]
+
+    latest = OrderedDict()
+    for revision, collection, object_id, action in page:
+        key = (collection, object_id)
+        previous = latest.pop(key, None)
+        if previous is not None and previous[1] == Change.CREATED and \
+                action == Change.UPDATED:
+            action = Change.CREATED
+        latest[key] = (revision, action)
+
+    wanted = {}
+    for (collection, object_id), (revision, action) in latest.items():
+        if action != Change.DELETED and collection in SYNCED_COLLECTIONS:
+            wanted.setdefault(collection, []).append(object_id)
+    rows = {
+        collection: SYNCED_COLLECTIONS[collection][0].objects.filter(
+            user=user
+        ).in_bulk(ids)
+        for collection, ids in wanted.items()
+    }
+
+    changes = []
+    for (collection, object_id), (revision, action) in latest.items():
+        if collection not in SYNCED_COLLECTIONS:
+            continue
+        instance = rows.get(collection, {}).get(object_id)
+        data = None
+        if instance is None:
+            action = Change.DELETED
+        else:
+            serializer = SYNCED_COLLECTIONS[collection][1]
+            data = serializer(instance, context=context).data
+        changes.append(OrderedDict([
+            ('revision', revision),
+            ('collection', collection.split('.')[-1]),
+            ('id', object_id),
+            ('action', ACTION_NAMES[action]),
+            ('data', data),
+        ]))
+
+    return OrderedDict([
+        ('revision', page[-1][0] if page else since),
+        ('has_more', has_more),
+        ('changes', changes),
+    ])
+
+
+def prune_changes(days=None):
+    """Deletes the changes older than ``days`` (RETENTION_DAYS by default)
+    and returns how many were deleted.
+
+    The pruned revision of each feed moves up to the last deleted change,
+    so clients that synced before it get ``ResyncRequired`` instead of a
+    feed missing changes.
+    """
+    if days is None:
+        days = feed_settings()['RETENTION_DAYS']
+    cutoff = timezone.now() - timedelta(days=days)
+    latest = Change.objects.filter(created_at__lt=cutoff).values(
+        'user'
+    ).annotate(revision=Max('revision')).order_by()
+    deleted = 0
+    for row in latest:
+        ChangeFeed.objects.filter(
+            user_id=row['user'], pruned_revision__lt=row['revision']
+        ).update(pruned_revision=row['revision'])
+        deleted += Change.objects.filter(
+            user_id=row['user'], revision__lte=row['revision']
+        ).delete()[0]
+    return deleted
@@ -0,0 +1,64 @@
+from datetime import date
+from decimal import Decimal
+import numpy as np
+from django.test import TestCase
+from core.models import Expense
+from expenses import analytics
+from expenses.tests.utils import sample_user, sample_expenses_tag,\
+                                 sample_expense, sample_income
+
+
+class AnalyticsTests(TestCase):
+    """Test the NumPy amount helpers"""
+
+    def setUp(self):
+        self.user = sample_user()
+        self.expenses_tag = sample_expenses_tag(self.user)
+
+    def expense(self, day, amount):
+        return sample_expense(self.user, date=day, amount=amount,
+                              expenses_tag=self.expenses_tag)
+
+    def test_exact_totals(self):
+        """Test amounts that drift as floats add up exactly"""
+        for _ in range(10):
+            self.expense(date(2020, 1, 1), '0.10')
+        self.expense(date(2020, 1, 2), '0.29')
+        days, cents = analytics.user_amounts(self.user)
+        self.assertEqual(cents.dtype, np.int64)
+        self.assertEqual(list(cents), [10] * 10 + [29])
+        self.assertEqual(analytics.total(cents), Decimal('1.29'))
+
+    def test_monthly_totals(self):
+        """Test amounts are binned per month"""
+        self.expense(date(2020, 1, 31), '10.50')
+        self.expense(date(2020, 1, 1), '1.25')
+        self.expense(date(2020, 3, 5), 7)
+        sample_expense(sample_user(email='other@test.com'),
+                       date=date(2020, 2, 1), amount=99,
+                       expenses_tag=self.expenses_tag)
+        months, totals = analytics.monthly_totals(
+            *analytics.user_amounts(self.user)
+        )
+        self.assertEqual([str(month) for month in months],
+                         ['2020-01', '2020-03'])
+        self.assertEqual(list(totals), [1175, 700])
+        months, totals = analytics.monthly_totals(
+            *analytics.load_amounts(Expense.objects.none())
+        )
+        self.assertEqual(len(months), 0)
+
+    def test_running_balance(self):
+        """Test the balance adds incomes and subtracts expenses per day"""
+        sample_income(self.user, date=date(2020, 1, 1), amount=100)
+        sample_income(self.user, date=date(2020, 1, 3), amount='50.50')
+        self.expense(date(2020, 1, 1), 30)
+        self.expense(date(2020, 1, 2), '0.25')
+        self.expense(date(2020, 1, 2), '0.25')
+        days, balance = analytics.user_balance(self.user,
+                                               date_to=date(2020, 1, 2))
+        self.assertEqual([str(day) for day in days],
+                         ['2020-01-01', '2020-01-02'])
+        self.assertEqual(list(balance), [7000, 6950])
+        self.assertEqual(analytics.cents_to_decimal(balance[-1]),
+                         Decimal('69.50'))
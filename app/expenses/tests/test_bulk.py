@@ -0,0 +1,97 @@
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from expenses.tests.utils import sample_user, sample_expenses_tag,\
+                                 sample_month_budget, sample_expense,\
+                                 sample_income
+from core.models import Expense, Income, MonthlyRollup
+
+
+EXPENSE_BULK_URL = reverse('expenses:expense-bulk')
+INCOME_BULK_URL = reverse('expenses:income-bulk')
+
+
+class BulkWriteTests(TestCase):
+    """Test the bulk create/update endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.expenses_tag = sample_expenses_tag(self.user)
+
+    def test_bulk_create_expenses(self):
+        """Test many expenses are created in one request"""
+        payload = [
+            {'date': '2020-05-0%d' % day, 'amount': 10 * day,
+             'expenses_tag': self.expenses_tag.id}
+            for day in range(1, 6)
+        ]
+        response = self.client.post(EXPENSE_BULK_URL, payload,
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 5)
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 5)
+        rollup = MonthlyRollup.objects.get(user=self.user)
+        self.assertEqual((rollup.total, rollup.count), (150, 5))
+
+    def test_bulk_update_and_create(self):
+        """Test items with id update the existing rows"""
+        expense = sample_expense(self.user, amount=100, date='2020-05-01',
+                                 expenses_tag=self.expenses_tag)
+        payload = [
+            {'id': expense.id, 'amount': 40},
+            {'date': '2020-05-02', 'amount': 5,
+             'expenses_tag': self.expenses_tag.id},
+        ]
+        response = self.client.post(EXPENSE_BULK_URL, payload,
+                                    format='json')
+        expense.refresh_from_db()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['updated'], 1)
+        self.assertEqual(expense.amount, 40)
+        rollup = MonthlyRollup.objects.get(user=self.user)
+        self.assertEqual((rollup.total, rollup.count), (45, 2))
+
+    def test_bulk_exclusive_budget_rule(self):
+        """Test per item errors and that nothing is written on error"""
+        month_budget = sample_month_budget(self.user)
+        payload = [
+            {'date': '2020-05-01', 'amount': 5,
+             'expenses_tag': self.expenses_tag.id},
+            {'date': '2020-05-01', 'amount': 5,
+             'expenses_tag': self.expenses_tag.id,
+             'month_budget': month_budget.id},
+            {'date': '2020-05-01', 'amount': 5},
+            {'date': '2020-05-01', 'amount': 0,
+             'expenses_tag': self.expenses_tag.id},
+        ]
+        response = self.client.post(EXPENSE_BULK_URL, payload,
+                                    format='json')
+        errors = response.data['errors']
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(errors[0], {})
+        self.assertIn('non_field_errors', errors[1])
+        self.assertIn('non_field_errors', errors[2])
+        self.assertIn('amount', errors[3])
+        self.assertFalse(Expense.objects.exists())
+
+    def test_bulk_update_other_user_not_found(self):
+        """Test users can't update rows of other users"""
+        other = sample_user(email='other@test.com')
+        income = sample_income(other)
+        response = self.client.post(INCOME_BULK_URL,
+                                    [{'id': income.id, 'amount': 1}],
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', response.data['errors'][0])
+        income.refresh_from_db()
+        self.assertEqual(income.amount, 4000)
+
+    def test_bulk_requires_list(self):
+        """Test the payload must be a list"""
+        response = self.client.post(INCOME_BULK_URL, {'amount': 1},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Income.objects.exists())
@@ -0,0 +1,127 @@
+from datetime import timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+from expenses.tests.utils import sample_user, sample_expenses_tag,\
+                                 sample_expense, sample_income
+from core.models import Change, Income
+from core.signals import bulk_saved
+
+
+CHANGES_URL = reverse('expenses:changes')
+
+
+class ChangesFeedTests(TestCase):
+    """Test the delta sync change feed"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.expenses_tag = sample_expenses_tag(self.user)
+
+    def sync(self, since=0, **params):
+        params['since'] = since
+        response = self.client.get(CHANGES_URL, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_changes_since_revision(self):
+        """Test only the rows written after the revision are returned"""
+        first = self.sync()
+        self.assertEqual(
+            [(c['collection'], c['action']) for c in first['changes']],
+            [('expensestag', 'created')]
+        )
+        expense = sample_expense(self.user, amount=10,
+                                 expenses_tag=self.expenses_tag)
+        expense.amount = 20
+        expense.save()
+        second = self.sync(first['revision'])
+        self.assertEqual(len(second['changes']), 1)
+        change = second['changes'][0]
+        self.assertEqual((change['collection'], change['id']),
+                         ('expense', expense.id))
+        self.assertEqual(change['action'], 'created')
+        self.assertEqual(change['data']['amount'], 20)
+        self.assertEqual(self.sync(second['revision'])['changes'], [])
+
+    def test_deleted_rows_leave_tombstones(self):
+        """Test deletions are reported without data"""
+        income = sample_income(self.user)
+        revision = self.sync()['revision']
+        income_id = income.id
+        income.delete()
+        changes = self.sync(revision)['changes']
+        self.assertEqual(len(changes), 1)
+        self.assertEqual(changes[0]['id'], income_id)
+        self.assertEqual(changes[0]['action'], 'deleted')
+        self.assertIsNone(changes[0]['data'])
+
+    def test_pages_are_bounded(self):
+        """Test the feed is paged with has_more"""
+        for _ in range(3):
+            sample_income(self.user)
+        page = self.sync(limit=2)
+        self.assertTrue(page['has_more'])
+        self.assertEqual(len(page['changes']), 2)
+        rest = self.sync(page['revision'], limit=2)
+        self.assertFalse(rest['has_more'])
+        self.assertEqual(len(rest['changes']), 2)
+
+    def test_other_users_changes_hidden(self):
+        """Test the feed only contains the user's own changes"""
+        other = sample_user(email='other@test.com')
+        sample_income(other)
+        changes = self.sync()['changes']
+        self.assertEqual([c['collection'] for c in changes], ['expensestag'])
+
+    def test_deleting_user_skips_tombstones(self):
+        """Test cascade deleting a user doesn't record its rows"""
+        other = sample_user(email='other@test.com')
+        sample_income(other)
+        other.delete()
+        self.assertFalse(Change.objects.filter(user_id=other.id).exists())
+
+    def test_revisions_count_per_user(self):
+        """Test each user's revisions follow each other from 1"""
+        other = sample_user(email='other@test.com')
+        sample_income(other)
+        sample_income(self.user)
+        incomes = [sample_income(self.user), sample_income(other)]
+        bulk_saved.send(sender=Income, created=incomes)
+        self.assertEqual(
+            list(Change.objects.filter(user=self.user)
+                 .order_by('revision').values_list('revision', flat=True)),
+            [1, 2, 3, 4]
+        )
+        self.assertEqual(
+            list(Change.objects.filter(user=other)
+                 .order_by('revision').values_list('revision', flat=True)),
+            [1, 2, 3]
+        )
+
+    def test_pruned_revision_needs_resync(self):
+        """Test syncing from before pruned changes answers 410"""
+        revision = self.sync()['revision']
+        sample_income(self.user)
+        Change.objects.filter(user=self.user).update(
+            created_at=timezone.now() - timedelta(days=100)
+        )
+        latest = sample_income(self.user)
+        out = StringIO()
+        call_command('prune_changes', days=90, stdout=out)
+        self.assertIn('2 changes pruned', out.getvalue())
+
+        response = self.client.get(CHANGES_URL, {'since': revision})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        self.assertEqual(response.data['revision'], 3)
+        self.assertEqual(
+            self.client.get(CHANGES_URL).status_code, status.HTTP_410_GONE
+        )
+        changes = self.sync(2)['changes']
+        self.assertEqual([c['id'] for c in changes], [latest.id])
@@ -0,0 +1,67 @@
+import threading
+from unittest import mock
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.coalescing import single_flight
+from expenses.tests.utils import sample_user, sample_expenses_tag, \
+                                 sample_expense
+
+
+EXPENSE_LIST_URL = reverse('expenses:expense-list')
+
+
+class CoalescedReadTests(TestCase):
+    """Test concurrent identical reads share one response"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.expenses_tag = sample_expenses_tag(self.user)
+        sample_expense(self.user, expenses_tag=self.expenses_tag)
+
+    def flight_keys(self, *paths):
+        with mock.patch.object(single_flight, 'do',
+                               wraps=single_flight.do) as do:
+            for path in paths:
+                self.client.get(path)
+        return [call[0][0] for call in do.call_args_list]
+
+    def test_keys_follow_path_and_revision(self):
+        """Test identical reads share a key that a write changes"""
+        first, same, filtered = self.flight_keys(
+            EXPENSE_LIST_URL, EXPENSE_LIST_URL, EXPENSE_LIST_URL + '?year=1'
+        )
+        self.assertEqual(first, same)
+        self.assertNotEqual(first, filtered)
+        sample_expense(self.user, expenses_tag=self.expenses_tag)
+        after_write, = self.flight_keys(EXPENSE_LIST_URL)
+        self.assertNotEqual(first, after_write)
+
+    def test_waiting_read_shares_response(self):
+        """Test a read arriving during an identical one reuses its data
+        without querying the rows"""
+        key, = self.flight_keys(EXPENSE_LIST_URL)
+        release = threading.Event()
+        shared = {'shared': True}
+
+        def leader():
+            release.wait(5)
+            return None, (status.HTTP_200_OK, shared, {'X-Leader': '1'})
+
+        thread = threading.Thread(target=single_flight.do,
+                                  args=(key, leader))
+        thread.start()
+        self.addCleanup(thread.join)
+        while not single_flight.in_flight():
+            pass
+        threading.Timer(0.2, release.set).start()
+        # Only the collection version is read
+        with self.assertNumQueries(1):
+            response = self.client.get(EXPENSE_LIST_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, shared)
+        self.assertEqual(response['X-Leader'], '1')
+        self.assertIn('ETag', response)
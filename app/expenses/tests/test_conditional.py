@@ -0,0 +1,90 @@
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from expenses.tests.utils import sample_user, sample_expenses_tag,\
+                                 sample_annual_budget, sample_expense
+
+
+EXPENSE_LIST_URL = reverse('expenses:expense-list')
+ANNUAL_BUDGET_LIST_URL = reverse('expenses:annualbudget-list')
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETag and Last-Modified revalidation of collections"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.expenses_tag = sample_expenses_tag(self.user)
+        self.expense = sample_expense(self.user,
+                                      expenses_tag=self.expenses_tag)
+
+    def test_not_modified_skips_list_query(self):
+        """Test a matching ETag is answered with a single query"""
+        response = self.client.get(EXPENSE_LIST_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(1):
+            cached = self.client.get(EXPENSE_LIST_URL,
+                                     HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached.content, b'')
+
+    def test_write_changes_etag(self):
+        """Test creating and deleting rows invalidates the ETag"""
+        etag = self.client.get(EXPENSE_LIST_URL)['ETag']
+        sample_expense(self.user, expenses_tag=self.expenses_tag)
+        response = self.client.get(EXPENSE_LIST_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        etag = response['ETag']
+        self.expense.delete()
+        response = self.client.get(EXPENSE_LIST_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_etag_depends_on_query(self):
+        """Test different pages of a collection get different ETags"""
+        first = self.client.get(EXPENSE_LIST_URL)['ETag']
+        other = self.client.get(EXPENSE_LIST_URL + '?page_size=1')['ETag']
+        self.assertNotEqual(first, other)
+
+    def test_if_modified_since(self):
+        """Test revalidation with Last-Modified"""
+        sample_annual_budget(self.user)
+        response = self.client.get(ANNUAL_BUDGET_LIST_URL)
+        cached = self.client.get(
+            ANNUAL_BUDGET_LIST_URL,
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified']
+        )
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_bulk_write_changes_etag(self):
+        """Test bulk writes also bump the collection version"""
+        etag = self.client.get(EXPENSE_LIST_URL)['ETag']
+        self.client.post(reverse('expenses:expense-bulk'), [
+            {'id': self.expense.id, 'amount': 1}
+        ], format='json')
+        response = self.client.get(EXPENSE_LIST_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_expanded_names_follow_related_writes(self):
+        """Test renaming a tag changes the ETag of lists showing its name,
+        and only of those"""
+        plain = self.client.get(EXPENSE_LIST_URL)['ETag']
+        expanded = self.client.get(EXPENSE_LIST_URL,
+                                   {'expand': 'names'})['ETag']
+        self.client.patch(
+            reverse('expenses:expensestag-detail',
+                    args=[self.expenses_tag.id]),
+            {'name': 'renamed'}
+        )
+        response = self.client.get(EXPENSE_LIST_URL, {'expand': 'names'},
+                                   HTTP_IF_NONE_MATCH=expanded)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0]['expenses_tag_name'],
+                         'renamed')
+        response = self.client.get(EXPENSE_LIST_URL,
+                                   HTTP_IF_NONE_MATCH=plain)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
@@ -275,4 +275,4 @@ class PrivateExpensesTests(TestCase):
         sample_expense(self.user, month_budget=month_budget)
         response = self.client.get(EXPENSE_LIST_URL)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 3)
+        self.assertEqual(len(response.data['results']), 3)
@@ -0,0 +1,110 @@
+import json
+from datetime import date
+from decimal import Decimal
+from unittest import mock
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from expenses.tests.utils import sample_user, sample_expenses_tag,\
+                                 sample_month_budget, sample_expense,\
+                                 sample_income
+
+
+EXPORT_URL = reverse('expenses:export')
+
+
+def content(response):
+    return b''.join(response.streaming_content).decode('utf-8')
+
+
+class ExportTests(TestCase):
+    """Test the streaming export endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.expenses_tag = sample_expenses_tag(self.user)
+
+    def test_export_unauthorized(self):
+        """Test anonymous users can't export"""
+        response = APIClient().get(EXPORT_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_export_expenses_csv(self):
+        """Test expenses are streamed as CSV filtered by date"""
+        sample_expense(self.user, amount=10, date=date(2020, 1, 1),
+                       description='old', expenses_tag=self.expenses_tag)
+        sample_expense(self.user, amount=20, date=date(2020, 2, 1),
+                       description='new', expenses_tag=self.expenses_tag)
+        response = self.client.get(EXPORT_URL, {'date_from': '2020-01-15'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        lines = content(response).splitlines()
+        self.assertEqual(lines[0], 'id,date,description,amount,'
+                                   'expenses_tag,month_budget')
+        self.assertEqual(len(lines), 2)
+        self.assertIn('new', lines[1])
+
+    @mock.patch('expenses.export.CHUNK_SIZE', 2)
+    def test_export_without_server_side_cursors(self):
+        """Test the rows are read in keyset chunks under transaction
+        pooling"""
+        days = [date(2020, 1, 3), date(2020, 1, 1), date(2020, 1, 3),
+                date(2020, 1, 2), date(2020, 1, 3)]
+        expenses = [sample_expense(self.user, date=day,
+                                   expenses_tag=self.expenses_tag)
+                    for day in days]
+        with mock.patch.dict(connection.settings_dict,
+                             {'DISABLE_SERVER_SIDE_CURSORS': True}), \
+                CaptureQueriesContext(connection) as queries:
+            response = self.client.get(EXPORT_URL, {'output': 'ndjson'})
+            rows = [json.loads(line)
+                    for line in content(response).splitlines()]
+        expected = sorted(expenses, key=lambda row: (row.date, row.id))
+        self.assertEqual([row['id'] for row in rows],
+                         [expense.id for expense in expected])
+        selects = [query for query in queries.captured_queries
+                   if 'core_expense' in query['sql']]
+        self.assertEqual(len(selects), 3)
+
+    def test_export_expenses_by_tag(self):
+        """Test the tag filter includes expenses of its month budgets"""
+        month_budget = sample_month_budget(self.user)
+        sample_expense(self.user, month_budget=month_budget)
+        sample_expense(self.user, expenses_tag=self.expenses_tag)
+        response = self.client.get(EXPORT_URL, {
+            'expenses_tag': month_budget.expenses_tag_id,
+            'output': 'ndjson',
+        })
+        rows = [json.loads(line) for line in content(response).splitlines()]
+        self.assertEqual([row['month_budget'] for row in rows],
+                         [month_budget.id])
+
+    def test_export_incomes_ndjson(self):
+        """Test incomes are streamed as JSON lines"""
+        sample_income(self.user, amount=Decimal('500.25'), periodicity='m')
+        sample_income(sample_user(email='other@test.com'))
+        response = self.client.get(EXPORT_URL, {'kind': 'income',
+                                                'output': 'ndjson'})
+        rows = [json.loads(line) for line in content(response).splitlines()]
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['periodicity'], 'm')
+        self.assertEqual(rows[0]['date'], '2020-12-12')
+        self.assertEqual(rows[0]['amount'], 500.25)
+
+    def test_export_invalid_params(self):
+        """Test invalid kinds, dates and filters are rejected"""
+        response = self.client.get(EXPORT_URL, {'kind': 'user'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(EXPORT_URL, {'date_to': '2020-13-45'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(EXPORT_URL, {
+            'kind': 'income', 'expenses_tag': self.expenses_tag.id
+        })
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('expenses_tag', response.data)
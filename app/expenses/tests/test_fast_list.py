@@ -0,0 +1,66 @@
+from datetime import date
+from unittest import mock
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from core.models import MonthBudget
+from expenses import views
+from expenses.tests.utils import sample_user, sample_expenses_tag,\
+                                 sample_annual_budget, sample_expense,\
+                                 sample_income
+
+
+EXPENSE_LIST_URL = reverse('expenses:expense-list')
+INCOME_LIST_URL = reverse('expenses:income-list')
+
+
+class FastListTests(TestCase):
+    """Test the values() list path renders like the serializers"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        tag = sample_expenses_tag(self.user, name='food')
+        month_budget = MonthBudget.objects.create(
+            user=self.user, amount=1000, expenses_tag=sample_expenses_tag(
+                self.user, name='car'
+            ), annual_budget=sample_annual_budget(self.user)
+        )
+        for day in range(1, 6):
+            sample_expense(self.user, description=f'tacos {day}',
+                           amount=10.25 * day, date=date(2020, 1, day),
+                           expenses_tag=tag)
+        sample_expense(self.user, description='gas', amount=500,
+                       date=date(2020, 1, 3), month_budget=month_budget)
+        sample_income(self.user, amount=1500.5, periodicity='m')
+        sample_income(self.user, description='', date='2020-01-01')
+
+    def assertSameAsSerializers(self, url, params):
+        """Compares the raw response bytes of both paths"""
+        fast = self.client.get(url, params)
+        with mock.patch.object(views.ExpenseViewSet, 'fast_list', False), \
+                mock.patch.object(views.IncomeViewSet, 'fast_list', False):
+            slow = self.client.get(url, params)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content)
+
+    def test_expenses_same_output(self):
+        """Test expenses render byte for byte like the serializer"""
+        for params in ({}, {'expand': 'names'}, {'page_size': 2},
+                       {'fields': 'amount,month_budget_name'},
+                       {'layout': 'columns', 'expand': 'names'}):
+            self.assertSameAsSerializers(EXPENSE_LIST_URL, params)
+
+    def test_incomes_same_output(self):
+        """Test incomes render byte for byte like the serializer"""
+        for params in ({}, {'layout': 'columns'}, {'fields': 'id,date'}):
+            self.assertSameAsSerializers(INCOME_LIST_URL, params)
+
+    def test_fast_list_follows_cursor(self):
+        """Test the cursor links work on values() rows"""
+        response = self.client.get(EXPENSE_LIST_URL, {'page_size': 4})
+        response = self.client.get(response.data['next'])
+        self.assertEqual([row['description'] for row in response.data[
+            'results']], ['tacos 2', 'tacos 1'])
+        self.assertIsNone(response.data['next'])
@@ -0,0 +1,88 @@
+from datetime import date
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from expenses.tests.utils import sample_user, sample_expenses_tag,\
+                                 sample_expense, sample_income
+
+
+EXPENSE_LIST_URL = reverse('expenses:expense-list')
+INCOME_LIST_URL = reverse('expenses:income-list')
+EXPENSES_TAG_LIST_URL = reverse('expenses:expensestag-list')
+
+
+class SparseFieldsTests(TestCase):
+    """Test sparse fieldsets and the columns layout"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.expenses_tag = sample_expenses_tag(self.user, name='food')
+        sample_expense(self.user, description='tacos', amount=50,
+                       date=date(2020, 1, 10), expenses_tag=self.expenses_tag)
+        sample_expense(self.user, description='pizza', amount=90,
+                       date=date(2020, 1, 11), expenses_tag=self.expenses_tag)
+
+    def test_fields_trim_output_and_columns(self):
+        """Test only the requested fields are selected and rendered"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(EXPENSE_LIST_URL,
+                                       {'fields': 'amount,description'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [
+            {'description': 'pizza', 'amount': 90.0},
+            {'description': 'tacos', 'amount': 50.0},
+        ])
+        select = queries.captured_queries[-1]['sql']
+        self.assertNotIn('"month_budget_id"', select)
+        self.assertNotIn('JOIN', select)
+
+    def test_fields_with_related_names(self):
+        """Test listing a name field joins only its relation"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(EXPENSE_LIST_URL,
+                                       {'fields': 'expenses_tag_name'})
+        self.assertEqual(response.data['results'][0],
+                         {'expenses_tag_name': 'food'})
+        select = queries.captured_queries[-1]['sql']
+        self.assertEqual(select.count('JOIN'), 1)
+
+    def test_unknown_fields_rejected(self):
+        """Test unknown fields return a 400"""
+        response = self.client.get(EXPENSE_LIST_URL, {'fields': 'amount,foo'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('fields', response.data)
+
+    def test_columns_layout(self):
+        """Test the columns layout sends names once and rows as arrays"""
+        sample_income(self.user, description='salary', amount=100,
+                      periodicity='m')
+        response = self.client.get(INCOME_LIST_URL, {
+            'layout': 'columns', 'fields': 'id,date,amount'
+        })
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual(results['columns'], ['date', 'amount', 'id'])
+        self.assertEqual(len(results['rows']), 1)
+        self.assertEqual(results['rows'][0][:2], ['2020-12-12', 100.0])
+
+    def test_columns_layout_paginates(self):
+        """Test the columns layout keeps the cursor links"""
+        response = self.client.get(EXPENSE_LIST_URL, {
+            'layout': 'columns', 'page_size': 1
+        })
+        self.assertEqual(len(response.data['results']['rows']), 1)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(response.data['results']['rows'][0][1], 'tacos')
+
+    def test_columns_layout_only_for_expenses_and_incomes(self):
+        """Test the layout param is rejected elsewhere"""
+        response = self.client.get(EXPENSES_TAG_LIST_URL,
+                                   {'layout': 'columns'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(EXPENSE_LIST_URL, {'layout': 'rows'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,114 @@
+from datetime import date
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import MonthBudget
+from expenses.tests.utils import sample_user, sample_expenses_tag,\
+                                 sample_annual_budget, sample_expense,\
+                                 sample_income
+
+
+EXPENSE_LIST_URL = reverse('expenses:expense-list')
+INCOME_LIST_URL = reverse('expenses:income-list')
+MONTH_BUDGET_LIST_URL = reverse('expenses:monthbudget-list')
+EXPENSES_TAG_LIST_URL = reverse('expenses:expensestag-list')
+
+
+def descriptions(response):
+    return sorted(row['description'] for row in response.data['results'])
+
+
+class QueryFilterTests(TestCase):
+    """Test filtering list endpoints with query params"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.food = sample_expenses_tag(self.user, name='food')
+        self.car = sample_expenses_tag(self.user, name='car')
+        self.annual_budget = sample_annual_budget(self.user)
+        self.month_budget = MonthBudget.objects.create(
+            user=self.user, amount=1000, annual_budget=self.annual_budget,
+            expenses_tag=self.car, description='car payment'
+        )
+        sample_expense(self.user, description='tacos', amount=50,
+                       date=date(2020, 1, 10), expenses_tag=self.food)
+        sample_expense(self.user, description='groceries', amount=800,
+                       date=date(2020, 2, 10), expenses_tag=self.food)
+        sample_expense(self.user, description='gas', amount=500,
+                       date=date(2021, 1, 10), month_budget=self.month_budget)
+        other = sample_user(email='other@test.com')
+        sample_expense(other, description='tacos', amount=50,
+                       date=date(2020, 1, 10),
+                       expenses_tag=sample_expenses_tag(other))
+
+    def test_filter_expenses_by_date_range(self):
+        """Test date_from/date_to and year narrow the expenses"""
+        response = self.client.get(EXPENSE_LIST_URL, {
+            'date_from': '2020-02-01', 'date_to': '2021-12-31'
+        })
+        self.assertEqual(descriptions(response), ['gas', 'groceries'])
+        response = self.client.get(EXPENSE_LIST_URL, {'year': 2020})
+        self.assertEqual(descriptions(response), ['groceries', 'tacos'])
+
+    def test_filter_expenses_by_budget(self):
+        """Test the tag filter covers expenses of its month budgets"""
+        response = self.client.get(EXPENSE_LIST_URL,
+                                   {'expenses_tag': self.car.id})
+        self.assertEqual(descriptions(response), ['gas'])
+        response = self.client.get(EXPENSE_LIST_URL,
+                                   {'annual_budget': self.annual_budget.id})
+        self.assertEqual(descriptions(response), ['gas'])
+        response = self.client.get(EXPENSE_LIST_URL,
+                                   {'month_budget': self.month_budget.id,
+                                    'expenses_tag': self.food.id})
+        self.assertEqual(descriptions(response), [])
+
+    def test_filter_expenses_by_amount_and_search(self):
+        """Test amount ranges and description search"""
+        response = self.client.get(EXPENSE_LIST_URL, {
+            'amount_min': 100, 'amount_max': 600
+        })
+        self.assertEqual(descriptions(response), ['gas'])
+        response = self.client.get(EXPENSE_LIST_URL, {'search': 'TAC'})
+        self.assertEqual(descriptions(response), ['tacos'])
+
+    def test_filter_other_collections(self):
+        """Test month budgets, tags and incomes filters"""
+        response = self.client.get(MONTH_BUDGET_LIST_URL, {'year': 2020})
+        self.assertEqual(descriptions(response), ['car payment'])
+        response = self.client.get(MONTH_BUDGET_LIST_URL, {'year': 2021})
+        self.assertEqual(descriptions(response), [])
+        response = self.client.get(EXPENSES_TAG_LIST_URL, {'search': 'fo'})
+        self.assertEqual([row['name'] for row in response.data['results']],
+                         ['food'])
+        sample_income(self.user, description='salary', periodicity='m')
+        sample_income(self.user, description='bonus', periodicity='a')
+        response = self.client.get(INCOME_LIST_URL, {'periodicity': 'a'})
+        self.assertEqual(descriptions(response), ['bonus'])
+
+    def test_filters_combine_with_pagination(self):
+        """Test next links keep the filters"""
+        response = self.client.get(EXPENSE_LIST_URL, {'expenses_tag':
+                                                      self.food.id,
+                                                      'page_size': 1})
+        self.assertEqual(descriptions(response), ['groceries'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual(descriptions(response), ['tacos'])
+        self.assertIsNone(response.data['next'])
+
+    def test_unknown_and_invalid_filters_rejected(self):
+        """Test unknown params and invalid values return a 400"""
+        response = self.client.get(EXPENSE_LIST_URL, {'amount': 50})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('amount', response.data)
+        response = self.client.get(INCOME_LIST_URL, {'expenses_tag': 1})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        for params in ({'date_from': '10/01/2020'}, {'year': 'last'},
+                       {'amount_min': 'ten'}, {'periodicity': 'w'}):
+            response = self.client.get(INCOME_LIST_URL, params)
+            self.assertEqual(response.status_code,
+                             status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(list(response.data), list(params))
@@ -0,0 +1,108 @@
+from collections import namedtuple
+from datetime import date
+from decimal import Decimal
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core import versions
+from core.models import Income
+from expenses.forecast import add_months, cash_flow_forecast, \
+                              income_occurrences
+from expenses.tests.utils import sample_user, sample_expenses_tag,\
+                                 sample_expense, sample_income
+
+
+FORECAST_URL = reverse('expenses:forecast')
+
+Row = namedtuple('Row', ['date', 'amount', 'periodicity'])
+
+
+class IncomeOccurrencesTests(TestCase):
+    """Test the expansion of periodic incomes"""
+
+    def test_monthly_clamped_to_month_end(self):
+        """Test monthly incomes on the 31st fall on the last day"""
+        salary = Row(date(2020, 1, 31), 100, 'm')
+        days = [day for day, amount, income in income_occurrences(
+            [salary], date(2020, 1, 1), date(2020, 4, 30)
+        )]
+        self.assertEqual(days, [date(2020, 2, 29), date(2020, 3, 31),
+                                date(2020, 4, 30)])
+        self.assertEqual(add_months(date(2020, 12, 15), 1),
+                         date(2021, 1, 15))
+
+    def test_window_far_from_origin(self):
+        """Test expansion starts at the window, not at the income date"""
+        rows = [Row(date(1990, 6, 10), 1, 'a'),
+                Row(date(2000, 3, 5), 1, 'm'),
+                Row(date(2030, 1, 1), 1, 'm'),
+                Row(date(2019, 1, 1), 1, '')]
+        occurrences = income_occurrences(rows, date(2020, 1, 1),
+                                         date(2020, 12, 31))
+        self.assertEqual(next(occurrences)[0], date(2020, 6, 10))
+        days = [day for day, amount, income in occurrences]
+        self.assertEqual(len(days), 12)
+        self.assertEqual(days[0], date(2020, 1, 5))
+
+
+class ForecastTests(TestCase):
+    """Test the cash flow forecast"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        sample_income(self.user, date=date(2020, 1, 15), amount=1000,
+                      periodicity='m')
+        sample_income(self.user, date=date(2020, 2, 1), amount='50.50')
+        sample_expense(self.user, date=date(2020, 2, 3), amount=300,
+                       expenses_tag=sample_expenses_tag(self.user))
+
+    def test_forecast(self):
+        """Test recorded and projected amounts per month"""
+        forecast = cash_flow_forecast(self.user, date(2020, 1, 1), 3)
+        self.assertEqual([(row['incomes'], row['projected_incomes'],
+                           row['expenses'], row['balance'])
+                          for row in forecast], [
+            (Decimal(1000), 0, 0, Decimal(1000)),
+            (Decimal('50.50'), Decimal(1000), Decimal(300),
+             Decimal('1750.50')),
+            (0, Decimal(1000), 0, Decimal('2750.50')),
+        ])
+
+    def test_forecast_cached_until_incomes_change(self):
+        """Test the projection is reused until an income is written"""
+        params = {'year': 2020, 'month': 3, 'months': 2}
+        self.client.get(FORECAST_URL, params)
+        # The rollups and the revision of the incomes
+        with self.assertNumQueries(2):
+            response = self.client.get(FORECAST_URL, params)
+        self.assertEqual(response.data[0]['projected_incomes'], 1000)
+        sample_income(self.user, date=date(2020, 1, 1), amount=5,
+                      periodicity='a')
+        sample_income(self.user, date=date(2020, 3, 1), amount=7,
+                      periodicity='m')
+        response = self.client.get(FORECAST_URL, params)
+        self.assertEqual(response.data[1]['projected_incomes'], 1007)
+
+    def test_forecast_follows_revision_of_other_workers(self):
+        """Test a projection cached before an income write made by another
+        process, which can't drop this process' cache, isn't reused"""
+        params = {'year': 2020, 'month': 3, 'months': 2}
+        self.client.get(FORECAST_URL, params)
+        Income.objects.filter(user=self.user).update(amount=2000)
+        versions.bump(self.user.pk, Income)
+        response = self.client.get(FORECAST_URL, params)
+        self.assertEqual(response.data[1]['projected_incomes'], 2000)
+
+    def test_forecast_params(self):
+        """Test the window params are validated"""
+        response = self.client.get(FORECAST_URL, {'months': 500})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(FORECAST_URL)
+        self.assertEqual(len(response.data), 12)
+        response = APIClient().get(FORECAST_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
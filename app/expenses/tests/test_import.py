@@ -0,0 +1,144 @@
+import io
+from datetime import date
+from decimal import Decimal
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import Expense, ExpensesTag, Income, ImportJob, \
+                        MonthlyRollup
+from expenses.statements import StatementImporter, statement_rows
+from expenses.tests.utils import sample_user, sample_expenses_tag
+
+
+IMPORT_URL = reverse('expenses:import')
+
+CSV_STATEMENT = (
+    'Date,Description,Amount\n'
+    '2020-01-02,OXXO cerveza,-35.50\n'
+    '2020-01-03,Car insurance payment,"-1,200.00"\n'
+    '2020-01-04,Payroll,15000\n'
+    'not a date,broken,-1\n'
+    '2020-01-05,Cinema tickets,(80)\n'
+)
+
+OFX_STATEMENT = (
+    'OFXHEADER:100\nDATA:OFXSGML\n\n<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS>'
+    '<BANKTRANLIST>\n'
+    '<STMTTRN><TRNTYPE>DEBIT<DTPOSTED>20200110120000[-6:CST]'
+    '<TRNAMT>-42.00<NAME>Cerveza bar<MEMO>friday</STMTTRN>\n'
+    '<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20200115'
+    '<TRNAMT>500.00<NAME>Refund</STMTTRN>\n'
+    '</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>\n'
+)
+
+
+class StatementImportTests(TestCase):
+    """Test importing bank statements"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.cerveza = sample_expenses_tag(self.user, name='cerveza')
+        self.insurance = sample_expenses_tag(self.user, name='car insurance')
+        sample_expenses_tag(self.user, name='car')
+
+    def upload(self, name, text, **data):
+        data['file'] = SimpleUploadedFile(name, text.encode('utf-8'))
+        return self.client.post(IMPORT_URL, data, format='multipart')
+
+    def test_import_unauthorized(self):
+        """Test anonymous users can't import statements"""
+        response = APIClient().post(IMPORT_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_import_csv(self):
+        """Test CSV rows become tagged expenses and incomes"""
+        response = self.upload('statement.csv', CSV_STATEMENT)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['status'], ImportJob.DONE)
+        self.assertEqual(response.data['rows'], 5)
+        self.assertEqual(response.data['expenses'], 3)
+        self.assertEqual(response.data['incomes'], 1)
+        self.assertEqual(response.data['skipped'], 1)
+
+        expenses = Expense.objects.filter(user=self.user).order_by('date')
+        self.assertEqual(
+            [(expense.amount, expense.expenses_tag.name)
+             for expense in expenses],
+            [(35.5, 'cerveza'), (1200, 'car insurance'),
+             (80, 'Uncategorized')]
+        )
+        income = Income.objects.get(user=self.user)
+        self.assertEqual((income.date, income.amount),
+                         (date(2020, 1, 4), 15000))
+        rollup = MonthlyRollup.objects.get(user=self.user,
+                                           expenses_tag=self.cerveza)
+        self.assertEqual((rollup.total, rollup.count), (35.5, 1))
+
+    def test_import_out_of_range_amounts(self):
+        """Test amounts that don't fit the amount fields are skipped"""
+        response = self.upload('statement.csv', (
+            'Date,Description,Amount\n'
+            '2020-01-02,huge,-1e20\n'
+            '2020-01-02,too many digits,-10000000000\n'
+            '2020-01-03,cerveza,-12.345\n'
+        ))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['status'], ImportJob.DONE)
+        self.assertEqual(response.data['skipped'], 2)
+        self.assertEqual(Expense.objects.get(user=self.user).amount,
+                         Decimal('12.34'))
+
+    def test_import_with_duplicate_default_tags(self):
+        """Test unmatched rows go to the oldest of same named tags"""
+        default = sample_expenses_tag(self.user, name='Uncategorized')
+        sample_expenses_tag(self.user, name='Uncategorized')
+        response = self.upload('statement.csv', CSV_STATEMENT)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Expense.objects.get(description='Cinema tickets')
+                         .expenses_tag, default)
+
+    def test_import_ofx(self):
+        """Test OFX transactions are imported"""
+        response = self.upload('statement.ofx', OFX_STATEMENT)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        expense = Expense.objects.get(user=self.user)
+        self.assertEqual(expense.date, date(2020, 1, 10))
+        self.assertEqual(expense.description, 'Cerveza bar friday')
+        self.assertEqual(expense.expenses_tag, self.cerveza)
+        self.assertEqual(Income.objects.get(user=self.user).amount, 500)
+
+    def test_import_invalid_statement(self):
+        """Test unknown formats and headers are rejected"""
+        response = self.upload('statement.pdf', CSV_STATEMENT)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.upload('statement.csv', 'when,what\n2020-01-01,x\n')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        job = ImportJob.objects.get(pk=response.data['job'])
+        self.assertEqual(job.status, ImportJob.FAILED)
+
+    def test_import_invalid_job(self):
+        """Test resuming a malformed or unknown job id is rejected"""
+        response = self.upload('statement.csv', CSV_STATEMENT, job='abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('job', response.data)
+        response = self.upload('statement.csv', CSV_STATEMENT, job=999)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(ImportJob.objects.exists())
+
+    def test_resume_import(self):
+        """Test a resumed job skips the rows already imported"""
+        job = ImportJob.objects.create(user=self.user, rows_done=3,
+                                       expenses=2, incomes=1)
+        stream = io.StringIO(CSV_STATEMENT)
+        job = StatementImporter(job, chunk_size=1).run(
+            statement_rows(stream, 'csv')
+        )
+        self.assertEqual((job.rows_done, job.expenses, job.skipped),
+                         (5, 3, 1))
+        self.assertEqual(Expense.objects.filter(user=self.user).count(), 1)
+        self.assertTrue(ExpensesTag.objects.filter(
+            user=self.user, name='Uncategorized').exists())
@@ -0,0 +1,79 @@
+from datetime import date
+from unittest import mock
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from expenses.pagination import KeysetPagination
+from expenses.tests.utils import sample_user, sample_expenses_tag,\
+                                 sample_expense, sample_income
+
+
+EXPENSE_LIST_URL = reverse('expenses:expense-list')
+INCOME_LIST_URL = reverse('expenses:income-list')
+EXPENSES_TAG_LIST_URL = reverse('expenses:expensestag-list')
+
+
+class KeysetPaginationTests(TestCase):
+    """Test cursor pagination on list endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.expenses_tag = sample_expenses_tag(self.user)
+
+    def walk(self, url):
+        """Follows every next link and returns all the pages"""
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            pages.append(response.data)
+            url = response.data['next']
+        return pages
+
+    def test_expenses_newest_first_across_pages(self):
+        """Test expenses are ordered by date and id across pages"""
+        days = [date(2020, 1, 1), date(2020, 1, 3), date(2020, 1, 3),
+                date(2020, 1, 2), date(2020, 1, 3)]
+        for day in days:
+            sample_expense(self.user, date=day,
+                           expenses_tag=self.expenses_tag)
+        pages = self.walk(EXPENSE_LIST_URL + '?page_size=2')
+        dates = [row['date'] for page in pages for row in page['results']]
+        self.assertEqual(len(pages), 3)
+        expected = ['2020-01-03'] * 3 + ['2020-01-02', '2020-01-01']
+        self.assertEqual(dates, expected)
+
+    def test_previous_link_returns_same_page(self):
+        """Test going back with the previous cursor"""
+        for day in range(1, 6):
+            sample_income(self.user, date=date(2020, 1, day))
+        first = self.client.get(INCOME_LIST_URL + '?page_size=2').data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual(back['results'], first['results'])
+        self.assertIsNone(first['previous'])
+
+    def test_page_size_query_param(self):
+        """Test page size query param sets the rows of a page"""
+        for name in ('a', 'b', 'c'):
+            sample_expenses_tag(self.user, name=name)
+        response = self.client.get(EXPENSES_TAG_LIST_URL + '?page_size=2')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+    @mock.patch.object(KeysetPagination, 'max_page_size', 3)
+    def test_page_size_is_capped(self):
+        """Test page sizes above the maximum return the maximum"""
+        for name in ('a', 'b', 'c', 'd'):
+            sample_expenses_tag(self.user, name=name)
+        response = self.client.get(EXPENSES_TAG_LIST_URL + '?page_size=10')
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_invalid_cursor(self):
+        """Test a tampered cursor returns not found"""
+        response = self.client.get(EXPENSE_LIST_URL + '?cursor=nonsense')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,178 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, Client
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework.test import APIClient
+from expenses.tests.utils import sample_user, sample_expenses_tag,\
+                                 sample_month_budget, sample_expense,\
+                                 sample_income
+from core.models import MonthBudget
+from core.tests.utils import QueryBudgetMixin
+
+
+class ConstantQueriesMixin:
+    """Asserts a request runs the same number of queries whatever the number
+    of rows it returns"""
+
+    def count_queries(self, client, url):
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def assertConstantQueries(self, client, url, add_rows):
+        add_rows(1)
+        few = self.count_queries(client, url)
+        add_rows(10)
+        many = self.count_queries(client, url)
+        self.assertEqual(few, many, f'{url} queries grow with the rows')
+
+
+class ListQueriesTests(ConstantQueriesMixin, TestCase):
+    """Test list endpoints don't run a query per row"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.month_budget = sample_month_budget(self.user)
+
+    def add_expenses(self, count):
+        for _ in range(count):
+            sample_expense(self.user, month_budget=self.month_budget)
+
+    def add_month_budgets(self, count):
+        for _ in range(count):
+            MonthBudget.objects.create(
+                user=self.user, amount=10,
+                annual_budget=self.month_budget.annual_budget,
+                expenses_tag=sample_expenses_tag(self.user)
+            )
+
+    def test_expense_list(self):
+        """Test expense list with expanded names"""
+        url = reverse('expenses:expense-list') + '?expand=names'
+        self.assertConstantQueries(self.client, url, self.add_expenses)
+
+    def test_expense_list_names(self):
+        """Test expanded names come from the month budget tag"""
+        self.add_expenses(1)
+        url = reverse('expenses:expense-list') + '?expand=names'
+        row = self.client.get(url).data['results'][0]
+        self.assertEqual(row['month_budget_name'],
+                         self.month_budget.expenses_tag.name)
+        self.assertIsNone(row['expenses_tag_name'])
+
+    def test_month_budget_list(self):
+        """Test month budget list with expanded names"""
+        url = reverse('expenses:monthbudget-list') + '?expand=names'
+        self.assertConstantQueries(self.client, url, self.add_month_budgets)
+
+    def test_income_list(self):
+        """Test income list"""
+        def add_incomes(count):
+            for _ in range(count):
+                sample_income(self.user)
+        url = reverse('expenses:income-list')
+        self.assertConstantQueries(self.client, url, add_incomes)
+
+
+class AdminQueriesTests(ConstantQueriesMixin, TestCase):
+    """Test admin changelists don't run a query per row"""
+
+    def setUp(self):
+        self.client = Client()
+        admin_user = get_user_model().objects.create_superuser(
+            email='superuser@test.com',
+            password='supersecretpass',
+        )
+        self.client.force_login(admin_user)
+        self.user = sample_user()
+        self.month_budget = sample_month_budget(self.user)
+
+    def test_expense_changelist(self):
+        """Test expense changelist renders __str__ without extra queries"""
+        def add_expenses(count):
+            for _ in range(count):
+                sample_expense(self.user, month_budget=self.month_budget)
+        url = reverse('admin:core_expense_changelist')
+        self.assertConstantQueries(self.client, url, add_expenses)
+
+    def test_month_budget_changelist(self):
+        """Test month budget changelist"""
+        def add_month_budgets(count):
+            for _ in range(count):
+                MonthBudget.objects.create(
+                    user=self.user, amount=10,
+                    annual_budget=self.month_budget.annual_budget,
+                    expenses_tag=sample_expenses_tag(self.user)
+                )
+        url = reverse('admin:core_monthbudget_changelist')
+        self.assertConstantQueries(self.client, url, add_month_budgets)
+
+
+class EndpointQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test the query budget of every endpoint, with rows to trigger N+1
+    patterns"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.month_budget = sample_month_budget(self.user)
+        self.expenses_tag = sample_expenses_tag(self.user, name='food')
+        for _ in range(5):
+            sample_expense(self.user, month_budget=self.month_budget)
+            sample_expense(self.user, expenses_tag=self.expenses_tag)
+            sample_income(self.user, periodicity='m')
+
+    def assertEndpointBudget(self, budget, method, url, data=None):
+        with self.assertQueryBudget(budget):
+            response = getattr(self.client, method)(url, data,
+                                                    format='json')
+        self.assertLess(response.status_code, 400, response.content)
+        return response
+
+    def test_list_budgets(self):
+        """Test list endpoints, with expanded names"""
+        for collection, budget in (('annualbudget', 2),
+                                   ('expensestag', 2),
+                                   ('monthbudget', 2),
+                                   ('expense', 2),
+                                   ('income', 2)):
+            url = reverse(f'expenses:{collection}-list') + '?expand=names'
+            with self.subTest(collection):
+                self.assertEndpointBudget(budget, 'get', url)
+
+    def test_detail_budgets(self):
+        """Test retrieving and updating an expense"""
+        expense = sample_expense(self.user, expenses_tag=self.expenses_tag)
+        url = reverse('expenses:expense-detail', args=[expense.id])
+        self.assertEndpointBudget(2, 'get', url)
+        self.assertEndpointBudget(8, 'patch', url, {'amount': 10})
+
+    def test_create_budget(self):
+        """Test creating an expense"""
+        payload = {'date': '2020-05-01', 'amount': 12, 'description': 'x',
+                   'expenses_tag': self.expenses_tag.id}
+        self.assertEndpointBudget(10, 'post',
+                                  reverse('expenses:expense-list'), payload)
+
+    def test_bulk_budget(self):
+        """Test bulk creating expenses runs no query per row"""
+        payload = [{'date': '2020-05-01', 'amount': index + 1,
+                    'expenses_tag': self.expenses_tag.id}
+                   for index in range(10)]
+        self.assertEndpointBudget(9, 'post',
+                                  reverse('expenses:expense-bulk'), payload)
+
+    def test_report_budgets(self):
+        """Test the summary, report, forecast and changes endpoints"""
+        for name, budget in (('summary', 3), ('report', 4),
+                             ('forecast', 3), ('changes', 7)):
+            with self.subTest(name):
+                self.assertEndpointBudget(budget, 'get',
+                                          reverse(f'expenses:{name}'))
@@ -0,0 +1,104 @@
+import json
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from core.models import AnnualBudget, MonthBudget
+from expenses.analytics import budget_report, budget_reports
+from expenses.tests.utils import sample_user, sample_expenses_tag,\
+                                 sample_expense
+
+
+REPORT_URL = reverse('expenses:report')
+AS_OF = date(2020, 4, 10)
+
+
+class BudgetReportTests(TestCase):
+    """Test the budget vs actual reports"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+        self.food = sample_expenses_tag(self.user, name='food')
+        self.car = sample_expenses_tag(self.user, name='car')
+        annual_budget = AnnualBudget.objects.create(user=self.user,
+                                                    year=2020, amount=36600)
+        self.car_budget = MonthBudget.objects.create(
+            user=self.user, annual_budget=annual_budget,
+            expenses_tag=self.car, amount=300
+        )
+        MonthBudget.objects.create(user=self.user,
+                                   annual_budget=annual_budget,
+                                   expenses_tag=self.food, amount=1000)
+        sample_expense(self.user, date=date(2020, 4, 2), amount=100,
+                       expenses_tag=self.food)
+        sample_expense(self.user, date=date(2020, 4, 9), amount='200.50',
+                       month_budget=self.car_budget)
+        sample_expense(self.user, date=date(2020, 3, 9), amount=50,
+                       expenses_tag=self.food)
+        sample_expense(self.user, date=date(2020, 4, 11), amount=999,
+                       expenses_tag=self.food)
+
+    def test_month_and_tag_metrics(self):
+        """Test the month burn rate, projection and variance per tag"""
+        report = budget_report(self.user, AS_OF)
+        self.assertEqual(report['month'], {
+            'budget': Decimal('1300.00'),
+            'spent': Decimal('300.50'),
+            'variance': Decimal('999.50'),
+            'burn_rate': Decimal('30.05'),
+            'projected': Decimal('901.50'),
+            'projected_overrun': Decimal('0.00'),
+        })
+        car = [row for row in report['tags']
+               if row['expenses_tag'] == self.car.id][0]
+        self.assertEqual(car['expenses_tag_name'], 'car')
+        self.assertEqual(car['projected'], Decimal('601.50'))
+        self.assertEqual(car['projected_overrun'], Decimal('301.50'))
+        self.assertEqual(car['variance'], Decimal('99.50'))
+
+    def test_year_metrics(self):
+        """Test the year to date spending against the annual budget"""
+        year = budget_report(self.user, AS_OF)['year']
+        self.assertEqual(year['spent'], Decimal('350.50'))
+        self.assertEqual(year['burn_rate'], Decimal('3.47'))
+        self.assertEqual(year['variance'], Decimal('36249.50'))
+
+    def test_users_without_budgets(self):
+        """Test budget metrics are empty when there is no budget"""
+        other = sample_user(email='other@test.com')
+        sample_expense(other, date=date(2020, 4, 1), amount=10,
+                       expenses_tag=sample_expenses_tag(other))
+        reports = budget_reports([other.id, self.user.id], AS_OF)
+        self.assertEqual(list(reports), [self.user.id, other.id])
+        self.assertIsNone(reports[other.id]['year']['budget'])
+        self.assertIsNone(reports[other.id]['tags'][0]['projected_overrun'])
+        self.assertEqual(reports[other.id]['month']['spent'], Decimal('10'))
+        self.assertEqual(len(reports[self.user.id]['tags']), 2)
+
+    def test_report_endpoint(self):
+        """Test the report endpoint"""
+        response = self.client.get(REPORT_URL, {'as_of': '2020-04-10'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['month']['spent'], Decimal('300.50'))
+        response = self.client.get(REPORT_URL, {'as_of': 'April'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = APIClient().get(REPORT_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_nightly_command(self):
+        """Test the command writes one JSON line per user"""
+        sample_user(email='other@test.com')
+        out = StringIO()
+        call_command('budget_reports', as_of='2020-04-10', batch_size=1,
+                     stdout=out, stderr=StringIO())
+        reports = [json.loads(line) for line in out.getvalue().splitlines()]
+        self.assertEqual([report['user'] for report in reports],
+                         sorted(report['user'] for report in reports))
+        self.assertEqual(len(reports), 2)
+        self.assertEqual(reports[0]['month']['spent'], '300.50')
@@ -0,0 +1,68 @@
+from datetime import date
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from expenses.tests.utils import sample_user, sample_expenses_tag,\
+                                 sample_annual_budget, sample_expense
+from core.models import MonthBudget
+
+
+SUMMARY_URL = reverse('expenses:summary')
+
+
+class SpendingSummaryTests(TestCase):
+    """Test the aggregated spending summary endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = sample_user()
+        self.client.force_authenticate(self.user)
+
+    def test_summary_unauthorized(self):
+        """Test anonymous users can not see the summary"""
+        response = APIClient().get(SUMMARY_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_summary_groups_by_month_and_tag(self):
+        """Test totals are grouped and compared with the budgets"""
+        annual_budget = sample_annual_budget(self.user, amount=10000)
+        food = sample_expenses_tag(self.user, name='food')
+        car = sample_expenses_tag(self.user, name='car')
+        month_budget = MonthBudget.objects.create(
+            user=self.user, amount=1000, annual_budget=annual_budget,
+            expenses_tag=food
+        )
+        sample_expense(self.user, amount=100, date=date(2020, 5, 1),
+                       month_budget=month_budget)
+        sample_expense(self.user, amount=200, date=date(2020, 5, 9),
+                       expenses_tag=food)
+        sample_expense(self.user, amount=50, date=date(2020, 5, 2),
+                       expenses_tag=car)
+        sample_expense(self.user, amount=70, date=date(2020, 6, 2),
+                       expenses_tag=car)
+        other = sample_user(email='other@test.com')
+        sample_expense(other, amount=999, date=date(2020, 5, 1),
+                       expenses_tag=sample_expenses_tag(other))
+
+        with self.assertNumQueries(3):
+            response = self.client.get(SUMMARY_URL, {'year': 2020})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        months = [
+            (row['month'], row['expenses_tag_name'], row['total'],
+             row['count'], row['remaining'])
+            for row in response.data['months']
+        ]
+        self.assertEqual(months, [
+            (5, 'food', 300, 2, 700),
+            (5, 'car', 50, 1, None),
+            (6, 'car', 70, 1, None),
+        ])
+        self.assertEqual(response.data['years'][0]['total'], 420)
+        self.assertEqual(response.data['years'][0]['remaining'], 9580)
+
+    def test_summary_invalid_month(self):
+        """Test an out of range month is rejected"""
+        response = self.client.get(SUMMARY_URL, {'month': 13})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -15,5 +15,11 @@ router.register('income', views.IncomeViewSet)
 
 
 urlpatterns = [
+    path('summary/', views.SpendingSummaryView.as_view(), name='summary'),
+    path('report/', views.BudgetReportView.as_view(), name='report'),
+    path('forecast/', views.ForecastView.as_view(), name='forecast'),
+    path('changes/', views.ChangesView.as_view(), name='changes'),
+    path('export/', views.ExportView.as_view(), name='export'),
+    path('import/', views.StatementImportView.as_view(), name='import'),
     path('', include(router.urls))
 ]
@@ -1,21 +1,57 @@
-from rest_framework import viewsets, mixins
-from rest_framework.authentication import TokenAuthentication
+import io
+import os
+from datetime import date
+from django.http import StreamingHttpResponse
+from django.utils.dateparse import parse_date
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status, viewsets, mixins
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from expenses import serializers
-from core.models import AnnualBudget, MonthBudget, Expense, ExpensesTag, Income
+from expenses.analytics import budget_report
+from expenses.forecast import cash_flow_forecast
+from expenses.filters import AMOUNT_FILTERS, DATE_FILTERS, choice, lookup, \
+                             parse_int, parse_year
+from expenses.export import CONTENT_TYPES, EXPORT_COLUMNS, export_queryset, \
+                            stream_rows
+from expenses.mixins import BulkWriteMixin, CachedResponseMixin, \
+                            CoalescedReadMixin, ConditionalGetMixin, \
+                            FastListMixin, QueryFilterMixin, \
+                            SparseFieldsViewMixin
+from expenses.statements import PARSERS, StatementError, \
+                                StatementImporter, statement_rows
+from expenses.summary import spending_summary
+from expenses.sync import changes_since
+from expenses.pagination import DatedKeysetPagination
+from user.authentication import CachedTokenAuthentication
+from core.models import AnnualBudget, MonthBudget, Expense, ExpensesTag, \
+                        Income, ImportJob
 
 
-class BaseBudgetViewSet(viewsets.GenericViewSet,
+class BaseBudgetViewSet(SparseFieldsViewMixin,
+                        QueryFilterMixin,
+                        ConditionalGetMixin,
+                        CachedResponseMixin,
+                        CoalescedReadMixin,
+                        FastListMixin,
+                        viewsets.GenericViewSet,
                         mixins.ListModelMixin,
                         mixins.CreateModelMixin,
                         mixins.UpdateModelMixin,
                         mixins.RetrieveModelMixin):
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    select_related = ()
 
     def get_queryset(self):
         """Returns annual of the authenticated user."""
-        return self.queryset.filter(user=self.request.user)
+        queryset = self.queryset.filter(user=self.request.user)
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        return queryset
 
     def perform_create(self, serializer):
         """Saves a new object"""
@@ -26,27 +62,240 @@ class AnnualBudgetViewSet(BaseBudgetViewSet):
     """Manage annual budget in the database"""
     queryset = AnnualBudget.objects.all()
     serializer_class = serializers.AnnualBudgetSerializer
+    cache_responses = True
+    filter_params = dict(AMOUNT_FILTERS, year=lookup('year', parse=parse_year))
 
 
 class ExpensesTagViewSet(BaseBudgetViewSet):
     """Manage expenses tag in the database"""
     queryset = ExpensesTag.objects.all()
     serializer_class = serializers.ExpensesTagSerializer
+    cache_responses = True
+    filter_params = {'search': lookup('name__icontains')}
 
 
 class MonthBudgetViewSet(BaseBudgetViewSet):
     """Manage month budget in the database"""
     queryset = MonthBudget.objects.all()
     serializer_class = serializers.MonthBudgetSerializer
+    cache_responses = True
+    select_related = ('expenses_tag',)
+    filter_params = dict(
+        AMOUNT_FILTERS,
+        expenses_tag=lookup('expenses_tag', parse=parse_int),
+        annual_budget=lookup('annual_budget', parse=parse_int),
+        year=lookup('annual_budget__year', parse=parse_year),
+    )
 
 
-class ExpenseViewSet(BaseBudgetViewSet):
+class ExpenseViewSet(BulkWriteMixin, BaseBudgetViewSet):
     """Manage single expenses"""
     queryset = Expense.objects.all()
     serializer_class = serializers.ExpenseSerializer
+    select_related = ('expenses_tag', 'month_budget__expenses_tag')
+    pagination_class = DatedKeysetPagination
+    layouts = ('objects', 'columns')
+    fast_list = True
+    coalesce_reads = True
+    filter_params = dict(
+        AMOUNT_FILTERS,
+        **DATE_FILTERS,
+        expenses_tag=lookup('expenses_tag', 'month_budget__expenses_tag',
+                            parse=parse_int),
+        month_budget=lookup('month_budget', parse=parse_int),
+        annual_budget=lookup('month_budget__annual_budget', parse=parse_int),
+    )
 
+    def bulk_validate_instance(self, instance):
+        """Enforces the month budget / expenses tag exclusive choice"""
+        instance.validate_budget_choice()
 
-class IncomeViewSet(BaseBudgetViewSet):
+
+class IncomeViewSet(BulkWriteMixin, BaseBudgetViewSet):
     """Manage single incomes"""
     queryset = Income.objects.all()
     serializer_class = serializers.IncomeSerializer
+    pagination_class = DatedKeysetPagination
+    layouts = ('objects', 'columns')
+    fast_list = True
+    coalesce_reads = True
+    filter_params = dict(
+        AMOUNT_FILTERS,
+        **DATE_FILTERS,
+        periodicity=choice('periodicity', Income.periodicityChoices),
+    )
+
+
+def int_query_param(request, name, minimum=None, maximum=None):
+    """Returns an optional integer query param or raises a 400"""
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValidationError({name: _('A valid integer is required.')})
+    if (minimum is not None and value < minimum) or \
+            (maximum is not None and value > maximum):
+        raise ValidationError({name: _('Value out of range.')})
+    return value
+
+
+def date_query_param(request, name):
+    """Returns an optional YYYY-MM-DD query param or raises a 400"""
+    value = request.query_params.get(name)
+    if value in (None, ''):
+        return None
+    try:
+        parsed = parse_date(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: _('Use the YYYY-MM-DD format.')})
+    return parsed
+
+
+def choice_query_param(request, name, choices, default):
+    """Returns a query param that must be one of the choices"""
+    value = request.query_params.get(name) or default
+    if value not in choices:
+        raise ValidationError(
+            {name: _('Must be one of: %s.') % ', '.join(sorted(choices))}
+        )
+    return value
+
+
+class SpendingSummaryView(APIView):
+    """Spending per month and expenses tag against the user budgets"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        year = int_query_param(request, 'year')
+        month = int_query_param(request, 'month', minimum=1, maximum=12)
+        return Response(spending_summary(request.user, year, month))
+
+
+class BudgetReportView(APIView):
+    """Budget vs actual spending of the month and year of a day"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        as_of = date_query_param(request, 'as_of')
+        return Response(budget_report(request.user, as_of))
+
+
+class ForecastView(APIView):
+    """Month by month cash flow including recurring incomes"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    default_months = 12
+    max_months = 120
+
+    def get(self, request):
+        today = date.today()
+        year = int_query_param(request, 'year', minimum=1,
+                               maximum=date.max.year - 10) or today.year
+        month = int_query_param(request, 'month', minimum=1,
+                                maximum=12) or today.month
+        months = int_query_param(request, 'months', minimum=1,
+                                 maximum=self.max_months) or \
+            self.default_months
+        return Response(cash_flow_forecast(request.user, date(year, month, 1),
+                                           months))
+
+
+class ChangesView(APIView):
+    """Changes of the user's rows since a revision, for delta sync"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    default_limit = 500
+    max_limit = 1000
+
+    def get(self, request):
+        since = int_query_param(request, 'since', minimum=0) or 0
+        limit = int_query_param(request, 'limit', minimum=1,
+                                maximum=self.max_limit) or self.default_limit
+        return Response(changes_since(request.user, since, limit,
+                                      context={'request': request}))
+
+
+class ExportView(APIView):
+    """Streams the user's expenses or incomes as CSV or JSON lines"""
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request):
+        kind = choice_query_param(request, 'kind', EXPORT_COLUMNS, 'expense')
+        output = choice_query_param(request, 'output', CONTENT_TYPES, 'csv')
+        expenses_tag = int_query_param(request, 'expenses_tag')
+        if expenses_tag is not None and kind != 'expense':
+            raise ValidationError({'expenses_tag': _(
+                'Only expenses can be filtered by expenses tag.')})
+        queryset = export_queryset(
+            request.user, kind,
+            date_from=date_query_param(request, 'date_from'),
+            date_to=date_query_param(request, 'date_to'),
+            expenses_tag=expenses_tag,
+        )
+        response = StreamingHttpResponse(
+            stream_rows(queryset, EXPORT_COLUMNS[kind][1], output),
+            content_type=CONTENT_TYPES[output]
+        )
+        response['Content-Disposition'] = \
+            f'attachment; filename="{kind}s.{output}"'
+        return response
+
+
+class StatementImportView(APIView):
+    """Imports an uploaded CSV/OFX bank statement.
+
+    Send the same file again with the ``job`` id of a failed import to
+    resume it after the last committed chunk.
+    """
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    parser_classes = (MultiPartParser,)
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            raise ValidationError({'file': _('This field is required.')})
+        statement_format = request.data.get('statement_format') or \
+            os.path.splitext(upload.name)[1].lstrip('.').lower()
+        if statement_format not in PARSERS:
+            raise ValidationError({'statement_format': _(
+                'Must be one of: %s.') % ', '.join(sorted(PARSERS))})
+        job_id = request.data.get('job')
+        if job_id:
+            try:
+                job_id = int(job_id)
+            except ValueError:
+                raise ValidationError(
+                    {'job': _('A valid integer is required.')}
+                )
+            job = ImportJob.objects.filter(user=request.user,
+                                           pk=job_id).first()
+            if job is None:
+                raise NotFound(_('Import job not found.'))
+        else:
+            job = ImportJob.objects.create(user=request.user,
+                                           source=upload.name[:255])
+
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig',
+                                  newline='')
+        try:
+            job = StatementImporter(job).run(statement_rows(
+                stream, statement_format, request.data.get('date_format')
+            ))
+        except (StatementError, UnicodeDecodeError) as exc:
+            raise ValidationError({'file': [str(exc)], 'job': job.pk})
+        return Response({
+            'job': job.pk,
+            'status': job.status,
+            'rows': job.rows_done,
+            'expenses': job.expenses,
+            'incomes': job.incomes,
+            'skipped': job.skipped,
+        }, status=status.HTTP_201_CREATED)
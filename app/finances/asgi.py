@@ -7,10 +7,120 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.0/howto/deployment/asgi/
 """
 
+import asyncio
 import os
+from concurrent.futures import ThreadPoolExecutor
 
-from django.core.asgi import get_asgi_application
+import django
+from django.conf import settings
+from django.core import signals
+from django.core.exceptions import RequestAborted
+from django.core.handlers.asgi import ASGIHandler
+from django.http import FileResponse
+from django.urls import set_script_prefix
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'finances.settings')
 
-application = get_asgi_application()
+
+class ThreadPoolASGIHandler(ASGIHandler):
+    """ASGI handler that runs the synchronous part of every request in a
+    bounded pool of ``ASGI_THREADS`` threads.
+
+    Reading the request body and sending buffered responses happen on the
+    event loop, so slow clients only hold a socket, not a thread. The
+    request itself (middleware, view, DB access and closing the response)
+    runs start to end in one pool thread, so each thread keeps using its
+    own DB connection. Streaming responses stay pinned to that thread
+    until sent, because their queryset iterators hold its connection.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.ASGI_THREADS, thread_name_prefix='asgi'
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            raise ValueError(
+                'Django can only handle ASGI/HTTP connections, not %s.'
+                % scope['type']
+            )
+        try:
+            body_file = await self.read_body(receive)
+        except RequestAborted:
+            return
+        loop = asyncio.get_event_loop()
+        response = await loop.run_in_executor(
+            self.executor, self.run_request, scope, body_file
+        )
+        if response.streaming:
+            await loop.run_in_executor(
+                self.executor, self.stream_response, response, send, loop
+            )
+        else:
+            await self.send_buffered(response, send)
+
+    def run_request(self, scope, body_file):
+        set_script_prefix(self.get_script_prefix(scope))
+        signals.request_started.send(sender=self.__class__, scope=scope)
+        request, response = self.create_request(scope, body_file)
+        if request is not None:
+            response = self.get_response(request)
+        response._handler_class = self.__class__
+        if isinstance(response, FileResponse):
+            response.block_size = self.chunk_size
+        if not response.streaming:
+            # Fires request_finished in this thread, which owns the DB
+            # connection; the content is already in memory.
+            response.close()
+        return response
+
+    def response_start(self, response):
+        headers = []
+        for header, value in response.items():
+            if isinstance(header, str):
+                header = header.encode('ascii')
+            if isinstance(value, str):
+                value = value.encode('latin1')
+            headers.append((bytes(header), bytes(value)))
+        for cookie in response.cookies.values():
+            headers.append(
+                (b'Set-Cookie',
+                 cookie.output(header='').encode('ascii').strip())
+            )
+        return {
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': headers,
+        }
+
+    async def send_buffered(self, response, send):
+        await send(self.response_start(response))
+        for chunk, last in self.chunk_bytes(response.content):
+            await send({
+                'type': 'http.response.body',
+                'body': chunk,
+                'more_body': not last,
+            })
+
+    def stream_response(self, response, send, loop):
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        try:
+            emit(self.response_start(response))
+            for part in response:
+                for chunk, _ in self.chunk_bytes(part):
+                    emit({
+                        'type': 'http.response.body',
+                        'body': chunk,
+                        'more_body': True,
+                    })
+            emit({'type': 'http.response.body'})
+        finally:
+            response.close()
+
+
+django.setup(set_prefix=False)
+application = ThreadPoolASGIHandler()
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.0/ref/settings/
 """
 
 import os
+import tempfile
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -45,10 +46,13 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'core',
     'user',
-    'expenses'
+    'expenses',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.QueryAuditMiddleware',
+    'core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -78,6 +82,10 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'finances.wsgi.application'
 
+# Threads running the synchronous request handling under ASGI, see
+# finances/asgi.py. They bound the DB connections of an ASGI worker.
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', 20))
+
 
 # Database
 # https://docs.djangoproject.com/en/3.0/ref/settings/#databases
@@ -89,9 +97,26 @@ DATABASES = {
         'NAME': os.environ.get('DB_NAME'),
         'USER': os.environ.get('DB_USER'),
         'PASSWORD': os.environ.get('DB_PASS'),
+        'PORT': os.environ.get('DB_PORT', ''),
+        # Seconds a connection is reused by the next requests of its
+        # thread; 0 opens a new connection for every request.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
     }
 }
 
+# Ping reused connections when a request starts and reconnect the ones
+# the server closed.
+DB_CONN_HEALTH_CHECKS = os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1'
+
+# DB_POOL_MODE=transaction is the profile for connecting through pgbouncer
+# in transaction pooling mode (docker-compose.pgbouncer.yml). Consecutive
+# transactions of a client may run on different server connections, so
+# server side cursors, which outlive their transaction, are disabled. The
+# export (expenses/export.py) then reads its rows in keyset chunks.
+DB_POOL_MODE = os.environ.get('DB_POOL_MODE', '')
+if DB_POOL_MODE == 'transaction':
+    DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+
 
 
 # Password validation
@@ -112,6 +137,41 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Password hashing (user/hashers.py). PROFILE picks the hasher of new and
+# upgraded hashes, pbkdf2, argon2 (argon2-cffi) or bcrypt (bcrypt), with
+# the costs below; the other hashers still verify existing hashes, which
+# are rehashed on the next login. The hashing of logins, sign ups and
+# password changes runs in a pool of THREADS threads per process
+# (user/credentials.py) with QUEUE waiting slots; the rest, and requests
+# waiting more than TIMEOUT seconds, get a 503. Keep THREADS + QUEUE below
+# the request threads of a worker (GUNICORN_THREADS or ASGI_THREADS).
+PASSWORD_HASHING = {
+    'PROFILE': os.getenv('PASSWORD_HASHER_PROFILE', 'pbkdf2'),
+    'PBKDF2_ITERATIONS': int(os.getenv('PBKDF2_ITERATIONS', 180000)),
+    'ARGON2_TIME_COST': int(os.getenv('ARGON2_TIME_COST', 3)),
+    'ARGON2_MEMORY_COST': int(os.getenv('ARGON2_MEMORY_COST', 65536)),
+    'ARGON2_PARALLELISM': int(os.getenv('ARGON2_PARALLELISM', 1)),
+    'BCRYPT_ROUNDS': int(os.getenv('BCRYPT_ROUNDS', 12)),
+    'THREADS': int(os.getenv('PASSWORD_HASHING_THREADS', 2)),
+    'QUEUE': int(os.getenv('PASSWORD_HASHING_QUEUE', 16)),
+    'TIMEOUT': float(os.getenv('PASSWORD_HASHING_TIMEOUT', 10)),
+}
+
+PASSWORD_HASHER_PROFILES = {
+    'pbkdf2': 'user.hashers.TunedPBKDF2PasswordHasher',
+    'argon2': 'user.hashers.TunedArgon2PasswordHasher',
+    'bcrypt': 'user.hashers.TunedBCryptSHA256PasswordHasher',
+}
+
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_PROFILES[PASSWORD_HASHING['PROFILE']],
+] + [
+    hasher for profile, hasher in PASSWORD_HASHER_PROFILES.items()
+    if profile != PASSWORD_HASHING['PROFILE']
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/3.0/topics/i18n/
@@ -136,3 +196,134 @@ STATIC_ROOT = os.path.join(BASE_DIR, "staticfiles")
 MEDIA_URL = '/media/'
 MEDIA_ROOT = '/vol/web'
 AUTH_USER_MODEL = 'core.User'
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'expenses.pagination.KeysetPagination',
+    'PAGE_SIZE': int(os.getenv('API_PAGE_SIZE', 100)),
+    'COERCE_DECIMAL_TO_STRING': False,
+    'DEFAULT_THROTTLE_CLASSES': (
+        'core.throttling.UserBucketThrottle',
+        'core.throttling.TokenBucketThrottle',
+    ),
+    # Reverse proxies in front of the app (nginx): the address the last
+    # one appended to X-Forwarded-For identifies anonymous clients for the
+    # throttles. 0 when serving clients directly.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 1)),
+    # Refill rates of the token buckets; empty disables the scope
+    'DEFAULT_THROTTLE_RATES': {
+        'user': os.getenv('THROTTLE_USER_RATE', '600/min') or None,
+        'token': os.getenv('THROTTLE_TOKEN_RATE') or None,
+    },
+}
+
+# Token bucket throttles (core/throttling.py). BURST is the capacity of
+# the buckets per scope, the number of requests of the rate by default.
+# The buckets are per process, so every worker allows the whole rate; set
+# CACHE to a CACHES alias ('shared') to share them between workers.
+THROTTLE_BUCKETS = {
+    'CACHE': os.getenv('THROTTLE_CACHE') or None,
+    'MAXSIZE': int(os.getenv('THROTTLE_MAXSIZE', 10000)),
+    'BURST': {
+        'user': int(os.getenv('THROTTLE_USER_BURST', 100)),
+        'token': int(os.getenv('THROTTLE_TOKEN_BURST', 100)),
+    },
+}
+
+# 'default' is local to each process. 'shared' is seen by every worker:
+# files on the local disk by default, which only the workers of one host
+# share, or memcached with SHARED_CACHE_BACKEND=django.core.cache.backends.
+# memcached.MemcachedCache and SHARED_CACHE_LOCATION=<host>:11211 as in
+# docker-compose.prod.yml. The file cache culls a third of its entries
+# once it holds MAX_ENTRIES, keep it above the number of active tokens.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'shared': {
+        'BACKEND': os.getenv(
+            'SHARED_CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'SHARED_CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'finances-cache')
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('SHARED_CACHE_MAX_ENTRIES', 100000)),
+        },
+    },
+}
+
+# Token lookups cached per process and in the SHARED_CACHE alias. Every
+# hit is checked against a generation of the token in the shared cache,
+# which deleting the token or saving its user replaces, so all the
+# workers see revocations right away. Without a shared cache tokens are
+# looked up in the DB on every request (warned by the user.W001 check);
+# a process local alias is refused (user.E002).
+TOKEN_AUTH_CACHE = {
+    'MAXSIZE': int(os.getenv('TOKEN_CACHE_MAXSIZE', 10000)),
+    'TTL': int(os.getenv('TOKEN_CACHE_TTL', 60)),
+    'SHARED_CACHE': os.getenv('TOKEN_CACHE_SHARED', 'shared') or None,
+}
+
+# Serialized budget and tag responses cached per user, in the CACHES alias
+# named by CACHE (the default local memory cache unless configured). The
+# entries are keyed on the collection revisions read from the DB, so a
+# per process cache never serves responses older than the last write.
+# Hits and misses are counted in the /metrics of each worker.
+RESPONSE_CACHE = {
+    'CACHE': os.getenv('RESPONSE_CACHE_ALIAS', 'default'),
+    'TIMEOUT': int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300)),
+}
+
+# Delta sync change feed (expenses/sync.py). The prune_changes command
+# deletes the changes older than RETENTION_DAYS; clients that didn't sync
+# for that long get a 410 and fetch their collections again.
+CHANGE_FEED = {
+    'RETENTION_DAYS': int(os.getenv('CHANGE_FEED_RETENTION_DAYS', 90)),
+}
+
+# Per view latency, DB, serializer and size metrics of a sample of the
+# requests (core/middleware.py), served at /metrics. SAMPLE_RATE is the
+# sampled fraction, 0 disables the middleware (/metrics then only serves
+# the counters); LOG also writes a JSON line per sampled request; TOKEN
+# protects /metrics. The histograms are per process, labelled with the
+# worker pid.
+PERF_METRICS = {
+    'SAMPLE_RATE': float(os.getenv('PERF_METRICS_SAMPLE_RATE', 0)),
+    'LOG': os.getenv('PERF_METRICS_LOG', '0') == '1',
+    'TOKEN': os.getenv('PERF_METRICS_TOKEN') or None,
+}
+
+# Query auditing for staging (core/query_audit.py): logs requests running
+# the same SQL shape REPEAT_THRESHOLD times (N+1), queries slower than
+# SLOW_MS and sequential scans found by explaining EXPLAIN_RATE of the
+# SELECT shapes.
+QUERY_AUDIT = {
+    'ENABLED': os.getenv('QUERY_AUDIT', '0') == '1',
+    'REPEAT_THRESHOLD': int(os.getenv('QUERY_AUDIT_REPEAT_THRESHOLD', 3)),
+    'SLOW_MS': float(os.getenv('QUERY_AUDIT_SLOW_MS', 100)),
+    'EXPLAIN_RATE': float(os.getenv('QUERY_AUDIT_EXPLAIN_RATE', 0)),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.metrics': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'core.query_audit': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
@@ -15,10 +15,12 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include
+from core.views import metrics_view
 
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/user/', include('user.urls')),
-    path('api/expenses/', include('expenses.urls'))
+    path('api/expenses/', include('expenses.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class UsersConfig(AppConfig):
     name = 'user'
+
+    def ready(self):
+        from user import checks, signals  # noqa: F401
@@ -0,0 +1,180 @@
+import copy
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+
+def cache_settings():
+    """Returns the TOKEN_AUTH_CACHE setting merged with the defaults"""
+    options = {
+        'MAXSIZE': 10000,
+        'TTL': 60,
+        'SHARED_CACHE': 'shared',
+    }
+    options.update(getattr(settings, 'TOKEN_AUTH_CACHE', {}))
+    return options
+
+
+class TokenCache:
+    """Thread safe, process local LRU of token key -> ``(token,
+    generation)`` with a TTL"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._user_keys = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            token, generation, expires = entry
+            if expires < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return token, generation
+
+    def set(self, key, token, generation=None):
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (token, generation,
+                                  time.monotonic() + self.ttl)
+            self._user_keys.setdefault(token.user_id, set()).add(key)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+
+    def delete(self, key):
+        with self._lock:
+            self._remove(key)
+
+    def delete_user(self, user_id):
+        with self._lock:
+            for key in list(self._user_keys.get(user_id, ())):
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._user_keys.clear()
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._user_keys.get(entry[0].user_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[entry[0].user_id]
+
+
+_options = cache_settings()
+token_cache = TokenCache(_options['MAXSIZE'], _options['TTL'])
+
+
+def shared_cache():
+    """Returns the cross process cache tier, None when not configured"""
+    alias = cache_settings()['SHARED_CACHE']
+    return caches[alias] if alias else None
+
+
+def shared_cache_key(key):
+    return f'authtoken:{key}'
+
+
+def generation_key(key):
+    return f'authtoken:generation:{key}'
+
+
+def replace_generations(keys):
+    """Gives the tokens new generations, which turns down every cached
+    copy of them in every process.
+
+    Done right away and again when the transaction commits, so a worker
+    that read the old rows in between can't cache them under the new
+    generation.
+    """
+    shared = shared_cache()
+    if shared is None or not keys:
+        return
+
+    def replace():
+        shared.set_many({generation_key(key): uuid.uuid4().hex
+                         for key in keys}, None)
+
+    replace()
+    transaction.on_commit(replace)
+
+
+def invalidate_token(key):
+    """Forgets a token in every cache tier of every process"""
+    token_cache.delete(key)
+    replace_generations([key])
+
+
+def invalidate_user(user_id):
+    """Forgets every token of a user in every cache tier of every
+    process"""
+    token_cache.delete_user(user_id)
+    replace_generations(list(
+        Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    ))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that avoids the token lookup query.
+
+    Tokens are kept in a process local LRU and in the ``SHARED_CACHE`` of
+    TOKEN_AUTH_CACHE, along with the generation of the token in the
+    shared cache when they were read from the DB. Every request reads the
+    current generation (one shared cache get) and only uses a cached
+    token of the same generation. ``user.signals`` replace the generation
+    when the token is deleted or its user saved, so the other workers
+    stop accepting a revoked token or an inactive user at once. Without a
+    shared cache every request looks the token up in the DB.
+    """
+
+    def authenticate_credentials(self, key):
+        shared = shared_cache()
+        if shared is None:
+            return super().authenticate_credentials(key)
+
+        generation = shared.get(generation_key(key))
+        entry = token_cache.get(key) if generation is not None else None
+        if entry is not None and entry[1] == generation:
+            token = entry[0]
+        else:
+            entry = shared.get(shared_cache_key(key)) \
+                if generation is not None else None
+            if entry is not None and entry[1] == generation:
+                token = entry[0]
+            else:
+                user, token = super().authenticate_credentials(key)
+                if generation is None:
+                    # First lookup, or the generation was evicted. Losing
+                    # the race to a concurrent replace means this copy
+                    # may be outdated already: don't cache it.
+                    generation = uuid.uuid4().hex
+                    if not shared.add(generation_key(key), generation,
+                                      None):
+                        return user, token
+                shared.set(shared_cache_key(key), (token, generation),
+                           cache_settings()['TTL'])
+            token_cache.set(key, token, generation)
+        if not token.user.is_active:
+            raise AuthenticationFailed(_('User inactive or deleted.'))
+        # The cached user is shared between requests, hand out a copy so
+        # views changing request.user don't leak into each other.
+        return copy.copy(token.user), token
@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.core.checks import Error, Warning, register
+from user.authentication import cache_settings
+
+
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_token_cache(app_configs, **kwargs):
+    """Checks the token cache has a tier shared by the workers"""
+    alias = cache_settings()['SHARED_CACHE']
+    if not alias:
+        return [Warning(
+            'TOKEN_AUTH_CACHE has no SHARED_CACHE, so every request looks '
+            'its token up in the DB.',
+            hint='Set TOKEN_CACHE_SHARED to a memcached CACHES alias.',
+            id='user.W001',
+        )]
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend is None:
+        return [Error(
+            f'TOKEN_AUTH_CACHE names the undefined cache {alias!r}.',
+            id='user.E001',
+        )]
+    if backend in PROCESS_LOCAL_BACKENDS:
+        return [Error(
+            f"The {alias!r} cache isn't shared between processes, so "
+            "workers would accept tokens revoked in other workers.",
+            hint='Use memcached, or the file cache on a single host.',
+            id='user.E002',
+        )]
+    return []
@@ -0,0 +1,97 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import check_password, make_password
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from user.hashers import hashing_settings
+
+
+class CredentialCheckBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('Too many logins in progress, try again later.')
+    default_code = 'credential_check_busy'
+
+
+class HashingPool:
+    """Bounded pool running the password hashing of the process.
+
+    ``THREADS`` hashes run at once and ``QUEUE`` more may wait; beyond
+    that, and after ``TIMEOUT`` seconds of waiting, callers get
+    ``CredentialCheckBusy`` instead of tying up a request thread. The
+    hashers release the GIL, so when a worker has more request threads
+    than ``THREADS + QUEUE`` the others keep serving other endpoints while
+    a login burst is hashed. Created on first use, so every gunicorn
+    worker gets its own.
+    """
+
+    def __init__(self, threads, queue, timeout):
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=threads,
+                                            thread_name_prefix='password')
+        self._slots = threading.BoundedSemaphore(threads + queue)
+
+    def run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            raise CredentialCheckBusy()
+        try:
+            future = self._executor.submit(function, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda future: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise CredentialCheckBusy()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def hashing_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                options = hashing_settings()
+                _pool = HashingPool(options['THREADS'], options['QUEUE'],
+                                    options['TIMEOUT'])
+    return _pool
+
+
+def verify_password(password, encoded):
+    """Returns whether the password matches and whether the hash must be
+    upgraded to the preferred hasher or its current costs"""
+    upgrade = []
+    valid = check_password(password, encoded, setter=upgrade.append)
+    return valid, bool(upgrade)
+
+
+def hash_password(password):
+    """Hashes a password in the pool"""
+    return hashing_pool().run(make_password, password)
+
+
+def authenticate(email, password):
+    """Checks the credentials of a user like ModelBackend does, hashing in
+    the pool. The DB lookup and the hash upgrade are done by the calling
+    (request) thread, which owns the DB connection."""
+    User = get_user_model()
+    try:
+        user = User._default_manager.get_by_natural_key(email)
+    except User.DoesNotExist:
+        # Hash anyway, so unknown emails answer as slowly as known ones
+        hash_password(password)
+        return None
+    valid, upgrade = hashing_pool().run(verify_password, password,
+                                        user.password)
+    if not valid or not user.is_active:
+        return None
+    if upgrade:
+        user.password = hash_password(password)
+        user.save(update_fields=['password'])
+    return user
@@ -0,0 +1,39 @@
+from django.conf import settings
+from django.contrib.auth.hashers import Argon2PasswordHasher, \
+                                       BCryptSHA256PasswordHasher, \
+                                       PBKDF2PasswordHasher
+
+
+def hashing_settings():
+    """Returns the PASSWORD_HASHING setting merged with the defaults"""
+    options = {
+        'PROFILE': 'pbkdf2',
+        'PBKDF2_ITERATIONS': PBKDF2PasswordHasher.iterations,
+        'ARGON2_TIME_COST': 3,
+        'ARGON2_MEMORY_COST': 65536,
+        'ARGON2_PARALLELISM': 1,
+        'BCRYPT_ROUNDS': BCryptSHA256PasswordHasher.rounds,
+        'THREADS': 2,
+        'QUEUE': 16,
+        'TIMEOUT': 10,
+    }
+    options.update(getattr(settings, 'PASSWORD_HASHING', {}))
+    return options
+
+
+class TunedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 with ``PBKDF2_ITERATIONS`` iterations"""
+    iterations = hashing_settings()['PBKDF2_ITERATIONS']
+
+
+class TunedArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 with the ``ARGON2_*`` costs; the memory cost is in KiB.
+    Requires argon2-cffi."""
+    time_cost = hashing_settings()['ARGON2_TIME_COST']
+    memory_cost = hashing_settings()['ARGON2_MEMORY_COST']
+    parallelism = hashing_settings()['ARGON2_PARALLELISM']
+
+
+class TunedBCryptSHA256PasswordHasher(BCryptSHA256PasswordHasher):
+    """bcrypt with ``BCRYPT_ROUNDS`` rounds. Requires bcrypt."""
+    rounds = hashing_settings()['BCRYPT_ROUNDS']
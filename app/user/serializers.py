@@ -1,9 +1,11 @@
-from django.contrib.auth import get_user_model, authenticate
+from django.contrib.auth import get_user_model
 from rest_framework import serializers
 from django.utils.translation import ugettext_lazy as _
+from core.metrics import TimedSerializerMixin
+from user.credentials import authenticate, hash_password
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializers for the user model object"""
     class Meta:
         model = get_user_model()
@@ -11,8 +13,12 @@ class UserSerializer(serializers.ModelSerializer):
         extra_kwargs = {'password': {'write_only': True, 'min_length': 5}}
 
     def create(self, validated_data):
-        """Create a new user with encrpted password and return it"""
-        return get_user_model().objects.create_user(**validated_data)
+        """Create a new user with encrpted password and return it. The
+        password is hashed in the hashing pool."""
+        password = hash_password(validated_data.pop('password'))
+        return get_user_model().objects.create_user_with_hash(
+            password_hash=password, **validated_data
+        )
 
     def update(self, instance, validated_data):
         """Update the user, setting the password correctly and return
@@ -20,7 +26,7 @@ class UserSerializer(serializers.ModelSerializer):
         password = validated_data.pop('password', None)
         user = super().update(instance, validated_data)
         if password:
-            user.set_password(password)
+            user.password = hash_password(password)
             user.save()
         return user
 
@@ -37,11 +43,7 @@ class AuthTokenSerializer(serializers.Serializer):
         """Validate and authenticate user"""
         email = attrs.get('email')
         password = attrs.get('password')
-        user = authenticate(
-            request=self.context.get('request'),
-            username=email,
-            password=password
-        )
+        user = authenticate(email, password)
         if not user:
             msg = _('Unable to authenticate with provided credentials.')
             raise serializers.ValidationError(msg, code='authentication')
@@ -0,0 +1,137 @@
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from user.authentication import TokenCache, token_cache
+from user.checks import check_token_cache
+
+
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Test the cached token authentication backend"""
+
+    def setUp(self):
+        token_cache.clear()
+        caches['shared'].clear()
+        self.user = get_user_model().objects.create_user(
+            email='cached@test.com', password='password123', name='cached'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_second_request_skips_token_query(self):
+        """Test the token lookup is cached after the first request"""
+        with self.assertNumQueries(1):
+            self.client.get(ME_URL)
+        with self.assertNumQueries(0):
+            response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], self.user.email)
+
+    def test_deleted_token_rejected(self):
+        """Test a deleted token stops working right away"""
+        self.client.get(ME_URL)
+        self.token.delete()
+        response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_rejected(self):
+        """Test deactivating the user invalidates the cached token"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_profile_update_is_visible(self):
+        """Test changes made through the me endpoint aren't served stale"""
+        self.client.get(ME_URL)
+        self.client.patch(ME_URL, {'name': 'renamed'})
+        response = self.client.get(ME_URL)
+        self.assertEqual(response.data['name'], 'renamed')
+
+    def test_revocation_in_other_worker(self):
+        """Test a token deleted by another process, which can only reach
+        the shared cache, is turned down here too"""
+        self.client.get(ME_URL)
+        key = self.token.key
+        with mock.patch.object(token_cache, 'delete'):
+            self.token.delete()
+        self.assertIsNotNone(token_cache.get(key))
+        response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivation_in_other_worker(self):
+        """Test a user deactivated by another process is turned down"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        with mock.patch.object(token_cache, 'delete_user'):
+            self.user.save()
+        response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(TOKEN_AUTH_CACHE={'SHARED_CACHE': None})
+    def test_no_shared_cache_no_caching(self):
+        """Test tokens aren't cached without a shared cache to invalidate
+        them in every process"""
+        self.client.get(ME_URL)
+        with self.assertNumQueries(1):
+            response = self.client.get(ME_URL)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TokenCacheTests(TestCase):
+    """Test the process local LRU"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            email='lru@test.com', password='password123'
+        )
+
+    def test_evicts_least_recently_used(self):
+        """Test the cache never grows over its maximum size"""
+        cache = TokenCache(maxsize=2, ttl=60)
+        tokens = [Token(key=str(index), user=self.user) for index in range(3)]
+        cache.set('0', tokens[0])
+        cache.set('1', tokens[1])
+        cache.get('0')
+        cache.set('2', tokens[2])
+        self.assertIsNone(cache.get('1'))
+        self.assertIsNotNone(cache.get('0'))
+
+    def test_expired_entries_ignored(self):
+        """Test entries older than the TTL are not returned"""
+        cache = TokenCache(maxsize=2, ttl=-1)
+        cache.set('0', Token(key='0', user=self.user))
+        self.assertIsNone(cache.get('0'))
+
+
+class TokenCacheCheckTests(SimpleTestCase):
+    """Test the system check of the shared token cache"""
+
+    def check_ids(self):
+        return [message.id for message in check_token_cache(None)]
+
+    def test_shared_cache(self):
+        self.assertEqual(self.check_ids(), [])
+
+    @override_settings(TOKEN_AUTH_CACHE={'SHARED_CACHE': None})
+    def test_no_shared_cache(self):
+        """Test running without a shared tier is warned about"""
+        self.assertEqual(self.check_ids(), ['user.W001'])
+
+    @override_settings(TOKEN_AUTH_CACHE={'SHARED_CACHE': 'default'})
+    def test_process_local_cache(self):
+        """Test a per process cache can't be the shared tier"""
+        self.assertEqual(self.check_ids(), ['user.E002'])
+
+    @override_settings(TOKEN_AUTH_CACHE={'SHARED_CACHE': 'missing'})
+    def test_undefined_cache(self):
+        self.assertEqual(self.check_ids(), ['user.E001'])
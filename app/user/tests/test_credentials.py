@@ -0,0 +1,92 @@
+import threading
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from user import credentials
+from user.credentials import CredentialCheckBusy, HashingPool
+
+
+TOKEN_URL = reverse('user:token')
+
+
+class HashingPoolTests(TestCase):
+    """Test the bounded password hashing pool"""
+
+    def setUp(self):
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def test_runs_in_pool_thread(self):
+        """Test the work runs in a pool thread and returns its result"""
+        pool = HashingPool(threads=1, queue=0, timeout=5)
+        name = pool.run(lambda: threading.current_thread().name)
+        self.assertTrue(name.startswith('password'))
+
+    def test_full_pool_rejects(self):
+        """Test the calls over the threads and queue are rejected"""
+        pool = HashingPool(threads=1, queue=0, timeout=5)
+        started = threading.Event()
+
+        def work():
+            started.set()
+            self.release.wait()
+
+        blocked = threading.Thread(target=pool.run, args=(work,))
+        blocked.start()
+        self.addCleanup(blocked.join)
+        started.wait()
+        with self.assertRaises(CredentialCheckBusy):
+            pool.run(make_password, 'password123')
+        self.release.set()
+        blocked.join()
+        self.assertTrue(pool.run(make_password, 'password123'))
+
+    def test_timeout_rejects(self):
+        """Test a call waiting longer than the timeout is rejected"""
+        pool = HashingPool(threads=1, queue=1, timeout=0.05)
+        with self.assertRaises(CredentialCheckBusy):
+            pool.run(self.release.wait)
+
+
+class CredentialsApiTests(TestCase):
+    """Test the token endpoint hashing through the pool"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.payload = {'email': 'hash@test.com', 'password': 'password123'}
+
+    def test_busy_pool_unavailable(self):
+        """Test logins get a 503 while the pool is full"""
+        get_user_model().objects.create_user(**self.payload)
+        pool = HashingPool(threads=1, queue=0, timeout=5)
+        pool._slots.acquire()
+        with mock.patch.object(credentials, '_pool', pool):
+            response = self.client.post(TOKEN_URL, self.payload)
+        self.assertEqual(response.status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertNotIn('token', response.data)
+
+    @override_settings(PASSWORD_HASHERS=[
+        'user.hashers.TunedPBKDF2PasswordHasher',
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+    ])
+    def test_legacy_hash_upgraded(self):
+        """Test a login rehashes a password of an older hasher"""
+        user = get_user_model().objects.create_user(email='hash@test.com')
+        user.password = make_password('password123', hasher='md5')
+        user.save()
+        response = self.client.post(TOKEN_URL, self.payload)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(user.check_password('password123'))
+
+    def test_inactive_user_rejected(self):
+        """Test inactive users don't get a token"""
+        get_user_model().objects.create_user(is_active=False, **self.payload)
+        response = self.client.post(TOKEN_URL, self.payload)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -3,6 +3,9 @@ from django.urls import reverse
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework.authtoken.models import Token
+from core.tests.utils import QueryBudgetMixin
+from user.authentication import token_cache
 
 
 CREATE_USER_URL = reverse('user:create')
@@ -138,3 +141,34 @@ class PrivateApiUserTests(TestCase):
         }
         response = self.client.patch(ME_URL, payload)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class UserQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Test the query budget of the user endpoints"""
+
+    def setUp(self):
+        token_cache.clear()
+        self.client = APIClient()
+        self.user = create_user(email='budget@test.com',
+                                password='password1')
+
+    def test_create_user_budget(self):
+        payload = {'email': 'new@test.com', 'password': 'password12345',
+                   'name': 'new'}
+        with self.assertQueryBudget(2):
+            self.client.post(CREATE_USER_URL, payload)
+
+    def test_token_budget(self):
+        payload = {'email': 'budget@test.com', 'password': 'password1'}
+        with self.assertQueryBudget(5):
+            self.client.post(TOKEN_URL, payload)
+
+    def test_me_budget(self):
+        """Test authenticating with a token and updating the profile"""
+        token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        with self.assertQueryBudget(1):
+            self.client.get(ME_URL)
+        # The update and the keys of the tokens to invalidate
+        with self.assertQueryBudget(2):
+            self.client.patch(ME_URL, {'name': 'renamed'})
@@ -3,5 +3,9 @@
 if [ -n "$DJANGO_SUPERUSER_USERNAME" ] && [ -n "$DJANGO_SUPERUSER_PASSWORD" ] ; then
     (python manage.py createsuperuser --no-input)
 fi
-(gunicorn finances.wsgi --user user --bind 0.0.0.0:8010 --workers 3) &
+if [ "$SERVER_MODE" = "asgi" ] ; then
+    (gunicorn finances.asgi:application --user user --bind 0.0.0.0:8010 --workers 3 --worker-class uvicorn.workers.UvicornWorker) &
+else
+    (gunicorn finances.wsgi --user user --bind 0.0.0.0:8010 --workers 3 --threads "${GUNICORN_THREADS:-8}") &
+fi
 nginx -g "daemon off;"
\ No newline at end of file